@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import time
+import logging
+import subprocess
+import pandas as pd
+import yaml
+import quiet_run
+import summarize_results
+from stage_telemetry import load_telemetry
+
+benchmark_config_path = "/root/auto_benchmark/benchmark.yaml"
+csv_file_path = "/root/benchmark_results/results.csv"
+client_dir = "/root/auto_benchmark/cvmfs-benchmark-release/test/performance-benchmark/client/"
+python_path = "/root/auto_benchmark/benchmark_venv/bin/python"
+settings_file_name = "adaptive_sampling.json"
+
+
+def load_benchmark_config(config_path):
+    """Load the benchmark configuration from YAML."""
+    try:
+        with open(config_path, 'r') as file:
+            config = yaml.safe_load(file)
+        logging.info(f"Loaded benchmark configuration from {config_path}")
+        return config
+    except Exception as e:
+        logging.error(f"Failed to load benchmark configuration: {e}")
+        return None
+
+
+def relative_iqr(file_path, metrics, cache_states):
+    """Return the worst IQR relative to the median per (client_config, command) in a results CSV."""
+    df = pd.read_csv(file_path)
+    df.columns = df.columns.str.strip()
+    df['metric'] = df['metric'].str.strip().str.replace(r'^sft\.cern\.ch_', '', regex=True)
+    df['client_config'] = df['client_config'].str.strip()
+    df['command_label'] = df['command_label'].str.strip()
+    df = df[df['metric'].isin(metrics)]
+
+    spreads = []
+    for cache_state in cache_states:
+        median = df[f'{cache_state}_median']
+        iqr = df[f'{cache_state}_third_quartile'] - df[f'{cache_state}_first_quartile']
+        # A zero median with a zero IQR is perfectly stable, not undefined
+        spreads.append((iqr / median.where(median != 0)).fillna(0).abs())
+
+    df = df.assign(relative_iqr=pd.concat(spreads, axis=1).max(axis=1))
+    return df.groupby(['client_config', 'command_label'])['relative_iqr'].max().to_dict()
+
+
+def write_round_configs(result_dir, round_number, combinations, repetitions, out_dirname=None):
+    """Write copies of config-bench.yaml restricted to the noisy combinations, one per client config.
+
+    Each copy runs only the noisy commands of its client config, so stable combinations are not repeated.
+    out_dirname replaces the output directory of the runs, e.g. with the directory of a parallel unit.
+    """
+    with open(os.path.join(result_dir, "config-bench.yaml"), 'r') as f:
+        config = yaml.safe_load(f)
+    run_key = next(key for key in config if key.startswith('run-'))
+    run = config.pop(run_key)
+
+    commands_by_client_config = {}
+    for client_config, command in combinations:
+        commands_by_client_config.setdefault(client_config, set()).add(command)
+
+    output_paths = []
+    for client_config, commands in sorted(commands_by_client_config.items()):
+        suffix = f"round{round_number}"
+        if out_dirname is not None:
+            suffix += f"-{os.path.basename(out_dirname)}"
+        suffix += f"-{client_config}"
+        round_run = dict(run, commands=sorted(commands), client_configs=[[client_config]], repetitions=repetitions)
+        if out_dirname is not None:
+            round_run['out_dirname'] = out_dirname
+
+        output_path = os.path.join(result_dir, f"config-bench-{suffix}.yaml")
+        with open(output_path, 'w') as f:
+            yaml.safe_dump(dict(config, **{f'{run_key}-{suffix}': round_run}), f, sort_keys=False)
+        output_paths.append(output_path)
+    return output_paths
+
+
+def run_client_script(script, config_file, result_dir):
+    """Run one of the benchmark client scripts; the benchmark itself is pinned to the quiet run's CPUs."""
+    command = [python_path, os.path.join(client_dir, script), '-c', config_file]
+    preexec_fn = quiet_run.pinned_preexec(result_dir) if script == 'start_benchmark.py' else None
+    logging.info(f"Running: {' '.join(command)}")
+    subprocess.run(command, cwd=client_dir, check=True, preexec_fn=preexec_fn)
+
+
+def summarize(config_file, render_plots=False):
+    """Regenerate results.csv from a visualization config, like the visualization stage."""
+    command = summarize_results.summary_command(python_path, client_dir, config_file, render_plots)
+    logging.info(f"Running: {' '.join(command)}")
+    subprocess.run(command, cwd=client_dir, check=True)
+
+
+def first_pass_duration(result_dir):
+    """Wall time of the benchmark stage recorded by the telemetry wrapper, if available."""
+    for record in load_telemetry(os.path.join(result_dir, "telemetry.jsonl")):
+        if record.get('stage') == 'benchmark':
+            return record['wall_time']
+    return None
+
+
+def sample(result_dir, config, visualize=None, out_dirs=None):
+    """Schedule extra repetitions for noisy combinations until they are stable or the budget is spent.
+
+    visualize(config_file) regenerates results.csv; by default it is regenerated in a subprocess.
+    out_dirs maps (client_config, command) to the directory holding the earlier repetitions of the
+    combination, if not the result directory, e.g. the output directories of parallel units.
+    """
+    settings = config['adaptive_sampling']
+    target = settings['target_relative_iqr']
+    budget = settings['time_budget']
+    extra_repetitions = settings['extra_repetitions']
+
+    spreads = relative_iqr(csv_file_path, settings['metrics'], settings['cache_states'])
+    rounds = []
+
+    # Estimate the cost of one repetition of one combination from the first pass
+    elapsed = first_pass_duration(result_dir) or 0.0
+    repetition_cost = None
+    if elapsed and spreads:
+        repetition_cost = elapsed / (settings['initial_repetitions'] * len(spreads))
+
+    for round_number in range(1, settings['max_rounds'] + 1):
+        noisy = sorted(combination for combination, spread in spreads.items() if spread > target)
+        if not noisy:
+            logging.info("All combinations are below the target spread.")
+            break
+
+        if repetition_cost is not None:
+            estimate = repetition_cost * extra_repetitions * len(noisy)
+            if elapsed + estimate > budget:
+                logging.info(f"Time budget exhausted: {elapsed:.0f}s spent, next round estimated at {estimate:.0f}s.")
+                break
+
+        logging.info(f"Round {round_number}: {extra_repetitions} extra repetitions for {noisy}")
+        start = time.monotonic()
+        # The extra repetitions join the earlier ones of their combination, one run per output directory
+        groups = {}
+        for combination in noisy:
+            groups.setdefault((out_dirs or {}).get(combination), []).append(combination)
+        for out_dirname, combinations in sorted(groups.items(), key=lambda item: item[0] or ''):
+            for round_config in write_round_configs(result_dir, round_number, combinations, extra_repetitions,
+                                                    out_dirname):
+                run_client_script('start_benchmark.py', round_config, result_dir)
+
+        # Recompute the summaries over all repetitions written so far
+        if os.path.exists(csv_file_path):
+            os.remove(csv_file_path)
+        config_visual_file = os.path.join(result_dir, "config-visual.yaml")
+        if visualize is not None:
+            visualize(config_visual_file)
+        else:
+            summarize(config_visual_file, summarize_results.load_summary_config(config)['render_plots'])
+
+        round_duration = time.monotonic() - start
+        elapsed += round_duration
+        repetition_cost = round_duration / (extra_repetitions * len(noisy))
+        spreads = relative_iqr(csv_file_path, settings['metrics'], settings['cache_states'])
+        rounds.append({
+            "round": round_number,
+            "combinations": [list(combination) for combination in noisy],
+            "repetitions": extra_repetitions,
+            "duration": round(round_duration, 1),
+        })
+
+        if elapsed >= budget:
+            logging.info("Time budget exhausted.")
+            break
+
+    return {
+        "enabled": True,
+        "target_relative_iqr": target,
+        "rounds": rounds,
+        "final_relative_iqr": {f"{client_config}/{command}": round(spread, 4)
+                               for (client_config, command), spread in spreads.items()},
+    }
+
+
+if __name__ == "__main__":
+    log_file_path = "/root/auto_benchmark/adaptive_sampling.log"
+    logging.basicConfig(
+        filename=log_file_path,
+        level=logging.DEBUG,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+    )
+
+    if len(sys.argv) != 2:
+        logging.error("Invalid arguments. Usage: adaptive_sampling.py <result_dir>")
+        sys.exit(1)
+
+    result_dir = sys.argv[1]
+    config = load_benchmark_config(benchmark_config_path)
+    if config is None:
+        sys.exit(1)
+
+    if not (config.get('adaptive_sampling') or {}).get('enabled'):
+        logging.info("Adaptive sampling is disabled.")
+        sys.exit(0)
+
+    import parallel_execution
+
+    render_plots = summarize_results.load_summary_config(config)['render_plots']
+
+    def visualize(config_visual_file):
+        for path in parallel_execution.visual_configs(config_visual_file):
+            summarize(path, render_plots)
+
+    summary = sample(result_dir, config, visualize, parallel_execution.unit_out_dirs(result_dir))
+    with open(os.path.join(result_dir, settings_file_name), 'w') as f:
+        json.dump(summary, f, indent=2)
+    logging.info(f"Adaptive sampling finished: {summary}")
@@ -0,0 +1,162 @@
+import os
+import re
+import sys
+import yaml
+import logging
+import argparse
+import subprocess
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import upload_benchmark_data
+import runner_node
+import parallel_execution
+import summarize_results
+from check_benchmarks import load_benchmark_config, covered_commits
+from orchestrate import (RESULTS_ROOT, CLIENT_DIR, PYTHON, BENCHMARK_CONFIG_PATH, PROJ_ROOT, SUMMARY_FILE_NAME,
+                         run_settings_paths)
+
+COMMIT_DIR_PATTERN = re.compile(r'^[0-9a-f]{40}$')
+BACKFILL_VISUAL_CONFIG = "config-visual-backfill.yaml"
+
+
+def find_result_dirs(results_root):
+    """Result directories of commits that have a summary or can regenerate one, keyed by commit."""
+    result_dirs = {}
+    for name in os.listdir(results_root):
+        path = os.path.join(results_root, name)
+        if not COMMIT_DIR_PATTERN.match(name) or not os.path.isdir(path):
+            continue
+        if (os.path.isfile(os.path.join(path, SUMMARY_FILE_NAME))
+                or os.path.isfile(os.path.join(path, "config-visual.yaml"))):
+            result_dirs[name] = path
+    return result_dirs
+
+
+def regenerate_summary(result_dir):
+    """Rerun the summarisation of a commit's raw results into <result_dir>/summary.csv."""
+    with open(os.path.join(result_dir, "config-visual.yaml"), 'r') as f:
+        visual_config = yaml.safe_load(f)
+    # Parallel workers must not share the output files of the regular pipeline
+    visual_config['out_dirname'] = result_dir
+    visual_config['append_to_csv']['full_out_name'] = os.path.join(result_dir, SUMMARY_FILE_NAME)
+    config_path = os.path.join(result_dir, BACKFILL_VISUAL_CONFIG)
+    with open(config_path, 'w') as f:
+        yaml.safe_dump(visual_config, f, sort_keys=False, default_flow_style=None)
+
+    summary_path = os.path.join(result_dir, SUMMARY_FILE_NAME)
+    if os.path.exists(summary_path):
+        os.remove(summary_path)
+    # The units of a parallel run are summarised one output directory at a time, only results.csv is needed
+    for path in parallel_execution.visual_configs(config_path):
+        subprocess.run(summarize_results.summary_command(PYTHON, CLIENT_DIR, path),
+                       cwd=CLIENT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+
+
+def summarize_commit(commit, result_dir, regenerate):
+    """Processed, upload-ready results of one commit; runs in a worker process."""
+    summary_path = os.path.join(result_dir, SUMMARY_FILE_NAME)
+    if regenerate or not os.path.isfile(summary_path):
+        regenerate_summary(result_dir)
+    df = upload_benchmark_data.process_csv(summary_path, os.path.join(result_dir, "processed_summary.csv"))
+    if df is None:
+        return None
+    return parallel_execution.annotate(df[df['commit'] == commit], result_dir)
+
+
+def upload_batches(config, frames, batch_rows):
+    """Upload the results of many commits per request. Returns the commits that were uploaded."""
+    upload_url = f"{config.get('server_url')}/{upload_benchmark_data.upload_endpoint}"
+    headers = runner_node.auth_headers(config)
+    uploaded, batch, rows = [], [], 0
+    commits = list(frames)
+    for index, commit in enumerate(commits):
+        batch.append(commit)
+        rows += len(frames[commit])
+        if rows < batch_rows and index + 1 < len(commits):
+            continue
+        if upload_benchmark_data.upload_dataframe(pd.concat([frames[c] for c in batch]), upload_url, headers):
+            uploaded.extend(batch)
+        batch, rows = [], 0
+    return uploaded
+
+
+def backfill(config, results_root, workers=None, batch_rows=20000, regenerate=False, force=False, dry_run=False):
+    """Import the result directories of all commits the server does not fully cover yet.
+
+    Returns the lists of uploaded commits and of commits that failed.
+    """
+    result_dirs = find_result_dirs(results_root)
+    commits = sorted(result_dirs)
+    covered = set() if force else covered_commits(config, commits)
+    pending = [commit for commit in commits if commit not in covered]
+    logging.info(f"Backfill: {len(commits)} result directories, {len(covered)} already covered, "
+                 f"{len(pending)} to import.")
+    if dry_run:
+        return pending, []
+
+    frames, failed = {}, []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(summarize_commit, commit, result_dirs[commit], regenerate): commit
+                   for commit in pending}
+        for future in as_completed(futures):
+            commit = futures[future]
+            try:
+                df = future.result()
+            except Exception as e:
+                logging.error(f"Summarising {commit} failed: {e}")
+                df = None
+            if df is None or df.empty:
+                failed.append(commit)
+            else:
+                frames[commit] = df
+
+    # Batches follow commit order, so a failed request leaves a contiguous gap to retry
+    tags = upload_benchmark_data.load_tags()
+    frames = {commit: upload_benchmark_data.add_tags(frames[commit], tags) for commit in pending if commit in frames}
+    uploaded = upload_batches(config, frames, batch_rows)
+    failed.extend(commit for commit in frames if commit not in uploaded)
+
+    telemetry_url = f"{config.get('server_url')}/{upload_benchmark_data.telemetry_endpoint}"
+    headers = runner_node.auth_headers(config)
+    for commit in uploaded:
+        telemetry_path = os.path.join(result_dirs[commit], "telemetry.jsonl")
+        if os.path.isfile(telemetry_path):
+            upload_benchmark_data.upload_telemetry(telemetry_path, run_settings_paths(result_dirs[commit]),
+                                                   commit, telemetry_url, headers)
+    return uploaded, sorted(failed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upload the result directories of past benchmark runs.")
+    parser.add_argument('--results-root', default=RESULTS_ROOT)
+    parser.add_argument('--config', default=BENCHMARK_CONFIG_PATH)
+    parser.add_argument('--workers', type=int, default=None, help="Summarising processes, default one per CPU")
+    parser.add_argument('--batch-rows', type=int, default=20000, help="Result rows per upload request")
+    parser.add_argument('--regenerate', action='store_true',
+                        help="Summarise the raw results again even where a summary exists")
+    parser.add_argument('--force', action='store_true', help="Also upload commits the server already covers")
+    parser.add_argument('--dry-run', action='store_true', help="Only list the commits that would be imported")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        filename=os.path.join(PROJ_ROOT, "backfill.log"),
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        force=True,
+    )
+
+    config = load_benchmark_config(args.config)
+    if config is None:
+        print("ERROR_LOADING_CONFIG")
+        sys.exit(1)
+
+    uploaded, failed = backfill(config, args.results_root, args.workers, args.batch_rows,
+                                args.regenerate, args.force, args.dry_run)
+    if args.dry_run:
+        print('\n'.join(uploaded))
+    else:
+        print(f"Uploaded {len(uploaded)} commits, {len(failed)} failed.")
+        for commit in failed:
+            print(f"FAILED {commit}")
+    sys.exit(1 if failed else 0)
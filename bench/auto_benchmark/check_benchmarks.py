@@ -1,4 +1,3 @@
-import subprocess
 import requests
 import logging
 import yaml
@@ -6,6 +5,9 @@ import os
 import sys
 from datetime import datetime, timedelta
 from requests.exceptions import RequestException
+import commit_index
+import runner_node
+from runner_node import auth_headers
 
 log_file_path = "/root/auto_benchmark/check_benchmarks.log"
 logging.basicConfig(
@@ -15,24 +17,24 @@ logging.basicConfig(
 )
 
 API_ENDPOINT = "api/benchmark_combinations"
+COMPARE_ENDPOINT = "api/compare"
+COVERAGE_ENDPOINT = "api/coverage"
 MAX_COMMITS = 10
+# Commits per coverage request, below SQLite's limit of bound variables
+COVERAGE_BATCH = 500
 
-def get_commits_from_repo():
-    """Fetch all commits from the local Git repository."""
+def get_commits_from_index(index_path=commit_index.INDEX_PATH):
+    """Commits of the local commit index, newest first along the first-parent chain, with their datetimes."""
     try:
-        logging.info("Fetching commits from the local git repository...")
-        result = subprocess.run(['git', 'log', 'origin/devel', '-n', '100', '--pretty=format:%H %ci'], 
-                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        if result.returncode == 0:
-            commits = [line.split()[0] for line in result.stdout.strip().split('\n')]
-            commit_dates = [line.split()[1] for line in result.stdout.strip().split('\n')]
-            logging.info(f"Fetched {len(commits)} commits from the repository.")
-            return commits, commit_dates
-        else:
-            logging.error(f"Error fetching commits: {result.stderr}")
-            return None, None
+        conn = commit_index.connect(index_path)
+        try:
+            indexed = commit_index.newest_commits(conn)
+        finally:
+            conn.close()
+        logging.info(f"Read {len(indexed)} commits from the commit index.")
+        return [commit for commit, _ in indexed], [committed_at for _, committed_at in indexed]
     except Exception as e:
-        logging.error(f"Error running git command: {e}")
+        logging.error(f"Error reading the commit index: {e}")
         return None, None
 
 def load_benchmark_config(config_path=None):
@@ -64,15 +66,45 @@ def send_benchmark_request(commit_hash, config):
         }
         logging.info(f"Sending request to {config.get('server_url')}/{API_ENDPOINT} with payload: {payload}")
         
-        response = requests.post(f"{config.get('server_url')}/{API_ENDPOINT}", json=payload)
+        # Runner nodes authenticate, so coverage is checked for their hardware profile
+        response = requests.post(f"{config.get('server_url')}/{API_ENDPOINT}", json=payload,
+                                 headers=auth_headers(config))
         response.raise_for_status()
         return response.json()
     except RequestException as e:
         logging.error(f"Error checking benchmark combinations: {e}")
         return []
 
+def covered_commits(config, commits):
+    """Commits the server already has results for in every configured combination and metric."""
+    combinations = [{"client_config": client_config, "command": command}
+                    for client_config in config['client_configs'] for command in config['commands']]
+    metrics = config['metrics'] + config['internal_affairs_metrics']
+    covered = set()
+    for start in range(0, len(commits), COVERAGE_BATCH):
+        payload = {"commits": commits[start:start + COVERAGE_BATCH], "combinations": combinations,
+                   "metrics": metrics}
+        try:
+            covered.update(runner_node.post(config, COVERAGE_ENDPOINT, payload)['complete'])
+        except (RequestException, ValueError, KeyError) as e:
+            logging.error(f"Error fetching coverage, treating these commits as not covered: {e}")
+    return covered
+
+def first_uncovered_commit(commits, config):
+    """The first of the commits the server lacks results for, checked a batch of commits at a time."""
+    for start in range(0, len(commits), COVERAGE_BATCH):
+        batch = commits[start:start + COVERAGE_BATCH]
+        covered = covered_commits(config, batch)
+        for commit in batch:
+            if commit not in covered:
+                return commit
+    return None
+
 def find_commits_to_benchmark(commits, commit_dates, config):
-    """Find commits that need benchmarking, considering the time period and configuration combinations."""
+    """Find commits that need benchmarking, considering the time period and configuration combinations.
+
+    commits are ordered newest first along the first-parent chain, commit_dates are their datetimes.
+    """
     logging.info("Searching for the next commits that need benchmarking...")
     
     today = datetime.now()
@@ -80,13 +112,8 @@ def find_commits_to_benchmark(commits, commit_dates, config):
 
     commits_to_benchmark = []
     new_commits = []
-    historical_commit_to_benchmark = None
-
-    commits_and_dates = sorted(zip(commits, commit_dates), key=lambda x: x[1], reverse=True)
 
-    for commit, commit_date in commits_and_dates:
-        commit_datetime = datetime.strptime(commit_date, '%Y-%m-%d')
-        
+    for commit, commit_datetime in zip(commits, commit_dates):
         if commit_datetime >= last_monday:
             new_commits.append(commit)
             missing_combinations = send_benchmark_request(commit, config)
@@ -96,26 +123,62 @@ def find_commits_to_benchmark(commits, commit_dates, config):
                 if len(commits_to_benchmark) >= MAX_COMMITS:
                     break
 
-    if not commits_to_benchmark:
-        for commit, commit_date in commits_and_dates:
-            if commit not in new_commits:
-                missing_combinations = send_benchmark_request(commit, config)
-                if missing_combinations:
-                    logging.info(f"Found historical commit {commit} that needs benchmarking.")
-                    historical_commit_to_benchmark = commit
-                    break
-
     if commits_to_benchmark:
         logging.info(f"Found {len(commits_to_benchmark)} recent commits that need benchmarks.")
-        return list(set(commits_to_benchmark))[:MAX_COMMITS]
-    elif historical_commit_to_benchmark:
+        return commits_to_benchmark[:MAX_COMMITS]
+
+    # The whole history is a candidate, its coverage is checked in batches instead of commit by commit
+    historical_commit_to_benchmark = first_uncovered_commit(
+        [commit for commit in commits if commit not in new_commits], config)
+    if historical_commit_to_benchmark:
         logging.info(f"Returning one most recent historical commit for benchmarking: {historical_commit_to_benchmark}")
         return [historical_commit_to_benchmark]
-    else:
-        logging.info("No commits need benchmarking.")
+    logging.info("No commits need benchmarking.")
+    return []
+
+def find_slowdowns(base_commit, head_commit, config):
+    """Return the combinations that got significantly slower from base to head, largest change first."""
+    try:
+        response = requests.get(f"{config.get('server_url')}/{COMPARE_ENDPOINT}",
+                                params={"base": base_commit, "head": head_commit, "significant_only": "true"})
+        response.raise_for_status()
+        results = response.json()['results']
+    except (RequestException, ValueError, KeyError) as e:
+        logging.error(f"Error comparing {base_commit} with {head_commit}: {e}")
         return []
 
+    cache_types = ['cold_cache', 'warm_cache', 'hot_cache']
+    slowdowns = [result for result in results
+                 if any(result[f'{cache_type}_significant'] and result[f'{cache_type}_delta'] > 0
+                        for cache_type in cache_types)]
+    logging.info(f"Found {len(slowdowns)} significant slowdowns from {base_commit} to {head_commit}.")
+    return slowdowns
+
+def compare_main(args):
+    """check_benchmarks.py compare <base_commit> <head_commit> [config_path]"""
+    if len(args) < 2:
+        print("Usage: check_benchmarks.py compare <base_commit> <head_commit> [config_path]")
+        exit(1)
+
+    config = load_benchmark_config(args[2] if len(args) > 2 else None)
+    if config is None:
+        print("ERROR_LOADING_CONFIG")
+        exit(1)
+
+    slowdowns = find_slowdowns(args[0], args[1], config)
+    for result in slowdowns:
+        ratios = ' '.join(f"{cache_type}={result[f'{cache_type}_ratio']:.3f}"
+                          for cache_type in ['cold_cache', 'warm_cache', 'hot_cache']
+                          if result[f'{cache_type}_ratio'] is not None)
+        print(f"{result['client_config_name']} {result['command_name']} {result['metric_name']} {ratios}")
+    if not slowdowns:
+        print("NO_SLOWDOWNS")
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'compare':
+        compare_main(sys.argv[2:])
+        exit(0)
+
     config_path = sys.argv[1] if len(sys.argv) > 1 else None
 
     logging.info("Starting check_benchmarks.py script.")
@@ -126,7 +189,11 @@ if __name__ == "__main__":
         print("ERROR_LOADING_CONFIG")
         exit(1)
 
-    commits, commit_dates = get_commits_from_repo()
+    try:
+        commit_index.update_index()
+    except Exception as e:
+        logging.error(f"Error updating the commit index: {e}")
+    commits, commit_dates = get_commits_from_index()
     if not commits:
         logging.error("Error fetching commits. Exiting script.")
         print("ERROR_FETCHING_COMMITS")
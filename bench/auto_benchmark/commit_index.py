@@ -0,0 +1,176 @@
+import sys
+import sqlite3
+import logging
+import argparse
+import subprocess
+from datetime import datetime
+
+INDEX_PATH = "/root/auto_benchmark/commit_index.db"
+REPO_PATH = "/root/auto_benchmark/cvmfs-devel-current"
+DEFAULT_REF = "origin/devel"
+# Commits per query, below SQLite's limit of bound variables
+QUERY_BATCH = 500
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS "IndexedCommit" (
+    "hash" TEXT PRIMARY KEY,
+    -- Position on the first-parent chain of the branch, its root commit is 0
+    "position" INTEGER NOT NULL UNIQUE,
+    -- Committer and author timestamps in seconds since the epoch
+    "commit_time" INTEGER NOT NULL,
+    "author_time" INTEGER NOT NULL,
+    -- YYYYMMDDHHMMSS in the committer's time zone, the format the server stores
+    "commit_datetime" TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS "Tag" (
+    "name" TEXT PRIMARY KEY,
+    "hash" TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS "TagByHash" ON "Tag" ("hash");
+
+-- The ref the index follows and the commit it was last updated to
+CREATE TABLE IF NOT EXISTS "IndexState" (
+    "ref" TEXT NOT NULL,
+    "head" TEXT NOT NULL
+);
+'''
+
+
+def git(repo_path, *args):
+    return subprocess.run(['git', *args], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                          cwd=repo_path, check=True).stdout
+
+
+def read_first_parent_log(repo_path, revision_range):
+    """Commits of a range along the first-parent chain, oldest first, as (hash, first parent, times, datetime)."""
+    commits = []
+    output = git(repo_path, 'log', '--first-parent', '--reverse', '--format=%H%x09%P%x09%ct%x09%at%x09%cI',
+                 revision_range)
+    for line in output.splitlines():
+        commit_hash, parents, commit_time, author_time, committer_date = line.split('\t')
+        commit_datetime = datetime.fromisoformat(committer_date).strftime('%Y%m%d%H%M%S')
+        commits.append((commit_hash, parents.split(' ')[0] if parents else None,
+                        int(commit_time), int(author_time), commit_datetime))
+    return commits
+
+
+def read_tags(repo_path):
+    """Tag names and the commits they point to, annotated tags peeled."""
+    tags = []
+    output = git(repo_path, 'for-each-ref', 'refs/tags', '--format=%(refname:short)%09%(objectname)%09%(*objectname)')
+    for line in output.splitlines():
+        name, target, peeled = line.split('\t')
+        tags.append((name, peeled or target))
+    return tags
+
+
+def connect(index_path=INDEX_PATH):
+    conn = sqlite3.connect(index_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def update(conn, repo_path=REPO_PATH, ref=DEFAULT_REF):
+    """Index the commits added to ref since the last update, and refresh the tags.
+
+    Only the new part of the first-parent chain is read from git. The index is rebuilt when it
+    follows another ref or the indexed head is no longer on the chain, e.g. after a force push.
+    Returns the number of newly indexed commits.
+    """
+    tip = git(repo_path, 'rev-parse', f'{ref}^{{commit}}').strip()
+    state = conn.execute('SELECT "ref", "head" FROM "IndexState"').fetchone()
+
+    new_commits, rebuild = [], True
+    if state == (ref, tip):
+        rebuild = False
+    elif state is not None and state[0] == ref:
+        try:
+            new_commits = read_first_parent_log(repo_path, f'{state[1]}..{tip}')
+            rebuild = not new_commits or new_commits[0][1] != state[1]
+        except subprocess.CalledProcessError:
+            pass  # The indexed head is gone from the repository
+    if rebuild:
+        logging.info(f"Rebuilding the commit index of {ref}.")
+        new_commits = read_first_parent_log(repo_path, tip)
+
+    tags = read_tags(repo_path)
+    with conn:
+        if rebuild:
+            conn.execute('DELETE FROM "IndexedCommit"')
+        start = conn.execute('SELECT COALESCE(MAX("position") + 1, 0) FROM "IndexedCommit"').fetchone()[0]
+        conn.executemany('''
+            INSERT INTO "IndexedCommit" ("hash", "position", "commit_time", "author_time", "commit_datetime")
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(commit_hash, start + offset, commit_time, author_time, commit_datetime)
+              for offset, (commit_hash, _, commit_time, author_time, commit_datetime) in enumerate(new_commits)])
+        conn.execute('DELETE FROM "IndexState"')
+        conn.execute('INSERT INTO "IndexState" ("ref", "head") VALUES (?, ?)', (ref, tip))
+        conn.execute('DELETE FROM "Tag"')
+        conn.executemany('INSERT INTO "Tag" ("name", "hash") VALUES (?, ?)', tags)
+    logging.info(f"Indexed {len(new_commits)} new commits of {ref} up to {tip}, {len(tags)} tags.")
+    return len(new_commits)
+
+
+def update_index(index_path=INDEX_PATH, repo_path=REPO_PATH, ref=DEFAULT_REF):
+    conn = connect(index_path)
+    try:
+        return update(conn, repo_path, ref)
+    finally:
+        conn.close()
+
+
+def newest_commits(conn, limit=None):
+    """Indexed commits newest first along the first-parent chain, as (hash, committer datetime)."""
+    rows = conn.execute('''
+        SELECT "hash", "commit_time" FROM "IndexedCommit" ORDER BY "position" DESC LIMIT ?
+    ''', (-1 if limit is None else limit,)).fetchall()
+    return [(commit_hash, datetime.fromtimestamp(commit_time)) for commit_hash, commit_time in rows]
+
+
+def commit_datetimes(conn, commit_hashes):
+    """YYYYMMDDHHMMSS committer datetimes of the indexed commits among commit_hashes."""
+    datetimes = {}
+    for start in range(0, len(commit_hashes), QUERY_BATCH):
+        batch = commit_hashes[start:start + QUERY_BATCH]
+        datetimes.update(conn.execute(f'''
+            SELECT "hash", "commit_datetime" FROM "IndexedCommit" WHERE "hash" IN ({', '.join('?' for _ in batch)})
+        ''', batch).fetchall())
+    return datetimes
+
+
+def tags_by_commit(conn):
+    tags = {}
+    for name, commit_hash in conn.execute('SELECT "name", "hash" FROM "Tag" ORDER BY "name"'):
+        tags.setdefault(commit_hash, []).append(name)
+    return tags
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local index of the benchmarked branch's commits.")
+    parser.add_argument('--index', default=INDEX_PATH)
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    update_parser = subparsers.add_parser('update', help="Index the commits fetched since the last update")
+    update_parser.add_argument('--repo', default=REPO_PATH)
+    update_parser.add_argument('--ref', default=DEFAULT_REF)
+    log_parser = subparsers.add_parser('log', help="List the newest indexed commits")
+    log_parser.add_argument('-n', type=int, default=20)
+    args = parser.parse_args()
+
+    log_file_path = "/root/auto_benchmark/commit_index.log"
+    logging.basicConfig(
+        filename=log_file_path,
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+    )
+
+    if args.action == 'update':
+        print(f"Indexed {update_index(args.index, args.repo, args.ref)} new commits.")
+        sys.exit(0)
+
+    conn = connect(args.index)
+    tags = tags_by_commit(conn)
+    for commit_hash, committed_at in newest_commits(conn, args.n):
+        print(f"{commit_hash} {committed_at:%Y-%m-%d %H:%M:%S} {' '.join(tags.get(commit_hash, []))}".rstrip())
+    conn.close()
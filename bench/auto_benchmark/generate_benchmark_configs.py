@@ -1,15 +1,34 @@
 import os
+import copy
+import json
 import yaml
 import logging
-import subprocess
+
+import replay_proxy
+import commit_index
+
+BENCHMARK_TEMPLATE_PATH = "/root/auto_benchmark/common_configs/config_benchmark_template.yaml"
+VISUALIZATION_TEMPLATE_PATH = "/root/auto_benchmark/common_configs/config_visualization_template.yaml"
+CLIENT_CONFIGS_FILE_NAME = "client_configs.json"
+
+
+def substitute_placeholders(node, placeholders):
+    """Recursively replace @PLACEHOLDERS@ in all string keys and values of a YAML tree."""
+    if isinstance(node, dict):
+        return {substitute_placeholders(key, placeholders): substitute_placeholders(value, placeholders)
+                for key, value in node.items()}
+    if isinstance(node, list):
+        return [substitute_placeholders(item, placeholders) for item in node]
+    if isinstance(node, str):
+        for placeholder, value in placeholders.items():
+            node = node.replace(placeholder, value)
+    return node
 
 
 class BenchmarkConfigGenerator:
-    def __init__(self, commit_hash, result_dir, config_path):
-        self.commit_hash = commit_hash
-        self.result_dir = result_dir
+    def __init__(self, config_path, index_path=commit_index.INDEX_PATH):
         self.config_path = config_path
-        self.benchmark_config = self.load_benchmark_config()
+        self.index_path = index_path
         self.version = "2.12.0.0"  # Hardcoded for now
 
         # Set up logging
@@ -20,103 +39,144 @@ class BenchmarkConfigGenerator:
             format='%(asctime)s - %(levelname)s - %(message)s',
         )
 
-    def load_benchmark_config(self):
-        """Load the benchmark YAML configuration."""
-        try:
-            with open(self.config_path, 'r') as file:
-                config = yaml.safe_load(file)
-                logging.info(f"Loaded benchmark configuration from {self.config_path}")
-                return config
-        except Exception as e:
-            logging.error(f"Error loading benchmark configuration: {e}")
-            return None
+        self.benchmark_config = self.load_yaml(self.config_path)
+        # Both templates are parsed once and reused for every commit of the batch
+        self.benchmark_template = self.load_yaml(BENCHMARK_TEMPLATE_PATH)
+        self.visualization_template = self.load_yaml(VISUALIZATION_TEMPLATE_PATH)
 
-    def get_commit_datetime(self):
-        """Fetch the commit datetime from the git repository."""
+    def load_yaml(self, path):
+        """Load a YAML file into a tree."""
         try:
-            commit_datetime = subprocess.run(
-                ['git', 'show', '-s', '--format=%ci', self.commit_hash],
-                stdout=subprocess.PIPE,
-                text=True
-            ).stdout.strip()
-            commit_datetime_formatted = commit_datetime.replace('-', '').replace(' ', '').replace(':', '')[0:-5]
-            return commit_datetime_formatted
+            with open(path, 'r') as file:
+                tree = yaml.safe_load(file)
+                logging.info(f"Loaded YAML from {path}")
+                return tree
         except Exception as e:
-            logging.error(f"Error fetching commit datetime: {e}")
+            logging.error(f"Error loading YAML from {path}: {e}")
             return None
 
-    def generate_benchmark_yaml(self):
-        """Generate the benchmark YAML based on the template."""
+    def get_commit_datetimes(self, commit_hashes):
+        """Look up the datetimes (YYYYMMDDHHMMSS) of all commits in the local commit index."""
         try:
-            template_path = "/root/auto_benchmark/common_configs/config_benchmark_template.yaml"
-            output_path = os.path.join(self.result_dir, "config-bench.yaml")
-
-            with open(template_path, 'r') as template_file:
-                benchmark_yaml = template_file.read()
-
-            commands = '["' + '", "'.join(self.benchmark_config.get('commands', [])) + '"]'
-            client_configs = '\n  - ["' + '", "'.join(self.benchmark_config.get('client_configs', [])) + '"]'
-
-            benchmark_yaml = benchmark_yaml.replace("@COMMIT_HASH@", self.commit_hash)
-            benchmark_yaml = benchmark_yaml.replace("@RESULT_DIR@", self.result_dir)
-            benchmark_yaml = benchmark_yaml.replace("@COMMANDS@", commands)
-            benchmark_yaml = benchmark_yaml.replace(" @CLIENT_CONFIGS@", client_configs)
-
-            with open(output_path, 'w') as file:
-                file.write(benchmark_yaml)
-            
-            logging.info(f"Generated benchmark YAML: {output_path}")
+            conn = commit_index.connect(self.index_path)
+            try:
+                return commit_index.commit_datetimes(conn, list(commit_hashes))
+            finally:
+                conn.close()
         except Exception as e:
-            logging.error(f"Error generating benchmark YAML: {e}")
-
-    def generate_visualization_yaml(self):
-        """Generate the visualization YAML based on the template."""
-        try:
-            template_path = "/root/auto_benchmark/common_configs/config_visualization_template.yaml"
-            output_path = os.path.join(self.result_dir, "config-visual.yaml")
-
-            with open(template_path, 'r') as template_file:
-                visualization_yaml = template_file.read()
-
-            commit_datetime = self.get_commit_datetime()
-            client_configs_visual = '["' + '", "'.join(self.benchmark_config.get('client_configs', [])) + '"]'
-            metrics_visual = '["' + '", "'.join(self.benchmark_config.get('metrics', [])) + '"]'
-            ia_metrics_visual = '["' + '", "'.join(self.benchmark_config.get('internal_affairs_metrics', [])) + '"]'
-
-            visualization_yaml = visualization_yaml.replace("@COMMIT_HASH@", self.commit_hash)
-            visualization_yaml = visualization_yaml.replace("@VERSION@", self.version)
-            visualization_yaml = visualization_yaml.replace("@COMMIT_DATETIME@", commit_datetime)
-            visualization_yaml = visualization_yaml.replace("@CLIENT_CONFIGS@", client_configs_visual)
-            visualization_yaml = visualization_yaml.replace("@METRICS@", metrics_visual)
-            visualization_yaml = visualization_yaml.replace("@IA_METRICS@", ia_metrics_visual)
-
-            with open(output_path, 'w') as file:
-                file.write(visualization_yaml)
-
-            logging.info(f"Generated visualization YAML: {output_path}")
-        except Exception as e:
-            logging.error(f"Error generating visualization YAML: {e}")
-
-    def generate_configs(self):
-        """Generate both the benchmark and visualization YAML files."""
-        if not self.benchmark_config:
-            logging.error("Benchmark configuration is not loaded, cannot generate YAML files.")
+            logging.error(f"Error reading commit datetimes from the commit index: {e}")
+            return {}
+
+    def get_repetitions(self):
+        """Number of repetitions of the first benchmark pass."""
+        adaptive_sampling = self.benchmark_config.get('adaptive_sampling') or {}
+        if adaptive_sampling.get('enabled'):
+            return adaptive_sampling.get('initial_repetitions', 3)
+        return self.benchmark_config.get('repetitions', 1)
+
+    def render_benchmark_config(self, commit_hash, result_dir, combinations=None):
+        """Fill the benchmark template tree for a commit.
+
+        combinations restricts the run to (client_config, command) pairs, e.g. the units leased by a
+        runner node. The template runs every command with every client config, so the run covers
+        the commands and client configs of all pairs.
+        """
+        config = substitute_placeholders(copy.deepcopy(self.benchmark_template), {
+            "@COMMIT_HASH@": commit_hash,
+            "@RESULT_DIR@": result_dir,
+        })
+        run = config[f"run-{commit_hash}"]
+        commands = list(self.benchmark_config.get('commands', []))
+        client_configs = list(self.benchmark_config.get('client_configs', []))
+        if combinations:
+            commands = [command for command in commands if command in {c for _, c in combinations}]
+            client_configs = [config for config in client_configs if config in {c for c, _ in combinations}]
+        run['commands'] = commands
+        # Every client config is benchmarked as its own entry
+        run['client_configs'] = [[client_config] for client_config in client_configs]
+        run['repetitions'] = self.get_repetitions()
+        self.apply_replay_proxy(config)
+        return config
+
+    def apply_replay_proxy(self, config):
+        """Point CVMFS_HTTP_PROXY of every client config at the local replay proxy, if it is enabled."""
+        settings = replay_proxy.load_replay_proxy_config(self.benchmark_config)
+        if not settings['enabled']:
             return
-
-        self.generate_benchmark_yaml()
-        self.generate_visualization_yaml()
+        proxy_parameter = f'CVMFS_HTTP_PROXY="{replay_proxy.proxy_url(settings)}"'
+        for name, parameters in config['avail_client_configs'].items():
+            parameters = [p for p in parameters if not p.startswith('CVMFS_HTTP_PROXY=')]
+            config['avail_client_configs'][name] = [proxy_parameter] + parameters
+
+    def write_client_configs(self, benchmark_config, result_dir):
+        """Record the client config parameters the commit is benchmarked with, uploaded as run settings."""
+        run = next(value for key, value in benchmark_config.items() if key.startswith('run-'))
+        names = [name for entry in run['client_configs'] for name in entry]
+        client_configs = {name: benchmark_config['avail_client_configs'].get(name, []) for name in names}
+        with open(os.path.join(result_dir, CLIENT_CONFIGS_FILE_NAME), 'w') as file:
+            json.dump(client_configs, file, indent=2)
+
+    def render_visualization_config(self, commit_hash, commit_datetime):
+        """Fill the visualization template tree for a commit."""
+        config = substitute_placeholders(copy.deepcopy(self.visualization_template), {
+            "@COMMIT_HASH@": commit_hash,
+            "@VERSION@": self.version,
+            "@COMMIT_DATETIME@": commit_datetime,
+        })
+        append_to_csv = config['append_to_csv']
+        append_to_csv['client_configs'] = list(self.benchmark_config.get('client_configs', []))
+        append_to_csv['time_metrics'] = list(self.benchmark_config.get('metrics', []))
+        append_to_csv['internal_affairs_metrics'] = list(self.benchmark_config.get('internal_affairs_metrics', []))
+        return config
+
+    def write_yaml(self, tree, output_path):
+        with open(output_path, 'w') as file:
+            yaml.safe_dump(tree, file, sort_keys=False, default_flow_style=None)
+        logging.info(f"Generated YAML: {output_path}")
+
+    def generate_configs(self, commit_hashes, results_root, combinations_by_commit=None):
+        """Generate the benchmark and visualization YAML files for a batch of commits.
+
+        Each commit gets config-bench.yaml and config-visual.yaml in <results_root>/<commit>/.
+        combinations_by_commit optionally maps a commit to the (client_config, command) pairs to run.
+        Returns the list of commits for which both files were generated.
+        """
+        if not self.benchmark_config or not self.benchmark_template or not self.visualization_template:
+            logging.error("Benchmark configuration or templates are not loaded, cannot generate YAML files.")
+            return []
+
+        commit_datetimes = self.get_commit_datetimes(commit_hashes)
+        generated = []
+        for commit_hash in commit_hashes:
+            if commit_hash not in commit_datetimes:
+                logging.error(f"No datetime found for commit {commit_hash}, skipping.")
+                continue
+            try:
+                result_dir = os.path.join(results_root, commit_hash)
+                os.makedirs(result_dir, exist_ok=True)
+                combinations = (combinations_by_commit or {}).get(commit_hash)
+                benchmark_config = self.render_benchmark_config(commit_hash, result_dir, combinations)
+                self.write_yaml(benchmark_config, os.path.join(result_dir, "config-bench.yaml"))
+                self.write_client_configs(benchmark_config, result_dir)
+                self.write_yaml(self.render_visualization_config(commit_hash, commit_datetimes[commit_hash]),
+                                os.path.join(result_dir, "config-visual.yaml"))
+                generated.append(commit_hash)
+            except Exception as e:
+                logging.error(f"Error generating configs for commit {commit_hash}: {e}")
+        return generated
 
 
 if __name__ == "__main__":
     import sys
 
-    if len(sys.argv) != 3:
-        logging.error("Invalid arguments. Usage: generate_benchmark_configs.py <commit_hash> <result_dir>")
+    if len(sys.argv) < 3:
+        logging.error("Invalid arguments. Usage: generate_benchmark_configs.py <results_root> <commit_hash> [<commit_hash> ...]")
         sys.exit(1)
 
-    commit_hash = sys.argv[1]
-    result_dir = sys.argv[2]
+    results_root = sys.argv[1]
+    commit_hashes = sys.argv[2:]
     config_path = "/root/auto_benchmark/benchmark.yaml"
 
-    generator = BenchmarkConfigGenerator(commit_hash, result_dir, config_path)
-    generator.generate_configs()
+    generator = BenchmarkConfigGenerator(config_path)
+    generated = generator.generate_configs(commit_hashes, results_root)
+    sys.exit(0 if len(generated) == len(commit_hashes) else 1)
@@ -0,0 +1,367 @@
+import os
+import sys
+import json
+import time
+import fcntl
+import runpy
+import shutil
+import signal
+import logging
+
+# Plots are only ever written to files on the benchmark node
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import check_benchmarks
+import upload_benchmark_data
+import adaptive_sampling
+import quiet_run
+import runner_node
+import replay_proxy
+import parallel_execution
+import commit_index
+import summarize_results
+from generate_benchmark_configs import BenchmarkConfigGenerator, CLIENT_CONFIGS_FILE_NAME
+from stage_telemetry import TelemetryRecorder, load_telemetry
+
+PROJ_ROOT = "/root/auto_benchmark"
+RESULTS_ROOT = "/root/benchmark_results"
+BUILD_DIR = os.path.join(PROJ_ROOT, "cvmfs-devel-current/build")
+CLIENT_DIR = os.path.join(PROJ_ROOT, "cvmfs-benchmark-release/test/performance-benchmark/client")
+PYTHON = os.path.join(PROJ_ROOT, "benchmark_venv/bin/python")
+BENCHMARK_CONFIG_PATH = os.path.join(PROJ_ROOT, "benchmark.yaml")
+LOCK_PATH = "/tmp/run_bench.lock"
+PROGRESS_PATH = os.path.join(PROJ_ROOT, "progress.jsonl")
+SUMMARY_FILE_NAME = "summary.csv"
+# Telemetry of the stages run once per run, uploaded with the first commit benchmarked in the run
+RUN_TELEMETRY_PATH = os.path.join(RESULTS_ROOT, "run-telemetry.jsonl")
+
+
+class StageFailed(Exception):
+    pass
+
+
+class FileLock:
+    """Exclusive flock-based lock holding the owner's pid.
+
+    The kernel releases the lock when its owner dies, so a lock file left behind by a
+    crashed run never blocks the next one. A lock held by a pid that no longer exists is
+    reported as stale (the descriptor leaked into an orphaned child).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def acquire(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            owner = os.read(fd, 64).decode(errors='replace').strip()
+            os.close(fd)
+            if owner.isdigit() and not pid_alive(int(owner)):
+                logging.error(f"Stale lock {self.path}: owner pid {owner} is gone but the lock is still held "
+                              f"by an orphaned process.")
+            else:
+                logging.info(f"Lock {self.path} is held by running pid {owner or 'unknown'}.")
+            return False
+
+        previous_owner = os.read(fd, 64).decode(errors='replace').strip()
+        if previous_owner:
+            logging.warning(f"Took over stale lock file {self.path} left by pid {previous_owner}.")
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, str(os.getpid()).encode(), 0)
+        self.fd = fd
+        return True
+
+    def release(self):
+        if self.fd is not None:
+            os.ftruncate(self.fd, 0)
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def emit_progress(event, **fields):
+    """Append a structured progress event to progress.jsonl and the log."""
+    record = {"time": time.strftime('%Y-%m-%dT%H:%M:%S'), "event": event, **fields}
+    logging.info(f"Progress: {record}")
+    try:
+        with open(PROGRESS_PATH, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+    except Exception as e:
+        logging.error(f"Error writing progress to {PROGRESS_PATH}: {e}")
+
+
+def run_script_in_process(script_path, args, cwd):
+    """Run a Python script as __main__ inside this interpreter, reusing already imported modules."""
+    saved_argv, saved_cwd, saved_path = sys.argv, os.getcwd(), list(sys.path)
+    sys.argv = [script_path, *args]
+    sys.path.insert(0, os.path.dirname(script_path))
+    os.chdir(cwd)
+    try:
+        runpy.run_path(script_path, run_name="__main__")
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            raise StageFailed(f"{os.path.basename(script_path)} exited with {e.code}")
+    finally:
+        sys.argv, sys.path[:] = saved_argv, saved_path
+        os.chdir(saved_cwd)
+        if 'matplotlib.pyplot' in sys.modules:
+            sys.modules['matplotlib.pyplot'].close('all')
+
+
+def run_stage(recorder, commit, stage, command, cwd, **popen_kwargs):
+    emit_progress("stage_started", commit=commit, stage=stage)
+    exit_code = recorder.run_stage(stage, command, cwd=cwd, **popen_kwargs)
+    emit_progress("stage_finished", commit=commit, stage=stage, exit_code=exit_code)
+    if exit_code != 0:
+        raise StageFailed(f"Stage {stage} failed with exit code {exit_code}")
+
+
+def run_stage_in_process(recorder, commit, stage, func, *args):
+    emit_progress("stage_started", commit=commit, stage=stage)
+    try:
+        result = recorder.run_in_process(stage, func, *args)
+    except Exception:
+        emit_progress("stage_finished", commit=commit, stage=stage, exit_code=1)
+        raise
+    emit_progress("stage_finished", commit=commit, stage=stage, exit_code=0)
+    return result
+
+
+def visualize(config_visual_file, render_plots=False):
+    """Write results.csv with start_visualization.py, its plots are only rendered with render_plots."""
+    script_path = os.path.join(CLIENT_DIR, "start_visualization.py")
+    if render_plots:
+        run_script_in_process(script_path, ['-c', config_visual_file], CLIENT_DIR)
+    else:
+        with summarize_results.plots_skipped():
+            run_script_in_process(script_path, ['-c', config_visual_file], CLIENT_DIR)
+
+
+def visualize_commit(config_visual_file, render_plots=False):
+    """Write results.csv of a commit; the units of a parallel run are summarised one output directory at a time."""
+    for path in parallel_execution.visual_configs(config_visual_file):
+        visualize(path, render_plots)
+
+
+def upload(config, result_dir):
+    """Upload the processed results of a commit. Returns the commit the server stored them under."""
+    server_url = config.get('server_url')
+    headers = runner_node.auth_headers(config)
+    df = upload_benchmark_data.process_csv(upload_benchmark_data.csv_file_path,
+                                           upload_benchmark_data.processed_csv_path)
+    if df is None:
+        raise StageFailed("Processing of results.csv failed")
+    df = parallel_execution.annotate(df, result_dir)
+    df = upload_benchmark_data.add_tags(df, upload_benchmark_data.load_tags())
+    if not upload_benchmark_data.upload_dataframe(df, f"{server_url}/{upload_benchmark_data.upload_endpoint}",
+                                                  headers):
+        raise StageFailed("Upload of results.csv failed")
+    return df['commit'].iloc[0]
+
+
+def upload_telemetry(config, commit, telemetry_path, settings_paths):
+    upload_benchmark_data.upload_telemetry(telemetry_path, settings_paths, commit,
+                                           f"{config.get('server_url')}/{upload_benchmark_data.telemetry_endpoint}",
+                                           runner_node.auth_headers(config))
+
+
+def run_settings_paths(result_dir):
+    """Run settings files of a commit that are uploaded with its telemetry."""
+    return [quiet_run.settings_path(result_dir),
+            os.path.join(result_dir, adaptive_sampling.settings_file_name),
+            os.path.join(result_dir, CLIENT_CONFIGS_FILE_NAME),
+            os.path.join(result_dir, replay_proxy.settings_file_name),
+            parallel_execution.settings_path(result_dir)]
+
+
+def benchmark_commit(commit, config):
+    """Run the checkout, build, benchmark, summary and upload stages for one commit."""
+    result_dir = os.path.join(RESULTS_ROOT, commit)
+    recorder = TelemetryRecorder(os.path.join(result_dir, "telemetry.jsonl"))
+
+    run_stage(recorder, commit, "checkout", ['git', 'checkout', commit], BUILD_DIR)
+    run_stage(recorder, commit, "build", ['ninja'], BUILD_DIR)
+
+    if os.path.exists(upload_benchmark_data.csv_file_path):
+        os.remove(upload_benchmark_data.csv_file_path)
+
+    quiet_run_config = quiet_run.load_quiet_run_config(BENCHMARK_CONFIG_PATH)
+    if not run_stage_in_process(recorder, commit, "quiet_prepare", quiet_run.prepare, result_dir, quiet_run_config):
+        raise StageFailed("Host did not become idle for the quiet run")
+    try:
+        # The proxy runs unpinned, outside the CPUs reserved for the benchmark
+        with replay_proxy.ReplayProxy(replay_proxy.load_replay_proxy_config(config), result_dir):
+            execution = run_stage_in_process(recorder, commit, "parallel_prepare", parallel_execution.prepare,
+                                             result_dir, config, PYTHON, CLIENT_DIR)
+            if execution['mode'] == "parallel":
+                run_stage_in_process(recorder, commit, "benchmark", parallel_execution.run_benchmark,
+                                     result_dir, execution, PYTHON, CLIENT_DIR)
+            else:
+                config_bench_file = os.path.join(result_dir, "config-bench.yaml")
+                run_stage(recorder, commit, "benchmark",
+                          [PYTHON, os.path.join(CLIENT_DIR, "start_benchmark.py"), '-c', config_bench_file],
+                          CLIENT_DIR, preexec_fn=quiet_run.pinned_preexec(result_dir))
+            config_visual_file = os.path.join(result_dir, "config-visual.yaml")
+            render_plots = summarize_results.load_summary_config(config)['render_plots']
+            run_stage_in_process(recorder, commit, "visualization", visualize_commit, config_visual_file, render_plots)
+
+            if (config.get('adaptive_sampling') or {}).get('enabled'):
+                def summarize(path):
+                    visualize_commit(path, render_plots)
+
+                summary = run_stage_in_process(recorder, commit, "adaptive_sampling", adaptive_sampling.sample,
+                                               result_dir, config, summarize,
+                                               parallel_execution.unit_out_dirs(result_dir))
+                with open(os.path.join(result_dir, adaptive_sampling.settings_file_name), 'w') as f:
+                    json.dump(summary, f, indent=2)
+    finally:
+        quiet_run.restore(result_dir)
+
+    # results.csv is shared by all commits, a copy of it stays with the commit for backfill.py
+    if os.path.exists(upload_benchmark_data.csv_file_path):
+        shutil.copyfile(upload_benchmark_data.csv_file_path, os.path.join(result_dir, SUMMARY_FILE_NAME))
+    uploaded_commit = run_stage_in_process(recorder, commit, "upload", upload, config, result_dir)
+    # Sent once the upload stage is over, so its own record is part of the telemetry
+    upload_telemetry(config, uploaded_commit, recorder.telemetry_path, run_settings_paths(result_dir))
+
+
+def attach_run_telemetry(commit):
+    """Move the telemetry of the run's fetch, index and config stages into the telemetry of a commit."""
+    records = load_telemetry(RUN_TELEMETRY_PATH)
+    with open(os.path.join(RESULTS_ROOT, commit, "telemetry.jsonl"), 'a') as f:
+        f.writelines(json.dumps(record) + '\n' for record in records)
+    os.remove(RUN_TELEMETRY_PATH)
+
+
+def report_slowdowns(commit, commits, config):
+    """Compare a freshly uploaded commit with its predecessor and log what got slower."""
+    index = commits.index(commit) if commit in commits else -1
+    if index < 0 or index + 1 >= len(commits):
+        return
+    base = commits[index + 1]
+    slowdowns = check_benchmarks.find_slowdowns(base, commit, config)
+    if slowdowns:
+        emit_progress("slowdowns_found", commit=commit, base=base, count=len(slowdowns),
+                      top=[f"{r['client_config_name']}/{r['command_name']}/{r['metric_name']}" for r in slowdowns[:5]])
+
+
+def orchestrate():
+    config = check_benchmarks.load_benchmark_config(BENCHMARK_CONFIG_PATH)
+    if config is None:
+        logging.error("Error loading benchmark configuration.")
+        return 1
+
+    os.chdir(BUILD_DIR)
+    if os.path.exists(RUN_TELEMETRY_PATH):
+        os.remove(RUN_TELEMETRY_PATH)
+    run_recorder = TelemetryRecorder(RUN_TELEMETRY_PATH)
+    try:
+        run_stage(run_recorder, None, "fetch", ['git', 'fetch', 'origin', 'devel'], BUILD_DIR)
+        run_stage_in_process(run_recorder, None, "index_commits", commit_index.update_index)
+    except Exception as e:
+        logging.error(f"Updating the commit history failed: {e}")
+        emit_progress("run_failed", error=str(e))
+        return 4
+
+    commits, commit_dates = check_benchmarks.get_commits_from_index()
+    if not commits:
+        logging.error("Error reading commits from the commit index.")
+        emit_progress("run_failed", error="no commits in the commit index")
+        return 1
+
+    # Runner nodes lease units of work from the server, newest commits first, and share them with
+    # the other nodes of their hardware profile. A single node picks its commits itself.
+    leases_by_commit = {}
+    if runner_node.load_runner_config(config)['enabled']:
+        # The full history is offered a batch at a time, newest first, until a batch has work left
+        for start in range(0, len(commits), check_benchmarks.COVERAGE_BATCH):
+            for lease in runner_node.claim(config, commits[start:start + check_benchmarks.COVERAGE_BATCH]):
+                leases_by_commit.setdefault(lease['commit'], []).append(lease)
+            if leases_by_commit:
+                break
+        next_commits = list(leases_by_commit)
+    else:
+        next_commits = check_benchmarks.find_commits_to_benchmark(commits, commit_dates, config)
+    emit_progress("commits_selected", commits=next_commits)
+    if not next_commits:
+        return 0
+
+    for commit in next_commits:
+        shutil.rmtree(os.path.join(RESULTS_ROOT, commit), ignore_errors=True)
+
+    generator = BenchmarkConfigGenerator(BENCHMARK_CONFIG_PATH)
+    combinations_by_commit = {commit: [(lease['client_config'], lease['command']) for lease in leases]
+                              for commit, leases in leases_by_commit.items()}
+    generated, error = [], "no configs generated"
+    try:
+        generated = run_stage_in_process(run_recorder, None, "generate_configs", generator.generate_configs,
+                                         next_commits, RESULTS_ROOT, combinations_by_commit)
+    except Exception as e:
+        logging.error(f"Generating the benchmark configs failed: {e}")
+        error = str(e)
+    for commit in set(leases_by_commit) - set(generated):
+        runner_node.finish(config, [lease['id'] for lease in leases_by_commit[commit]], failed=True)
+    if not generated:
+        emit_progress("run_failed", error=error)
+        return 4
+    attach_run_telemetry(generated[0])
+
+    failed = []
+    for index, commit in enumerate(generated, start=1):
+        emit_progress("commit_started", commit=commit, index=index, total=len(generated))
+        lease_ids = [lease['id'] for lease in leases_by_commit.get(commit, [])]
+        try:
+            with runner_node.LeaseRenewer(config, lease_ids):
+                benchmark_commit(commit, config)
+            runner_node.finish(config, lease_ids)
+            emit_progress("commit_finished", commit=commit, index=index, total=len(generated))
+            report_slowdowns(commit, commits, config)
+        except Exception as e:
+            logging.error(f"Benchmark of commit {commit} failed: {e}")
+            runner_node.finish(config, lease_ids, failed=True)
+            emit_progress("commit_failed", commit=commit, index=index, total=len(generated), error=str(e))
+            failed.append(commit)
+
+    emit_progress("run_finished", benchmarked=len(generated) - len(failed), failed=failed)
+    return 3 if failed else 0
+
+
+def handle_sigterm(signum, frame):
+    # Unwind through the finally blocks so the governor is restored and the lock released
+    raise SystemExit(2)
+
+
+if __name__ == "__main__":
+    # Imported modules configure their own log files, this process logs to one place
+    log_file_path = os.path.join(PROJ_ROOT, "orchestrate.log")
+    logging.basicConfig(
+        filename=log_file_path,
+        level=logging.DEBUG,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        force=True,
+    )
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+    lock = FileLock(LOCK_PATH)
+    if not lock.acquire():
+        emit_progress("already_running")
+        sys.exit(1)
+
+    emit_progress("run_started", pid=os.getpid())
+    try:
+        sys.exit(orchestrate())
+    finally:
+        lock.release()
@@ -0,0 +1,400 @@
+import os
+import json
+import time
+import shutil
+import logging
+import subprocess
+import pandas as pd
+import yaml
+
+import quiet_run
+import adaptive_sampling
+import summarize_results
+from stage_telemetry import terminate_process
+
+settings_file_name = "parallel_execution.json"
+
+DEFAULT_PARALLEL_EXECUTION = {
+    "enabled": False,
+    # CPUs shared out among the units; "auto" uses the CPUs of the quiet run, or else all CPUs of the process
+    "cpus": "auto",
+    "cpus_per_unit": 4,
+    # Units running at the same time, 0 runs one on every CPU set
+    "max_units": 0,
+    # Every CPU set has its own CVMFS_CACHE_BASE below cache_root
+    "cache_root": "/root/auto_benchmark/parallel_cache",
+    # Interference calibration: the reference unit is run alone and then on every CPU set at once
+    "reference_client_config": "default",
+    "reference_command": "root",
+    "calibration_repetitions": 3,
+    "calibration_metrics": ["real"],
+    # Largest relative shift of a parallel median against the serial one that still allows parallel runs
+    "tolerance": 0.05,
+    "calibration_path": "/root/auto_benchmark/parallel_calibration.json",
+    "calibration_max_age_days": 7,
+}
+
+CPU_TOPOLOGY_PATH = "/sys/devices/system/cpu/cpu{}/topology/{}"
+CACHE_STATES = ['cold_cache', 'warm_cache', 'hot_cache']
+
+
+def load_parallel_config(config):
+    """The parallel_execution section of benchmark.yaml, filled with defaults."""
+    parallel = dict(DEFAULT_PARALLEL_EXECUTION)
+    parallel.update((config or {}).get('parallel_execution') or {})
+    return parallel
+
+
+def read_topology(cpu, name):
+    try:
+        with open(CPU_TOPOLOGY_PATH.format(cpu, name), 'r') as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return cpu
+
+
+def cpu_sets(cpus, cpus_per_unit, max_units=0):
+    """Split CPUs into disjoint sets of cpus_per_unit CPUs.
+
+    CPUs are ordered by package and core first, so hyperthread siblings end up in the same set
+    wherever the set size allows it. Leftover CPUs are not used.
+    """
+    ordered = sorted(cpus, key=lambda cpu: (read_topology(cpu, 'physical_package_id'),
+                                            read_topology(cpu, 'core_id'), cpu))
+    sets = [sorted(ordered[start:start + cpus_per_unit])
+            for start in range(0, len(ordered) - cpus_per_unit + 1, cpus_per_unit)]
+    return sets[:max_units] if max_units else sets
+
+
+def available_cpus(parallel, result_dir):
+    if parallel['cpus'] != "auto":
+        available = os.sched_getaffinity(0)
+        return [cpu for cpu in quiet_run.parse_cpu_list(parallel['cpus']) if cpu in available]
+    return quiet_run.load_settings(result_dir).get('pinned_cpus') or sorted(os.sched_getaffinity(0))
+
+
+def write_unit_config(source_path, output_path, suffix, client_config, command, cache_dir, **run_overrides):
+    """Write a copy of a benchmark config restricted to one (client config, command) unit.
+
+    The unit gets its own CVMFS cache directory and mounts its repositories itself instead of
+    through the host's autofs, inside the private mount namespace it is started in.
+    """
+    with open(source_path, 'r') as f:
+        config = yaml.safe_load(f)
+
+    run_key = next(key for key in config if key.startswith('run-'))
+    run = config.pop(run_key)
+    run['commands'] = [command]
+    run['client_configs'] = [[client_config]]
+    run['use_autofs'] = False
+    run.update(run_overrides)
+    config[f'{run_key}-{suffix}'] = run
+
+    parameters = [p for p in config['avail_client_configs'].get(client_config, [])
+                  if not p.startswith('CVMFS_CACHE_BASE=')]
+    config['avail_client_configs'][client_config] = parameters + [f'CVMFS_CACHE_BASE={cache_dir}']
+
+    with open(output_path, 'w') as f:
+        yaml.safe_dump(config, f, sort_keys=False)
+    return output_path
+
+
+def write_visual_config(source_path, output_path, unit_dir, **append_to_csv):
+    """Write a copy of a visualization config summarising the results of one unit output directory.
+
+    The plots of the unit are written next to its results, so the units do not overwrite each other's.
+    """
+    with open(source_path, 'r') as f:
+        config = yaml.safe_load(f)
+    config['in_dirname'] = os.path.join(unit_dir, '')
+    config['out_dirname'] = os.path.join(unit_dir, '')
+    config['append_to_csv'].update(append_to_csv)
+    with open(output_path, 'w') as f:
+        yaml.safe_dump(config, f, sort_keys=False, default_flow_style=None)
+    return output_path
+
+
+class UnitScheduler:
+    """Runs benchmark units side by side, at most one per CPU set.
+
+    Each unit is pinned to its CPU set, uses the cache directory of the set and runs in a private
+    mount namespace, so the units share neither CPUs, caches nor mountpoints.
+    """
+
+    def __init__(self, cpu_sets, cache_root, python, client_dir):
+        self.cpu_sets = cpu_sets
+        self.cache_root = cache_root
+        self.python = python
+        self.client_dir = client_dir
+
+    def cache_dir(self, slot):
+        return os.path.join(self.cache_root, f"set{slot}")
+
+    def command(self, config_file):
+        return ['unshare', '--mount', '--propagation', 'private',
+                self.python, os.path.join(self.client_dir, "start_benchmark.py"), '-c', config_file]
+
+    def start(self, unit, slot, source_path, config_dir, run_overrides):
+        cache_dir = self.cache_dir(slot)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        os.makedirs(cache_dir)
+        config_file = write_unit_config(
+            source_path, os.path.join(config_dir, f"config-bench-{unit['name']}.yaml"), unit['name'],
+            unit['client_config'], unit['command'], cache_dir, **dict(run_overrides, **unit.get('run', {})))
+        cpus = self.cpu_sets[slot]
+        logging.info(f"Starting unit {unit['name']} on CPUs {cpus}")
+        return subprocess.Popen(self.command(config_file), cwd=self.client_dir,
+                                preexec_fn=lambda: os.sched_setaffinity(0, cpus))
+
+    def run(self, units, source_path, config_dir, **run_overrides):
+        """Run units, dicts with name, client_config, command and optional run overrides, until all finished.
+
+        Returns one record per unit with its CPU set, cache directory, exit code and wall time.
+        """
+        pending, running, records = list(units), {}, []
+        free_slots = list(range(len(self.cpu_sets)))
+        try:
+            while pending or running:
+                while pending and free_slots:
+                    unit, slot = pending.pop(0), free_slots.pop(0)
+                    running[self.start(unit, slot, source_path, config_dir, run_overrides)] = (
+                        unit, slot, time.monotonic())
+                time.sleep(1)
+                self.collect(running, free_slots, records)
+        except BaseException:
+            # E.g. SystemExit from a SIGTERM handler, no unit may outlive the pipeline
+            for process in running:
+                terminate_process(process)
+            raise
+        return records
+
+    def collect(self, running, free_slots, records):
+        """Record the units that finished and free their CPU sets."""
+        for process in [process for process in running if process.poll() is not None]:
+            unit, slot, started = running.pop(process)
+            free_slots.append(slot)
+            records.append({
+                "client_config": unit['client_config'],
+                "command": unit['command'],
+                "out_dirname": unit.get('run', {}).get('out_dirname'),
+                "cpus": self.cpu_sets[slot],
+                "cache_dir": self.cache_dir(slot),
+                "exit_code": process.returncode,
+                "wall_time": round(time.monotonic() - started, 1),
+            })
+            logging.info(f"Unit {unit['name']} finished with exit code {process.returncode}")
+
+
+def reference_medians(result_dir, unit_dir, parallel, python, client_dir):
+    """Medians per (metric, cache state) of the reference unit, as start_visualization.py summarises them."""
+    results_path = os.path.join(unit_dir, "results.csv")
+    config_path = write_visual_config(
+        os.path.join(result_dir, "config-visual.yaml"), os.path.join(unit_dir, "config-visual.yaml"), unit_dir,
+        full_out_name=results_path, client_configs=[parallel['reference_client_config']])
+    visualization = subprocess.run(summarize_results.summary_command(python, client_dir, config_path),
+                                   cwd=client_dir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if visualization.returncode != 0:
+        logging.error(f"Summarising the calibration results in {unit_dir} failed: {visualization.stderr}")
+        return {}
+    try:
+        df = pd.read_csv(results_path)
+    except (OSError, ValueError) as e:
+        logging.error(f"Reading {results_path} failed: {e}")
+        return {}
+
+    df.columns = df.columns.str.strip()
+    df['metric'] = df['metric'].str.strip().str.replace(r'^sft\.cern\.ch_', '', regex=True)
+    df = df[(df['command_label'].str.strip() == parallel['reference_command'])
+            & df['metric'].isin(parallel['calibration_metrics'])]
+    return {(row['metric'], cache): row[f'{cache}_median']
+            for _, row in df.iterrows() for cache in CACHE_STATES if row[f'{cache}_median'] > 0}
+
+
+def calibrate(result_dir, parallel, sets, python, client_dir):
+    """Run the reference unit alone and then on every CPU set at once, and measure the interference.
+
+    Returns the calibration record; its deviation is the largest relative shift of a parallel
+    median against the serial one, None if the calibration produced no comparable results.
+    """
+    # Outside the result directory, the summaries of the commit must not pick up the reference runs
+    calibration_dir = os.path.join(parallel['cache_root'], "calibration")
+    shutil.rmtree(calibration_dir, ignore_errors=True)
+    os.makedirs(calibration_dir)
+    scheduler = UnitScheduler(sets, parallel['cache_root'], python, client_dir)
+    source_path = os.path.join(result_dir, "config-bench.yaml")
+    reference = {"client_config": parallel['reference_client_config'], "command": parallel['reference_command']}
+    run_overrides = {"repetitions": parallel['calibration_repetitions']}
+
+    def unit(name):
+        out_dirname = os.path.join(calibration_dir, name)
+        os.makedirs(out_dirname, exist_ok=True)
+        return dict(reference, name=f"calibration-{name}", run={"out_dirname": out_dirname})
+
+    start = time.monotonic()
+    records = scheduler.run([unit("serial")], source_path, calibration_dir, **run_overrides)
+    records += scheduler.run([unit(f"parallel{slot}") for slot in range(len(sets))],
+                             source_path, calibration_dir, **run_overrides)
+
+    deviation = None
+    serial = reference_medians(result_dir, os.path.join(calibration_dir, "serial"), parallel, python, client_dir)
+    if serial and all(record['exit_code'] == 0 for record in records):
+        copies = [reference_medians(result_dir, os.path.join(calibration_dir, f"parallel{slot}"), parallel,
+                                    python, client_dir)
+                  for slot in range(len(sets))]
+        if all(set(serial) <= set(medians) for medians in copies):
+            deviation = round(max(abs(medians[key] / serial[key] - 1) for medians in copies for key in serial), 4)
+
+    calibration = {
+        "measured_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "cpu_sets": sets,
+        "reference": [parallel['reference_client_config'], parallel['reference_command']],
+        "repetitions": parallel['calibration_repetitions'],
+        "metrics": parallel['calibration_metrics'],
+        "deviation": deviation,
+        "duration": round(time.monotonic() - start, 1),
+    }
+    logging.info(f"Interference calibration: {calibration}")
+    return calibration
+
+
+def load_calibration(parallel, sets):
+    """The stored calibration, if it was made for the same CPU sets and reference and has not expired."""
+    try:
+        with open(parallel['calibration_path'], 'r') as f:
+            calibration = json.load(f)
+    except (OSError, ValueError):
+        return None
+    age = time.time() - time.mktime(time.strptime(calibration['measured_at'], '%Y-%m-%dT%H:%M:%S'))
+    if (calibration['cpu_sets'] != sets
+            or calibration['reference'] != [parallel['reference_client_config'], parallel['reference_command']]
+            or calibration['repetitions'] != parallel['calibration_repetitions']
+            or calibration['metrics'] != parallel['calibration_metrics']
+            or age > parallel['calibration_max_age_days'] * 24 * 60 * 60):
+        return None
+    return calibration
+
+
+def prepare(result_dir, config, python, client_dir):
+    """Decide whether the units of a commit run in parallel, calibrating the interference if needed.
+
+    Returns the execution settings, also written to <result_dir>/parallel_execution.json.
+    """
+    parallel = load_parallel_config(config)
+    settings = {"enabled": bool(parallel['enabled']), "mode": "serial"}
+    if not parallel['enabled']:
+        write_settings(result_dir, settings)
+        return settings
+
+    sets = cpu_sets(available_cpus(parallel, result_dir), parallel['cpus_per_unit'], parallel['max_units'])
+    settings.update({"cpu_sets": sets, "cache_root": parallel['cache_root'], "tolerance": parallel['tolerance']})
+    if len(sets) < 2:
+        settings['reason'] = f"fewer than two sets of {parallel['cpus_per_unit']} CPUs"
+    else:
+        calibration = load_calibration(parallel, sets)
+        if calibration is None:
+            calibration = calibrate(result_dir, parallel, sets, python, client_dir)
+            with open(parallel['calibration_path'], 'w') as f:
+                json.dump(calibration, f, indent=2)
+        settings['calibration'] = calibration
+        if calibration['deviation'] is None:
+            settings['reason'] = "calibration produced no comparable results"
+        elif calibration['deviation'] > parallel['tolerance']:
+            settings['reason'] = (f"calibration deviation {calibration['deviation']:.1%} "
+                                  f"above tolerance {parallel['tolerance']:.1%}")
+        else:
+            settings['mode'] = "parallel"
+
+    if settings['mode'] == "serial":
+        logging.warning(f"Falling back to serial runs: {settings['reason']}")
+    write_settings(result_dir, settings)
+    return settings
+
+
+def run_benchmark(result_dir, settings, python, client_dir):
+    """Run every (client config, command) unit of config-bench.yaml in parallel on the CPU sets.
+
+    Every unit writes its results to its own directory, <result_dir>/unit-<client config>-<command>/,
+    which visual_configs() summarises one by one.
+    """
+    source_path = os.path.join(result_dir, "config-bench.yaml")
+    with open(source_path, 'r') as f:
+        run = next(value for key, value in yaml.safe_load(f).items() if key.startswith('run-'))
+    units = []
+    for entry in run['client_configs']:
+        for client_config in entry:
+            for command in run['commands']:
+                name = f"{client_config}-{command}"
+                out_dirname = os.path.join(result_dir, f"unit-{name}")
+                os.makedirs(out_dirname, exist_ok=True)
+                units.append({"name": name, "client_config": client_config, "command": command,
+                              "run": {"out_dirname": out_dirname}})
+
+    scheduler = UnitScheduler(settings['cpu_sets'], settings['cache_root'], python, client_dir)
+    records = scheduler.run(units, source_path, result_dir)
+    settings['units'] = [dict(record, mode="parallel") for record in records]
+    write_settings(result_dir, settings)
+
+    failed = [f"{record['client_config']}/{record['command']}" for record in records if record['exit_code'] != 0]
+    if failed:
+        raise RuntimeError(f"Benchmark units failed: {', '.join(failed)}")
+
+
+def settings_path(result_dir):
+    return os.path.join(result_dir, settings_file_name)
+
+
+def load_settings(result_dir):
+    try:
+        with open(settings_path(result_dir), 'r') as f:
+            return json.load(f)
+    except Exception:
+        return {"enabled": False, "mode": "serial"}
+
+
+def write_settings(result_dir, settings):
+    with open(settings_path(result_dir), 'w') as f:
+        json.dump(settings, f, indent=2)
+
+
+def unit_out_dirs(result_dir):
+    """Output directory of every (client config, command) unit that ran in parallel, by combination."""
+    return {(unit['client_config'], unit['command']): unit['out_dirname']
+            for unit in load_settings(result_dir).get('units', []) if unit.get('out_dirname')}
+
+
+def visual_configs(config_visual_file):
+    """Visualization configs that together summarise a commit into the CSV of config_visual_file.
+
+    A serial run is summarised by config_visual_file itself. The units of a parallel run each get a
+    copy reading their own output directory, next to config_visual_file.
+    """
+    out_dirs = sorted(set(unit_out_dirs(os.path.dirname(config_visual_file)).values()))
+    if not out_dirs:
+        return [config_visual_file]
+    stem = os.path.splitext(config_visual_file)[0]
+    return [write_visual_config(config_visual_file, f"{stem}-{os.path.basename(out_dir)}.yaml", out_dir)
+            for out_dir in out_dirs]
+
+
+def annotate(df, result_dir):
+    """Add the execution_mode of every processed result row: parallel, serial or mixed.
+
+    Combinations that adaptive sampling re-ran serially after a parallel first pass are mixed.
+    """
+    parallel_units = {(unit['client_config'], unit['command'])
+                      for unit in load_settings(result_dir).get('units', []) if unit['mode'] == "parallel"}
+    resampled = set()
+    try:
+        with open(os.path.join(result_dir, adaptive_sampling.settings_file_name), 'r') as f:
+            for sampling_round in json.load(f).get('rounds', []):
+                resampled.update(tuple(combination) for combination in sampling_round['combinations'])
+    except (OSError, ValueError):
+        pass
+
+    def mode(row):
+        combination = (row['client_config'], row['command'])
+        if combination not in parallel_units:
+            return "serial"
+        return "mixed" if combination in resampled else "parallel"
+    return df.assign(execution_mode=df.apply(mode, axis=1) if len(df) else [])
+
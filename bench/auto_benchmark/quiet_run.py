@@ -0,0 +1,251 @@
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import subprocess
+import yaml
+
+benchmark_config_path = "/root/auto_benchmark/benchmark.yaml"
+settings_file_name = "quiet_run.json"
+
+DEFAULT_QUIET_RUN = {
+    "enabled": False,
+    "isolated_cpus": "auto",
+    "cpu_governor": "performance",
+    "drop_caches": True,
+    "idle_load_threshold": 0.5,
+    "idle_cpu_threshold": 10.0,
+    "idle_wait_timeout": 900,
+    "abort_if_busy": False,
+}
+
+GOVERNOR_GLOB = "/sys/devices/system/cpu/cpu[0-9]*/cpufreq/scaling_governor"
+ISOLATED_CPUS_PATH = "/sys/devices/system/cpu/isolated"
+
+
+def load_quiet_run_config(config_path):
+    """Load the quiet_run section of benchmark.yaml, filled with defaults."""
+    quiet_run = dict(DEFAULT_QUIET_RUN)
+    try:
+        with open(config_path, 'r') as file:
+            config = yaml.safe_load(file) or {}
+        quiet_run.update(config.get('quiet_run') or {})
+        logging.info(f"Loaded quiet run configuration from {config_path}: {quiet_run}")
+    except Exception as e:
+        logging.error(f"Error loading benchmark configuration: {e}")
+    return quiet_run
+
+
+def parse_cpu_list(cpu_list):
+    """Parse a CPU list such as '2-5,8' into a sorted list of CPU numbers."""
+    cpus = set()
+    for part in str(cpu_list).strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-')
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return sorted(cpus)
+
+
+def resolve_isolated_cpus(isolated_cpus):
+    """Return the CPUs the benchmark should be pinned to, or None to leave affinity alone."""
+    if not isolated_cpus:
+        return None
+    if isolated_cpus == "auto":
+        # Use the CPUs isolated with the isolcpus= kernel parameter, if any
+        try:
+            with open(ISOLATED_CPUS_PATH, 'r') as f:
+                isolated_cpus = f.read().strip()
+        except OSError:
+            isolated_cpus = ""
+        if not isolated_cpus:
+            logging.info("No isolated CPUs found on the host, CPU affinity is left unchanged.")
+            return None
+    available = os.sched_getaffinity(0)
+    cpus = [cpu for cpu in parse_cpu_list(isolated_cpus) if cpu in available]
+    return cpus or None
+
+
+def read_cpu_busy_percent(interval=1.0):
+    """Sample /proc/stat twice and return the host-wide CPU busy percentage over the interval."""
+    def sample():
+        with open('/proc/stat', 'r') as f:
+            values = [int(value) for value in f.readline().split()[1:]]
+        idle = values[3] + (values[4] if len(values) > 4 else 0)
+        return sum(values[:8]) - idle, sum(values[:8])
+
+    busy_start, total_start = sample()
+    time.sleep(interval)
+    busy_end, total_end = sample()
+    if total_end == total_start:
+        return 0.0
+    return 100.0 * (busy_end - busy_start) / (total_end - total_start)
+
+
+def wait_for_idle_host(load_threshold, cpu_threshold, timeout):
+    """Wait until the host is idle. Returns the last observed (idle, load_avg, cpu_busy_percent)."""
+    deadline = time.monotonic() + timeout
+    while True:
+        load_avg = os.getloadavg()[0]
+        cpu_busy = read_cpu_busy_percent()
+        idle = load_avg <= load_threshold and cpu_busy <= cpu_threshold
+        if idle or time.monotonic() >= deadline:
+            logging.info(f"Host idle check: idle={idle}, load_avg={load_avg:.2f}, cpu_busy={cpu_busy:.1f}%")
+            return idle, load_avg, cpu_busy
+        logging.info(f"Host busy (load_avg={load_avg:.2f}, cpu_busy={cpu_busy:.1f}%), waiting...")
+        time.sleep(10)
+
+
+def set_cpu_governor(governor):
+    """Set the scaling governor on all CPUs. Returns the previous governor per CPU, or None if unavailable."""
+    previous = {}
+    for path in sorted(glob.glob(GOVERNOR_GLOB)):
+        try:
+            available_path = os.path.join(os.path.dirname(path), 'scaling_available_governors')
+            with open(available_path, 'r') as f:
+                if governor not in f.read().split():
+                    logging.warning(f"Governor {governor} not available for {path}")
+                    continue
+            with open(path, 'r') as f:
+                previous[path] = f.read().strip()
+            with open(path, 'w') as f:
+                f.write(governor)
+        except OSError as e:
+            logging.warning(f"Could not set governor via {path}: {e}")
+    if not previous:
+        logging.info("CPU frequency scaling governors are not available on this host.")
+        return None
+    logging.info(f"Set CPU governor to {governor} on {len(previous)} CPUs.")
+    return previous
+
+
+def restore_cpu_governor(previous):
+    """Restore the scaling governors saved by set_cpu_governor."""
+    for path, governor in (previous or {}).items():
+        try:
+            with open(path, 'w') as f:
+                f.write(governor)
+        except OSError as e:
+            logging.warning(f"Could not restore governor via {path}: {e}")
+
+
+def drop_page_caches():
+    """Flush dirty pages and drop the page, dentry and inode caches. Returns True on success."""
+    try:
+        subprocess.run(['sync'], check=True)
+        with open('/proc/sys/vm/drop_caches', 'w') as f:
+            f.write('3')
+        logging.info("Dropped page caches.")
+        return True
+    except Exception as e:
+        logging.warning(f"Could not drop page caches: {e}")
+        return False
+
+
+def settings_path(result_dir):
+    return os.path.join(result_dir, settings_file_name)
+
+
+def load_settings(result_dir):
+    """Load the quiet run settings recorded for a result directory."""
+    try:
+        with open(settings_path(result_dir), 'r') as f:
+            return json.load(f)
+    except Exception:
+        return {"enabled": False}
+
+
+def prepare(result_dir, quiet_run):
+    """Put the host into quiet mode and record the applied settings next to the results."""
+    settings = {"enabled": bool(quiet_run['enabled'])}
+    if quiet_run['enabled']:
+        idle, load_avg, cpu_busy = wait_for_idle_host(quiet_run['idle_load_threshold'],
+                                                      quiet_run['idle_cpu_threshold'],
+                                                      quiet_run['idle_wait_timeout'])
+        settings.update({
+            "host_idle": idle,
+            "load_avg_before": round(load_avg, 2),
+            "cpu_busy_before": round(cpu_busy, 1),
+            "pinned_cpus": resolve_isolated_cpus(quiet_run['isolated_cpus']),
+            "cpu_governor": None,
+            "previous_governors": None,
+            "dropped_caches": False,
+        })
+        if not idle and quiet_run['abort_if_busy']:
+            logging.error("Host did not become idle in time, aborting the quiet run.")
+            write_settings(result_dir, settings)
+            return False
+
+        if quiet_run['cpu_governor']:
+            previous = set_cpu_governor(quiet_run['cpu_governor'])
+            if previous:
+                settings['cpu_governor'] = quiet_run['cpu_governor']
+                settings['previous_governors'] = previous
+        if quiet_run['drop_caches']:
+            settings['dropped_caches'] = drop_page_caches()
+
+    write_settings(result_dir, settings)
+    return True
+
+
+def write_settings(result_dir, settings):
+    try:
+        with open(settings_path(result_dir), 'w') as f:
+            json.dump(settings, f, indent=2)
+        logging.info(f"Recorded quiet run settings: {settings}")
+    except Exception as e:
+        logging.error(f"Error writing quiet run settings: {e}")
+
+
+def restore(result_dir):
+    """Undo the host changes made by prepare."""
+    restore_cpu_governor(load_settings(result_dir).get('previous_governors'))
+
+
+def pinned_preexec(result_dir):
+    """Return a subprocess preexec_fn pinning the child to the CPUs recorded by prepare, or None."""
+    pinned_cpus = load_settings(result_dir).get('pinned_cpus')
+    if not pinned_cpus:
+        return None
+    return lambda: os.sched_setaffinity(0, pinned_cpus)
+
+
+def exec_pinned(result_dir, command):
+    """Replace this process with the command, pinned to the CPUs recorded by prepare."""
+    pinned_cpus = load_settings(result_dir).get('pinned_cpus')
+    if pinned_cpus:
+        os.sched_setaffinity(0, pinned_cpus)
+        logging.info(f"Pinned {command[0]} to CPUs {pinned_cpus}")
+    os.execvp(command[0], command)
+
+
+if __name__ == "__main__":
+    log_file_path = "/root/auto_benchmark/quiet_run.log"
+    logging.basicConfig(
+        filename=log_file_path,
+        level=logging.DEBUG,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+    )
+
+    usage = "Usage: quiet_run.py prepare|restore <result_dir> | quiet_run.py exec <result_dir> <command> [args...]"
+    if len(sys.argv) < 3 or sys.argv[1] not in ('prepare', 'restore', 'exec'):
+        logging.error(f"Invalid arguments. {usage}")
+        sys.exit(1)
+
+    action = sys.argv[1]
+    result_dir = sys.argv[2]
+
+    if action == 'prepare':
+        sys.exit(0 if prepare(result_dir, load_quiet_run_config(benchmark_config_path)) else 4)
+    elif action == 'restore':
+        restore(result_dir)
+    else:
+        if len(sys.argv) < 4:
+            logging.error(f"Invalid arguments. {usage}")
+            sys.exit(1)
+        exec_pinned(result_dir, sys.argv[3:])
@@ -0,0 +1,288 @@
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+settings_file_name = "replay_proxy.json"
+
+DEFAULT_REPLAY_PROXY = {
+    "enabled": False,
+    # record: fetch every request through upstream_proxy and store the response; replay: serve stored responses
+    "mode": "replay",
+    "listen": "127.0.0.1:3129",
+    "store_dir": "/root/auto_benchmark/proxy_store",
+    "upstream_proxy": "http://ca-proxy.cern.ch:3128",
+    # In replay mode, fetch and store objects that were never recorded instead of failing
+    "fetch_missing": False,
+    "latency_ms": 0,
+    "bandwidth_kbps": 0,
+}
+
+# Response headers stored and replayed; hop-by-hop and date headers would make replays differ
+REPLAYED_HEADERS = ('Content-Type', 'Cache-Control', 'Last-Modified', 'ETag', 'Expires')
+# Only these upstream answers are stored; other errors, e.g. a transient 503, are passed through unrecorded
+RECORDED_ERROR_STATUSES = (404,)
+CHUNK_SIZE = 64 * 1024
+
+
+def load_replay_proxy_config(config):
+    """The replay_proxy section of benchmark.yaml, filled with defaults."""
+    replay_proxy = dict(DEFAULT_REPLAY_PROXY)
+    replay_proxy.update((config or {}).get('replay_proxy') or {})
+    return replay_proxy
+
+
+def proxy_url(replay_proxy):
+    return f"http://{replay_proxy['listen']}"
+
+
+class ObjectStore:
+    """Recorded responses on disk, keyed by the SHA-256 of the requested URL."""
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+
+    def paths(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        directory = os.path.join(self.store_dir, key[:2])
+        return os.path.join(directory, key), os.path.join(directory, key + '.json')
+
+    def load(self, url):
+        body_path, meta_path = self.paths(url)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None
+
+    def save(self, url, meta, body):
+        # Written under temporary names and renamed, concurrent readers never see partial objects
+        body_path, meta_path = self.paths(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        for path, content, mode in ((body_path, body, 'wb'), (meta_path, json.dumps(meta), 'w')):
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, mode) as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+
+
+class ReplayProxyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, mode, store, upstream_proxy, fetch_missing, latency_ms, bandwidth_kbps):
+        super().__init__(address, ProxyRequestHandler)
+        self.mode = mode
+        self.store = store
+        self.fetch_missing = fetch_missing
+        self.latency = latency_ms / 1000.0
+        self.bandwidth = bandwidth_kbps * 1000 / 8  # bytes per second, 0 is unlimited
+        handlers = [urllib.request.ProxyHandler({'http': upstream_proxy} if upstream_proxy else {})]
+        self.opener = urllib.request.build_opener(*handlers)
+        self.stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "hits": 0, "misses": 0, "recorded": 0, "not_recorded": 0, "failed": 0,
+                      "bytes_served": 0}
+
+    def count(self, **increments):
+        with self.stats_lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+    def fetch(self, url):
+        """Fetch a URL upstream. Returns (meta, body); HTTP errors such as 404 are responses too."""
+        try:
+            with self.opener.open(url, timeout=60) as response:
+                status, headers, body = response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            status, headers, body = e.code, e.headers, e.read()
+        meta = {
+            "url": url,
+            "status": status,
+            "headers": {name: headers[name] for name in REPLAYED_HEADERS if headers.get(name)},
+            "recorded_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        return meta, body
+
+
+class ProxyRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def respond(self, send_body):
+        server = self.server
+        # Proxy requests carry the absolute URL, direct requests are resolved against the Host header
+        url = self.path if self.path.startswith('http://') else f"http://{self.headers.get('Host')}{self.path}"
+        server.count(requests=1)
+
+        # Record mode always goes upstream and overwrites the stored object, so re-recording refreshes
+        # objects that change in place, such as .cvmfspublished and .cvmfswhitelist
+        entry = server.store.load(url) if server.mode == 'replay' else None
+        if entry is not None:
+            server.count(hits=1)
+        elif server.mode == 'record' or server.fetch_missing:
+            if server.mode == 'replay':
+                server.count(misses=1)
+            try:
+                entry = server.fetch(url)
+            except Exception as e:
+                logging.warning(f"Upstream fetch of {url} failed: {e}")
+                server.count(failed=1)
+                self.send_error(502, "Upstream fetch failed")
+                return
+            status = entry[0]['status']
+            if 200 <= status < 300 or status in RECORDED_ERROR_STATUSES:
+                server.store.save(url, *entry)
+                server.count(recorded=1)
+            else:
+                logging.warning(f"Upstream answered {url} with {status}, passed through without recording")
+                server.count(not_recorded=1)
+        else:
+            server.count(misses=1, failed=1)
+            logging.warning(f"Not recorded: {url}")
+            self.send_error(504, "Object not recorded")
+            return
+
+        meta, body = entry
+        if server.latency:
+            time.sleep(server.latency)
+        self.send_response(meta['status'])
+        for name, value in meta['headers'].items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.write_throttled(body)
+            server.count(bytes_served=len(body))
+
+    def write_throttled(self, body):
+        bandwidth = self.server.bandwidth
+        start = time.monotonic()
+        for offset in range(0, len(body), CHUNK_SIZE):
+            self.wfile.write(body[offset:offset + CHUNK_SIZE])
+            if bandwidth:
+                # Sleep until the bytes written so far fit in the configured bandwidth
+                delay = (offset + CHUNK_SIZE) / bandwidth - (time.monotonic() - start)
+                if delay > 0:
+                    time.sleep(delay)
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} - {format % args}")
+
+
+def serve(replay_proxy, stats_path=None):
+    """Run the proxy until SIGTERM, then write the request statistics to stats_path."""
+    host, port = replay_proxy['listen'].rsplit(':', 1)
+    server = ReplayProxyServer((host, int(port)), replay_proxy['mode'], ObjectStore(replay_proxy['store_dir']),
+                               replay_proxy['upstream_proxy'], replay_proxy['fetch_missing'],
+                               replay_proxy['latency_ms'], replay_proxy['bandwidth_kbps'])
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    logging.info(f"Replay proxy listening on {replay_proxy['listen']} in {replay_proxy['mode']} mode.")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        logging.info(f"Replay proxy stopped: {server.stats}")
+        if stats_path:
+            with open(stats_path, 'w') as f:
+                json.dump(server.stats, f)
+
+
+class ReplayProxy:
+    """Context manager running the proxy in its own process for the benchmark stages of a commit.
+
+    The applied settings and the request statistics are written to <result_dir>/replay_proxy.json.
+    """
+
+    def __init__(self, replay_proxy, result_dir, python=sys.executable):
+        self.replay_proxy = replay_proxy
+        self.result_dir = result_dir
+        self.python = python
+        self.process = None
+
+    def __enter__(self):
+        if not self.replay_proxy['enabled']:
+            return self
+        stats_path = os.path.join(self.result_dir, "replay_proxy_stats.json")
+        self.process = subprocess.Popen([self.python, os.path.abspath(__file__), 'serve',
+                                         '--config', json.dumps(self.replay_proxy), '--stats', stats_path])
+        host, port = self.replay_proxy['listen'].rsplit(':', 1)
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                socket.create_connection((host, int(port)), timeout=1).close()
+                break
+            except OSError:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.__exit__(None, None, None)
+                    raise RuntimeError(f"Replay proxy did not start on {self.replay_proxy['listen']}")
+                time.sleep(0.1)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.process is None:
+            return False
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+        settings = {key: self.replay_proxy[key] for key in
+                    ('enabled', 'mode', 'upstream_proxy', 'fetch_missing', 'latency_ms', 'bandwidth_kbps')}
+        stats_path = os.path.join(self.result_dir, "replay_proxy_stats.json")
+        try:
+            with open(stats_path, 'r') as f:
+                settings['stats'] = json.load(f)
+            os.remove(stats_path)
+        except (OSError, ValueError) as e:
+            logging.warning(f"No replay proxy statistics: {e}")
+        with open(os.path.join(self.result_dir, settings_file_name), 'w') as f:
+            json.dump(settings, f, indent=2)
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recording and replaying HTTP proxy for CernVM-FS benchmarks.")
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    serve_parser = subparsers.add_parser('serve', help="Run the proxy until SIGTERM")
+    serve_parser.add_argument('--config', type=json.loads, default={},
+                              help="JSON replay_proxy settings over the defaults, as passed by orchestrate.py")
+    serve_parser.add_argument('--mode', choices=['record', 'replay'])
+    serve_parser.add_argument('--listen')
+    serve_parser.add_argument('--store-dir')
+    serve_parser.add_argument('--latency-ms', type=float)
+    serve_parser.add_argument('--bandwidth-kbps', type=float)
+    serve_parser.add_argument('--stats', help="File the request statistics are written to on exit")
+    args = parser.parse_args()
+
+    log_file_path = "/root/auto_benchmark/replay_proxy.log"
+    logging.basicConfig(
+        filename=log_file_path,
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+    )
+
+    replay_proxy = load_replay_proxy_config({'replay_proxy': args.config})
+    for key in ('mode', 'listen', 'store_dir', 'latency_ms', 'bandwidth_kbps'):
+        if getattr(args, key) is not None:
+            replay_proxy[key] = getattr(args, key)
+    serve(replay_proxy, args.stats)
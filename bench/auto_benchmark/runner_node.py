@@ -0,0 +1,146 @@
+import os
+import platform
+import logging
+import threading
+import requests
+from requests.exceptions import RequestException
+
+CLAIM_ENDPOINT = "api/leases/claim"
+RENEW_ENDPOINT = "api/leases/renew"
+FINISH_ENDPOINT = "api/leases/finish"
+
+DEFAULT_RUNNER = {
+    "enabled": False,
+    "token_file": "/root/auto_benchmark/node_token",
+    "lease_ttl": 3600,
+    "max_units": 20,
+}
+
+
+def load_runner_config(config):
+    """The runner section of benchmark.yaml, filled with defaults."""
+    runner = dict(DEFAULT_RUNNER)
+    runner.update((config or {}).get('runner') or {})
+    return runner
+
+
+def load_token(token_file):
+    try:
+        with open(token_file, 'r') as f:
+            return f.read().strip() or None
+    except OSError as e:
+        logging.error(f"Could not read runner node token from {token_file}: {e}")
+        return None
+
+
+def auth_headers(config):
+    """Authorization header of this runner node; empty for the single-node setup authorized by IP."""
+    runner = load_runner_config(config)
+    if not runner['enabled']:
+        return {}
+    token = load_token(runner['token_file'])
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+
+def detect_hardware():
+    """Describe the hardware of this node; nodes of one hardware profile should report the same."""
+    hardware = {
+        "machine": platform.machine(),
+        "kernel": platform.release(),
+        "cpus": os.cpu_count(),
+    }
+    try:
+        with open('/proc/cpuinfo', 'r') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    hardware['cpu_model'] = line.split(':', 1)[1].strip()
+                    break
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    hardware['memory_kb'] = int(line.split()[1])
+                    break
+    except OSError as e:
+        logging.warning(f"Could not read hardware details: {e}")
+    return hardware
+
+
+def post(config, endpoint, payload):
+    response = requests.post(f"{config.get('server_url')}/{endpoint}", json=payload,
+                             headers=auth_headers(config), timeout=60)
+    response.raise_for_status()
+    return response.json()
+
+
+def claim(config, commits):
+    """Lease (commit, client config, command) units of the candidate commits, in the given priority order."""
+    runner = load_runner_config(config)
+    payload = {
+        "commits": commits,
+        "combinations": [{"client_config": client_config, "command": command}
+                         for client_config in config['client_configs'] for command in config['commands']],
+        "metrics": config['metrics'] + config['internal_affairs_metrics'],
+        "max_units": runner['max_units'],
+        "ttl": runner['lease_ttl'],
+        "hardware": detect_hardware(),
+    }
+    try:
+        leases = post(config, CLAIM_ENDPOINT, payload)['leases']
+        logging.info(f"Claimed {len(leases)} units of work.")
+        return leases
+    except (RequestException, ValueError, KeyError) as e:
+        logging.error(f"Error claiming work: {e}")
+        return []
+
+
+def renew(config, lease_ids):
+    """Extend leases still held by this node. Returns the ids that were renewed, None if the request failed."""
+    try:
+        return post(config, RENEW_ENDPOINT, {"lease_ids": lease_ids,
+                                             "ttl": load_runner_config(config)['lease_ttl']})['renewed']
+    except (RequestException, ValueError, KeyError) as e:
+        logging.error(f"Error renewing leases {lease_ids}: {e}")
+        return None
+
+
+def finish(config, lease_ids, failed=False):
+    """Mark leases as done, or hand them back to the pool right away if the work failed."""
+    if not lease_ids:
+        return
+    try:
+        post(config, FINISH_ENDPOINT, {"lease_ids": lease_ids, "failed": failed})
+    except (RequestException, ValueError) as e:
+        logging.error(f"Error finishing leases {lease_ids}: {e}")
+
+
+class LeaseRenewer:
+    """Context manager renewing leases in the background while the leased work runs."""
+
+    def __init__(self, config, lease_ids):
+        self.config = config
+        self.lease_ids = list(lease_ids)
+        self.interval = load_runner_config(config)['lease_ttl'] / 3
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            renewed = renew(self.config, self.lease_ids)
+            if renewed is None:
+                continue  # The server was not reached, the leases are retried on the next tick
+            lost = sorted(set(self.lease_ids) - set(renewed))
+            if lost:
+                # The work continues, its results are still valid for this hardware profile
+                logging.warning(f"Leases {lost} expired and were handed to another node.")
+                self.lease_ids = [lease_id for lease_id in self.lease_ids if lease_id not in lost]
+
+    def __enter__(self):
+        if self.lease_ids:
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        return False
@@ -0,0 +1,174 @@
+import os
+import sys
+import json
+import time
+import logging
+import resource
+import subprocess
+
+# ru_inblock / ru_oublock are reported in 512-byte blocks
+BLOCK_SIZE = 512
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+# Seconds a stage's process gets to exit after SIGTERM before it is killed
+TERMINATE_TIMEOUT = 30
+
+
+def terminate_process(proc, timeout=TERMINATE_TIMEOUT):
+    """Stop a child process with SIGTERM, or SIGKILL if it does not exit in time, and reap it."""
+    if proc.poll() is not None:
+        return
+    logging.warning(f"Terminating process {proc.pid}: {proc.args}")
+    proc.terminate()
+    try:
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def read_host_cpu_time():
+    """Return the busy CPU time of the whole host in seconds, read from /proc/stat."""
+    try:
+        with open('/proc/stat', 'r') as f:
+            fields = f.readline().split()[1:]
+        # user nice system idle iowait irq softirq steal ...
+        values = [int(value) for value in fields]
+        idle = values[3] + (values[4] if len(values) > 4 else 0)
+        return (sum(values[:8]) - idle) / CLK_TCK
+    except Exception as e:
+        logging.error(f"Error reading /proc/stat: {e}")
+        return None
+
+
+class TelemetryRecorder:
+    """Runs pipeline stages and records their resource usage as JSON lines."""
+
+    def __init__(self, telemetry_path):
+        self.telemetry_path = telemetry_path
+        # Process of the stage being run, stopped if the wait for it is interrupted
+        self.active_process = None
+
+    def run_stage(self, stage, command, cwd=None, **popen_kwargs):
+        """Run a command as a pipeline stage and record its telemetry. Returns the exit code."""
+        load_avg_start = os.getloadavg()[0]
+        host_cpu_start = read_host_cpu_time()
+        started_at = time.time()
+        start = time.monotonic()
+
+        proc = subprocess.Popen(command, cwd=cwd, **popen_kwargs)
+        self.active_process = proc
+        try:
+            _, status, usage = os.wait4(proc.pid, 0)
+        except BaseException:
+            # E.g. SystemExit from a SIGTERM handler, the stage must not outlive the pipeline
+            terminate_process(proc)
+            raise
+        finally:
+            self.active_process = None
+        proc.returncode = os.waitstatus_to_exitcode(status)
+
+        self.write_record(self.build_record(
+            stage, ' '.join(command), started_at, time.monotonic() - start, proc.returncode,
+            usage.ru_utime, usage.ru_stime, usage.ru_maxrss, usage.ru_inblock, usage.ru_oublock,
+            load_avg_start, host_cpu_start,
+        ))
+        return proc.returncode
+
+    def run_in_process(self, stage, func, *args, **kwargs):
+        """Call a function as a pipeline stage and record its telemetry. Returns the function's result.
+
+        CPU time and I/O are the deltas of this process and its reaped children, peak RSS is
+        the peak of the whole process so far.
+        """
+        load_avg_start = os.getloadavg()[0]
+        host_cpu_start = read_host_cpu_time()
+        started_at = time.time()
+        start = time.monotonic()
+        before = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+
+        exit_code = 1
+        try:
+            result = func(*args, **kwargs)
+            exit_code = 0
+            return result
+        finally:
+            after = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+
+            def delta(field):
+                return sum(getattr(a, field) - getattr(b, field) for a, b in zip(after, before))
+
+            self.write_record(self.build_record(
+                stage, getattr(func, '__name__', str(func)), started_at, time.monotonic() - start, exit_code,
+                delta('ru_utime'), delta('ru_stime'), max(usage.ru_maxrss for usage in after),
+                delta('ru_inblock'), delta('ru_oublock'), load_avg_start, host_cpu_start,
+            ))
+
+    def build_record(self, stage, command, started_at, wall_time, exit_code, user_time, system_time,
+                     max_rss_kb, inblock, oublock, load_avg_start, host_cpu_start):
+        """Assemble a telemetry record from the measurements of a finished stage."""
+        host_cpu_end = read_host_cpu_time()
+
+        # CPU time burned by everything else on the host while the stage was running
+        other_cpu_time = None
+        if host_cpu_start is not None and host_cpu_end is not None:
+            other_cpu_time = max(0.0, host_cpu_end - host_cpu_start - user_time - system_time)
+
+        return {
+            "stage": stage,
+            "command": command,
+            "started_at": time.strftime('%Y%m%d%H%M%S', time.localtime(started_at)),
+            "exit_code": exit_code,
+            "wall_time": round(wall_time, 3),
+            "user_time": round(user_time, 3),
+            "system_time": round(system_time, 3),
+            "max_rss_kb": max_rss_kb,
+            "read_bytes": inblock * BLOCK_SIZE,
+            "write_bytes": oublock * BLOCK_SIZE,
+            "load_avg_start": round(load_avg_start, 2),
+            "load_avg_end": round(os.getloadavg()[0], 2),
+            "other_cpu_time": round(other_cpu_time, 3) if other_cpu_time is not None else None,
+            "num_cpus": os.cpu_count(),
+        }
+
+    def write_record(self, record):
+        """Append a single telemetry record to the telemetry file."""
+        try:
+            with open(self.telemetry_path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+            logging.info(f"Recorded telemetry for stage {record['stage']}: {record}")
+        except Exception as e:
+            logging.error(f"Error writing telemetry to {self.telemetry_path}: {e}")
+
+
+def load_telemetry(telemetry_path):
+    """Load all telemetry records from a telemetry file."""
+    records = []
+    try:
+        with open(telemetry_path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    records.append(json.loads(line))
+    except Exception as e:
+        logging.error(f"Error loading telemetry from {telemetry_path}: {e}")
+    return records
+
+
+if __name__ == "__main__":
+    # Set up logging only when run as a script, so importers keep their own log file
+    log_file_path = "/root/auto_benchmark/stage_telemetry.log"
+    logging.basicConfig(
+        filename=log_file_path,
+        level=logging.DEBUG,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+    )
+
+    if len(sys.argv) < 4:
+        logging.error("Invalid arguments. Usage: stage_telemetry.py <telemetry_file> <stage> <command> [args...]")
+        sys.exit(1)
+
+    telemetry_path = sys.argv[1]
+    stage = sys.argv[2]
+    command = sys.argv[3:]
+
+    recorder = TelemetryRecorder(telemetry_path)
+    sys.exit(recorder.run_stage(stage, command))
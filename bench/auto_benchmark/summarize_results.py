@@ -0,0 +1,59 @@
+import os
+import sys
+import runpy
+import contextlib
+
+SCRIPT_PATH = os.path.abspath(__file__)
+
+DEFAULT_SUMMARY = {
+    # Also write the plot files of start_visualization.py; results.csv is written either way
+    "render_plots": False,
+}
+
+
+def load_summary_config(config):
+    """The summary section of benchmark.yaml, filled with defaults."""
+    summary = dict(DEFAULT_SUMMARY)
+    summary.update((config or {}).get('summary') or {})
+    return summary
+
+
+@contextlib.contextmanager
+def plots_skipped():
+    """Turn saving, showing and laying out matplotlib figures into no-ops.
+
+    The figures are still built by the client code, but nothing is rendered, which is where the
+    visualization stage spends its time. Open figures are closed on exit.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot
+    from matplotlib.figure import Figure
+
+    def skip(*args, **kwargs):
+        return None
+
+    saved = Figure.savefig, Figure.tight_layout, pyplot.savefig, pyplot.show
+    Figure.savefig = Figure.tight_layout = skip
+    pyplot.savefig = pyplot.show = skip
+    try:
+        yield
+    finally:
+        Figure.savefig, Figure.tight_layout, pyplot.savefig, pyplot.show = saved
+        pyplot.close('all')
+
+
+def summary_command(python, client_dir, config_file, render_plots=False):
+    """Command writing the results.csv of a visualization config, run with client_dir as working directory."""
+    if render_plots:
+        return [python, os.path.join(client_dir, "start_visualization.py"), '-c', config_file]
+    return [python, SCRIPT_PATH, '-c', config_file]
+
+
+if __name__ == "__main__":
+    # Takes the arguments of start_visualization.py and is run from the client directory like it
+    script_path = os.path.join(os.getcwd(), "start_visualization.py")
+    sys.argv = [script_path, *sys.argv[1:]]
+    sys.path.insert(0, os.getcwd())
+    with plots_skipped():
+        runpy.run_path(script_path, run_name="__main__")
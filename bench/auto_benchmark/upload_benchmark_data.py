@@ -1,8 +1,13 @@
 import requests
 import os
+import sys
+import json
 import logging
 import pandas as pd
 import yaml
+import commit_index
+from stage_telemetry import load_telemetry
+from runner_node import auth_headers
 
 # Set up logging
 log_file_path = "/root/auto_benchmark/upload_benchmark_data.log"
@@ -15,6 +20,7 @@ logging.basicConfig(
 csv_file_path = "/root/benchmark_results/results.csv"
 processed_csv_path = "/root/benchmark_results/processed_results.csv"
 upload_endpoint = "api/insert_data"
+telemetry_endpoint = "api/insert_telemetry"
 benchmark_config_path = "/root/auto_benchmark/benchmark.yaml"
 
 def load_benchmark_config(config_path):
@@ -81,32 +87,89 @@ def process_csv(file_path, processed_file_path):
         logging.error(f"Error processing CSV file {file_path}: {e}")
         return None
 
-def upload_csv(file_path, upload_url):
-    """Upload the entire processed CSV."""
+def load_tags(index_path=commit_index.INDEX_PATH):
+    """Git tags of the indexed commits, joined per commit, e.g. {commit: "cvmfs-2.12.0"}."""
+    try:
+        conn = commit_index.connect(index_path)
+        try:
+            return {commit: ', '.join(names) for commit, names in commit_index.tags_by_commit(conn).items()}
+        finally:
+            conn.close()
+    except Exception as e:
+        logging.warning(f"Could not read tags from the commit index: {e}")
+        return {}
+
+def add_tags(df, tags):
+    """Add the tag column the server stores on the commit's build, empty for untagged commits."""
+    return df.assign(tag=df['commit'].map(tags))
+
+def upload_dataframe(df, upload_url, headers=None):
+    """Upload processed results, of one or many commits, as a single CSV request. Returns True on success."""
+    try:
+        files = {'file': ('results.csv', df.to_csv(index=False))}
+        response = requests.post(upload_url, files=files, headers=headers)
+        if response.status_code == 201:
+            logging.info(f"Uploaded {len(df)} processed results successfully.")
+            return True
+        logging.error(f"Failed to upload CSV: {response.status_code} - {response.text}")
+    except Exception as e:
+        logging.error(f"Failed to upload CSV: {e}")
+    return False
+
+def upload_csv(file_path, upload_url, headers=None):
+    """Upload the entire processed CSV. Returns the processed DataFrame on success."""
     if not os.path.isfile(file_path):
         logging.error(f"Error: File {file_path} does not exist.")
-        return
+        return None
     
     df = process_csv(file_path, processed_csv_path)
     if df is None:
         logging.error(f"CSV processing failed for {file_path}.")
-        return
+        return None
+    df = add_tags(df, load_tags())
 
     # Upload the entire processed CSV file
+    return df if upload_dataframe(df, upload_url, headers) else None
+
+def load_run_settings(settings_paths):
+    """Load JSON run settings files (e.g. quiet_run.json), keyed by file name without extension."""
+    settings = {}
+    for settings_path in settings_paths:
+        if not os.path.isfile(settings_path):
+            continue
+        try:
+            with open(settings_path, 'r') as f:
+                settings[os.path.splitext(os.path.basename(settings_path))[0]] = json.load(f)
+        except Exception as e:
+            logging.warning(f"Could not load run settings from {settings_path}: {e}")
+    return settings
+
+def upload_telemetry(telemetry_path, settings_paths, commit, upload_url, headers=None):
+    """Upload the stage telemetry and the run settings recorded for a commit."""
+    records = load_telemetry(telemetry_path)
+    if not records:
+        logging.warning(f"No telemetry records found in {telemetry_path}.")
+        return
+
+    payload = {"commit": commit, "stages": records, "settings": load_run_settings(settings_paths)}
     try:
-        with open(processed_csv_path, 'rb') as f:
-            files = {'file': f}
-            response = requests.post(upload_url, files=files)
-            if response.status_code == 201:
-                logging.info("Processed CSV uploaded successfully.")
-            else:
-                logging.error(f"Failed to upload CSV: {response.status_code} - {response.text}")
+        response = requests.post(upload_url, json=payload, headers=headers)
+        if response.status_code == 201:
+            logging.info(f"Uploaded {len(records)} telemetry records for commit {commit}.")
+        else:
+            logging.error(f"Failed to upload telemetry: {response.status_code} - {response.text}")
     except Exception as e:
-        logging.error(f"Failed to upload CSV: {e}")
+        logging.error(f"Failed to upload telemetry: {e}")
 
 if __name__ == "__main__":
     logging.info("Starting the benchmark data upload script.")
     config = load_benchmark_config(benchmark_config_path)
+    telemetry_path = sys.argv[1] if len(sys.argv) > 1 else None
+    settings_paths = sys.argv[2:]
     if config:
-        upload_csv(csv_file_path, f"{config.get('server_url')}/{upload_endpoint}")
+        headers = auth_headers(config)
+        df = upload_csv(csv_file_path, f"{config.get('server_url')}/{upload_endpoint}", headers)
+        if df is not None and telemetry_path:
+            upload_telemetry(telemetry_path, settings_paths, df['commit'].iloc[0],
+                             f"{config.get('server_url')}/{telemetry_endpoint}", headers)
     logging.info("Finished running the benchmark data upload script.")
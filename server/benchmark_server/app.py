@@ -1,13 +1,34 @@
-from flask import Flask, render_template, request, jsonify, make_response, abort
+from flask import Flask, render_template, request, jsonify, make_response, abort, send_from_directory, url_for
 import sqlite3
 import pandas as pd
+import numpy as np
 import io
+import json
+import gzip
+import hashlib
 import logging
+import mimetypes
 import os
+import re
+import time
+import fcntl
+import shutil
+import threading
+from urllib.parse import quote
 from dotenv import load_dotenv
+from series_store import SeriesStore, CACHE_TYPES, QUARTILE_FIELDS, CACHE_COLUMNS
+import snapshot_marker
+from snapshot_marker import SNAPSHOT_DIR
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 load_dotenv()
 ALLOWED_IP = os.getenv('ALLOWED_IP')
+# Serve time-series reads from an in-memory columnar copy of the results, loaded by every worker
+SERIES_STORE_ENABLED = os.getenv('SERIES_STORE', '0').lower() in ('1', 'true', 'yes')
 
 app = Flask(__name__)
 
@@ -21,32 +42,175 @@ logging.basicConfig(
 
 # Define paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATABASE = os.path.join(BASE_DIR, 'benchmarks.db')
+DATABASE = os.getenv('BENCHMARK_DATABASE', os.path.join(BASE_DIR, 'benchmarks.db'))
 DB_DEFINITION = os.path.join(BASE_DIR, 'db_definition.sql')
+DEFAULT_HARDWARE_PROFILE_ID = 1
+# Entries of the DataChange log kept for series stores catching up with the database
+DATA_CHANGE_KEEP = 10000
+
+def migrate_database(conn, sql_script):
+    """Apply schema changes to databases created before them, CREATE TABLE IF NOT EXISTS cannot."""
+    result_columns = {row[1] for row in conn.execute('PRAGMA table_info("BenchmarkResult")')}
+    if 'hardware_profile_id' not in result_columns:
+        # The unique key gains the hardware profile, SQLite can only change it by rebuilding the table
+        logging.info("Migrating BenchmarkResult to results keyed by hardware profile.")
+        definition = re.search(r'CREATE TABLE IF NOT EXISTS "BenchmarkResult" \(.*?\);', sql_script, re.S).group(0)
+        columns = ', '.join(f'"{column}"' for column in
+                            ['id', 'cvmfs_build_id', 'command_id', 'client_config_id', 'metric_id'] + CACHE_COLUMNS)
+        conn.executescript(f'''
+            BEGIN;
+            ALTER TABLE "BenchmarkResult" RENAME TO "BenchmarkResultBeforeProfiles";
+            {definition}
+            INSERT INTO "BenchmarkResult" ({columns}) SELECT {columns} FROM "BenchmarkResultBeforeProfiles";
+            DROP TABLE "BenchmarkResultBeforeProfiles";
+            COMMIT;
+        ''')
+
+    flag_columns = {row[1] for row in conn.execute('PRAGMA table_info("RegressionFlag")')}
+    if 'hardware_profile_id' not in flag_columns:
+        # Flags are keyed by hardware profile; an older flag is kept for every profile with the result it marks
+        logging.info("Migrating RegressionFlag to flags keyed by hardware profile.")
+        definition = re.search(r'CREATE TABLE IF NOT EXISTS "RegressionFlag" \(.*?\);', sql_script, re.S).group(0)
+        conn.executescript(f'''
+            BEGIN;
+            ALTER TABLE "RegressionFlag" RENAME TO "RegressionFlagBeforeProfiles";
+            {definition}
+            INSERT INTO "RegressionFlag"
+                ("cvmfs_build_id", "command_id", "client_config_id", "metric_id", "hardware_profile_id", "note")
+            SELECT DISTINCT "Flag"."cvmfs_build_id", "Flag"."command_id", "Flag"."client_config_id",
+                "Flag"."metric_id", "BenchmarkResult"."hardware_profile_id", "Flag"."note"
+            FROM "RegressionFlagBeforeProfiles" AS "Flag"
+            INNER JOIN "BenchmarkResult" ON "BenchmarkResult"."cvmfs_build_id" = "Flag"."cvmfs_build_id"
+                AND "BenchmarkResult"."command_id" = "Flag"."command_id"
+                AND "BenchmarkResult"."client_config_id" = "Flag"."client_config_id"
+                AND "BenchmarkResult"."metric_id" = "Flag"."metric_id";
+            DROP TABLE "RegressionFlagBeforeProfiles";
+            COMMIT;
+        ''')
+
+    telemetry_columns = {row[1] for row in conn.execute('PRAGMA table_info("RunTelemetry")')}
+    if 'node_id' not in telemetry_columns:
+        conn.execute('ALTER TABLE "RunTelemetry" ADD COLUMN "node_id" INTEGER REFERENCES "RunnerNode"("id")')
+
+    result_columns = {row[1] for row in conn.execute('PRAGMA table_info("BenchmarkResult")')}
+    if 'execution_mode' not in result_columns:
+        conn.execute('ALTER TABLE "BenchmarkResult" ADD COLUMN "execution_mode" TEXT NOT NULL DEFAULT \'serial\'')
+
+    build_columns = {row[1] for row in conn.execute('PRAGMA table_info("CVMFSBuild")')}
+    if 'rolled_up_week' in build_columns:
+        # Roll-ups used to be marked per build; the profiles with an aggregate of that week were rolled up.
+        # The column stays, SQLite of EL9 cannot drop it.
+        conn.execute('''
+            INSERT OR IGNORE INTO "RolledUpBuild" ("cvmfs_build_id", "hardware_profile_id", "week_start")
+            SELECT DISTINCT "CVMFSBuild"."id", "WeeklyAggregate"."hardware_profile_id", "CVMFSBuild"."rolled_up_week"
+            FROM "CVMFSBuild"
+            INNER JOIN "WeeklyAggregate" ON "WeeklyAggregate"."week_start" = "CVMFSBuild"."rolled_up_week"
+        ''')
+        conn.execute('UPDATE "CVMFSBuild" SET "rolled_up_week" = NULL WHERE "rolled_up_week" IS NOT NULL')
+
+# Create the database if it doesn't exist, and add any tables introduced since it was created
+try:
+    if not os.path.exists(DB_DEFINITION):
+        logging.error(f"Database definition file not found at {DB_DEFINITION}")
+        raise FileNotFoundError(f"Database definition file not found at {DB_DEFINITION}")
+
+    database_existed = os.path.exists(DATABASE)
+    conn = sqlite3.connect(DATABASE)
+    cursor = conn.cursor()
 
-# Create the database if it doesn't exist
-if not os.path.exists(DATABASE):
-    try:
-        if not os.path.exists(DB_DEFINITION):
-            logging.error(f"Database definition file not found at {DB_DEFINITION}")
-            raise FileNotFoundError(f"Database definition file not found at {DB_DEFINITION}")
-
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-
-        with open(DB_DEFINITION, 'r') as f:
-            sql_script = f.read()
+    with open(DB_DEFINITION, 'r') as f:
+        sql_script = f.read()
 
-        # Execute the SQL script
-        cursor.executescript(sql_script)
-        conn.commit()
-        conn.close()
+    # Execute the SQL script, every statement is CREATE ... IF NOT EXISTS
+    cursor.executescript(sql_script)
+    migrate_database(conn, sql_script)
+    conn.commit()
+    conn.close()
+    if database_existed:
+        logging.info("Database already exists, schema is up to date.")
+    else:
         logging.info("Database created successfully using db_definition.")
-    except Exception as e:
-        logging.error(f"Failed to create database: {e}")
-        raise
-else:
-    logging.info("Database already exists.")
+except Exception as e:
+    logging.error(f"Failed to create database: {e}")
+    raise
+
+# Static assets are copied under a content-hash file name and precompressed, so they can be
+# cached forever by browsers and served without compressing them on every request
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+ASSET_DIR = os.path.join(STATIC_DIR, 'dist')
+COMPRESSIBLE_EXTENSIONS = ('.js', '.css', '.svg', '.json', '.html')
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def write_file_atomically(path, content):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def build_assets():
+    """Fingerprint and precompress every static asset. Returns a manifest {logical path: fingerprinted path}."""
+    manifest = {}
+    for root, dirs, files in os.walk(STATIC_DIR):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != ASSET_DIR]
+        for file_name in files:
+            source_path = os.path.join(root, file_name)
+            logical_path = os.path.relpath(source_path, STATIC_DIR).replace(os.sep, '/')
+            with open(source_path, 'rb') as f:
+                content = f.read()
+
+            stem, extension = os.path.splitext(logical_path)
+            fingerprinted_path = f"{stem}.{hashlib.sha256(content).hexdigest()[:12]}{extension}"
+            target_path = os.path.join(ASSET_DIR, fingerprinted_path)
+            manifest[logical_path] = fingerprinted_path
+
+            # The name changes with the content, an existing file is already up to date
+            if os.path.exists(target_path):
+                continue
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            write_file_atomically(target_path, content)
+            if extension in COMPRESSIBLE_EXTENSIONS:
+                write_file_atomically(f"{target_path}.gz", gzip.compress(content, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    write_file_atomically(f"{target_path}.br", brotli.compress(content, quality=11))
+            logging.info(f"Built static asset {fingerprinted_path}")
+    return manifest
+
+
+try:
+    ASSET_MANIFEST = build_assets()
+except Exception as e:
+    logging.error(f"Failed to build static assets, falling back to plain static files: {e}")
+    ASSET_MANIFEST = {}
+
+
+@app.context_processor
+def inject_asset_url():
+    def asset_url(path):
+        if path in ASSET_MANIFEST:
+            return url_for('serve_asset', filename=ASSET_MANIFEST[path])
+        return url_for('static', filename=path)
+    return {"asset_url": asset_url}
+
+
+@app.route('/assets/<path:filename>')
+def serve_asset(filename):
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoded_files = [('br', '.br'), ('gzip', '.gz')]
+
+    response = None
+    for encoding, suffix in encoded_files:
+        if request.accept_encodings[encoding] and os.path.isfile(os.path.join(ASSET_DIR, filename + suffix)):
+            response = send_from_directory(ASSET_DIR, filename + suffix, mimetype=mimetype, max_age=ASSET_MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            break
+    if response is None:
+        response = send_from_directory(ASSET_DIR, filename, mimetype=mimetype, max_age=ASSET_MAX_AGE)
+
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
 
 def get_db_connection():
     try:
@@ -56,16 +220,246 @@ def get_db_connection():
         logging.error(f"Failed to connect to database: {e}")
         raise
 
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def node_from_token(cursor):
+    """Return (node_id, hardware_profile_id) of the runner node whose bearer token the request carries."""
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        return None
+    return cursor.execute('SELECT "id", "hardware_profile_id" FROM "RunnerNode" WHERE "token_hash" = ?',
+                          (hash_token(header[len('Bearer '):].strip()),)).fetchone()
+
+def authenticate_node():
+    """Identify the runner node sending an upload as (node_id, hardware_profile_id), or abort with 403.
+
+    Registered nodes authenticate with "Authorization: Bearer <token>". Requests without a token
+    from ALLOWED_IP are accepted as the original single benchmark node on the default profile.
+    """
+    client_ip = request.remote_addr
+    conn = get_db_connection()
+    try:
+        node = node_from_token(conn.cursor())
+        if node:
+            conn.execute('UPDATE "RunnerNode" SET "last_seen" = CURRENT_TIMESTAMP WHERE "id" = ?', (node[0],))
+            conn.commit()
+            return node
+    finally:
+        conn.close()
+
+    if 'Authorization' not in request.headers and ALLOWED_IP and client_ip == ALLOWED_IP:
+        return None, DEFAULT_HARDWARE_PROFILE_ID
+    logging.warning(f"Unauthorized access attempt from IP: {client_ip}")
+    abort(403)  # Forbidden
+
+def requested_hardware_profile_id(cursor):
+    """Hardware profile named by the hardware_profile parameter, the default profile if absent."""
+    name = request.args.get('hardware_profile')
+    if not name:
+        return DEFAULT_HARDWARE_PROFILE_ID
+    profile = cursor.execute('SELECT "id" FROM "HardwareProfile" WHERE "name" = ?', (name,)).fetchone()
+    return profile[0] if profile else -1  # An unknown profile has no results
+
+def record_data_change(cursor, cvmfs_build_ids):
+    """Log the builds whose results changed, the series store reloads them on its next refresh.
+
+    Only the newest DATA_CHANGE_KEEP entries are kept; a store that fell further behind reloads everything.
+    """
+    cursor.executemany('INSERT INTO "DataChange" ("cvmfs_build_id") VALUES (?)',
+                       [(build_id,) for build_id in sorted(set(cvmfs_build_ids))])
+    cursor.execute('DELETE FROM "DataChange" WHERE "version" <= (SELECT MAX("version") FROM "DataChange") - ?',
+                   (DATA_CHANGE_KEEP,))
+
+def get_series_store(conn):
+    """Return the worker's series store, refreshed to the database version, or None if disabled."""
+    if series_store is None:
+        return None
+    series_store.refresh(conn)
+    return series_store
+
+series_store = None
+if SERIES_STORE_ENABLED:
+    series_store = SeriesStore()
+    store_conn = sqlite3.connect(DATABASE)
+    try:
+        series_store.refresh(store_conn)
+        logging.info(f"Series store holds {series_store.nbytes() / 2**20:.1f} MiB of numeric columns.")
+    finally:
+        store_conn.close()
+
+# The landing page is prerendered after the data changed: the responses to the API requests index.js
+# makes on load are written as a versioned JSON snapshot per hardware profile and inlined into a static
+# index.html, so the first page view needs no database access. Drill-downs still use the live API.
+SNAPSHOT_CURRENT = os.path.join(SNAPSHOT_DIR, 'current')
+# Superseded snapshots are kept for pages that are still loading them
+SNAPSHOT_KEEP_SECONDS = 3600
+# Ingests only mark the snapshot stale; a background thread of every worker regenerates it once no
+# change arrived for SNAPSHOT_QUIET_SECONDS, or at the latest SNAPSHOT_MAX_DELAY_SECONDS after the last one
+SNAPSHOT_POLL_SECONDS = 1
+SNAPSHOT_QUIET_SECONDS = int(os.getenv('SNAPSHOT_QUIET_SECONDS', 5))
+SNAPSHOT_MAX_DELAY_SECONDS = int(os.getenv('SNAPSHOT_MAX_DELAY_SECONDS', 60))
+# The overview plots of index.js, as (client config, command, metric)
+OVERVIEW_PLOTS = [('default', 'root', 'system'), ('default', 'root', 'real')]
+OVERVIEW_NUM_COMMITS = 12
+MAX_PLOT_POINTS = 200
+
+
+def encode_uri_component(value):
+    """JavaScript's encodeURIComponent, snapshots are keyed by the exact URLs index.js requests."""
+    return quote(str(value), safe="-_.!~*'()")
+
+
+def landing_responses(client, profile_name):
+    """The responses to the requests the landing page of a hardware profile makes, keyed by URL."""
+    profile_param = f"&hardware_profile={encode_uri_component(profile_name)}"
+    responses = {}
+
+    def get(url):
+        response = client.get(url)
+        if response.status_code == 200:
+            responses[url] = response.get_json()
+        return responses.get(url)
+
+    get('/api/hardware_profiles')
+    get('/api/configurations')
+    for client_config_name, command_name, metric_name in OVERVIEW_PLOTS:
+        get(f"/api/commits_data_by_names?client_config_name={encode_uri_component(client_config_name)}"
+            f"&command_name={encode_uri_component(command_name)}&metric_name={encode_uri_component(metric_name)}"
+            f"&num_commits={OVERVIEW_NUM_COMMITS}&max_points={MAX_PLOT_POINTS}&mode=line{profile_param}")
+
+    # The newest commit is shown and compared against the one before it
+    commits = get(f"/api/commits_list?{profile_param[1:]}") or []
+    if commits:
+        head = encode_uri_component(commits[0]['commit'])
+        get(f"/api/results_by_commit?commit={head}{profile_param}")
+        get(f"/api/telemetry_by_commit?commit={head}")
+        if len(commits) > 1:
+            get(f"/api/compare?base={encode_uri_component(commits[1]['commit'])}&head={head}{profile_param}")
+    return responses
+
+
+def write_snapshot():
+    """Prerender the landing page of every hardware profile into a new snapshot and make it current.
+
+    Snapshots are written to a temporary directory, renamed to their version and published by
+    atomically replacing the "current" symlink. The caller holds the snapshot lock. Returns the version.
+    """
+    conn = get_db_connection()
+    try:
+        data_version = conn.execute('SELECT COALESCE(MAX("version"), 0) FROM "DataChange"').fetchone()[0]
+        profiles = conn.execute('SELECT "id", "name" FROM "HardwareProfile" ORDER BY "id"').fetchall()
+    finally:
+        conn.close()
+
+    version = f"{data_version}-{time.time_ns() // 1000000}"
+    tmp_dir = os.path.join(SNAPSHOT_DIR, f".{version}.tmp")
+    os.makedirs(tmp_dir)
+    try:
+        profile_files = {name: f"{profile_id}.json" for profile_id, name in profiles}
+        client = app.test_client()
+        snapshots = {}
+        for profile_id, name in profiles:
+            snapshots[profile_id] = {"version": version, "hardware_profile": name,
+                                     "profile_files": profile_files,
+                                     "responses": landing_responses(client, name)}
+            content = json.dumps(snapshots[profile_id], separators=(',', ':')).encode()
+            write_file_atomically(os.path.join(tmp_dir, profile_files[name]), content)
+            write_file_atomically(os.path.join(tmp_dir, profile_files[name] + '.gz'),
+                                  gzip.compress(content, mtime=0))
+
+        page = render_template('index.html', snapshot=snapshots.get(DEFAULT_HARDWARE_PROFILE_ID))
+        write_file_atomically(os.path.join(tmp_dir, 'index.html'), page.encode())
+        os.rename(tmp_dir, os.path.join(SNAPSHOT_DIR, version))
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    tmp_link = f"{SNAPSHOT_CURRENT}.{os.getpid()}.tmp"
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(version, tmp_link)
+    os.replace(tmp_link, SNAPSHOT_CURRENT)
+
+    for entry in os.listdir(SNAPSHOT_DIR):
+        path = os.path.join(SNAPSHOT_DIR, entry)
+        if (entry != version and os.path.isdir(path) and not os.path.islink(path)
+                and time.time() - os.path.getmtime(path) > SNAPSHOT_KEEP_SECONDS):
+            shutil.rmtree(path, ignore_errors=True)
+    logging.info(f"Wrote dashboard snapshot {version}.")
+    return version
+
+
+def refresh_stale_snapshot():
+    """Write a snapshot if the data changed since the last one and the changes have settled.
+
+    Returns the version written, None if the snapshot is current, still settling or being written
+    by another worker. A failure leaves the previous snapshot current and is retried on the next call.
+    """
+    stale = snapshot_marker.stale_since()
+    refreshed, refreshed_at = snapshot_marker.last_refresh()
+    now = time.time_ns()
+    if (stale is None or stale <= refreshed
+            or (now - stale < SNAPSHOT_QUIET_SECONDS * 10**9
+                and now - refreshed_at < SNAPSHOT_MAX_DELAY_SECONDS * 10**9)):
+        return None
+
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with open(os.path.join(SNAPSHOT_DIR, '.lock'), 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None  # Another worker is writing, it or the next poll picks up later changes
+        # Changes marked from here on are newer than the recorded marker and trigger the next snapshot
+        stale = snapshot_marker.stale_since()
+        if stale <= snapshot_marker.last_refresh()[0]:
+            return None
+        version = write_snapshot()
+        snapshot_marker.record_refresh(stale)
+    return version
+
+
+def refresh_snapshots_in_background():
+    delay = SNAPSHOT_POLL_SECONDS
+    while True:
+        time.sleep(delay)
+        try:
+            with app.test_request_context():
+                refresh_stale_snapshot()
+            delay = SNAPSHOT_POLL_SECONDS
+        except Exception as e:
+            logging.error(f"Failed to write the dashboard snapshot: {e}")
+            delay = SNAPSHOT_MAX_DELAY_SECONDS
+
+
 @app.route('/')
 def index():
-    return render_template('index.html')
+    # The prerendered page of the current snapshot, served without touching the database
+    if os.path.isfile(os.path.join(SNAPSHOT_CURRENT, 'index.html')):
+        return send_from_directory(SNAPSHOT_CURRENT, 'index.html', max_age=0)
+    return render_template('index.html', snapshot=None)
+
+
+@app.route('/snapshots/<version>/<filename>')
+def serve_snapshot(version, filename):
+    # Versions are never rewritten, each snapshot file can be cached forever
+    if version.startswith('.') or os.path.islink(os.path.join(SNAPSHOT_DIR, version)):
+        abort(404)
+    response = None
+    if request.accept_encodings['gzip'] and os.path.isfile(os.path.join(SNAPSHOT_DIR, version, filename + '.gz')):
+        response = send_from_directory(SNAPSHOT_DIR, f"{version}/{filename}.gz", mimetype='application/json',
+                                       max_age=ASSET_MAX_AGE)
+        response.headers['Content-Encoding'] = 'gzip'
+    if response is None:
+        response = send_from_directory(SNAPSHOT_DIR, f"{version}/{filename}", max_age=ASSET_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
 
 @app.route('/api/insert_data', methods=['POST'])
 def insert_data():
-    client_ip = request.remote_addr
-    if client_ip != ALLOWED_IP:
-        logging.warning(f"Unauthorized access attempt from IP: {client_ip}")
-        abort(403)  # Forbidden
+    node_id, hardware_profile_id = authenticate_node()
 
     file = request.files['file']
     if not file:
@@ -88,40 +482,68 @@ def insert_data():
 
             conn = get_db_connection()
             cursor = conn.cursor()
+            changed_builds = []
+            # Batched uploads repeat the same names on many rows, their ids are looked up once
+            command_ids, client_config_ids, metric_ids, build_ids = {}, {}, {}, {}
 
             for _, row in df.iterrows():
                 logging.debug(f"Processing row: {row.to_dict()}")
 
                 # Insert or select Command, ClientConfig, Metric, and CVMFSBuild
-                cursor.execute('INSERT OR IGNORE INTO "Command" ("command_name", "command_content") VALUES (?, ?)', 
-                               (row['command'].strip(), row['command'].strip()))
-                command_id = cursor.execute('SELECT "id" FROM "Command" WHERE "command_name" = ?', 
-                                            (row['command'].strip(),)).fetchone()[0]
-
-                cursor.execute('INSERT OR IGNORE INTO "ClientConfig" ("config_name", "config_content") VALUES (?, ?)', 
-                               (row['client_config'].strip(), row['client_config'].strip()))
-                client_config_id = cursor.execute('SELECT "id" FROM "ClientConfig" WHERE "config_name" = ? AND "config_content" = ?', 
-                                                  (row['client_config'].strip(), row['client_config'].strip())).fetchone()[0]
-
-                cursor.execute('INSERT OR IGNORE INTO "Metric" ("metric_name", "metric_description") VALUES (?, ?)', 
-                               (row['metric'].strip(), row['metric'].strip()))
-                metric_id = cursor.execute('SELECT "id" FROM "Metric" WHERE "metric_name" = ?', 
-                                           (row['metric'].strip(),)).fetchone()[0]
-
-                cursor.execute('''
-                    INSERT OR IGNORE INTO "CVMFSBuild" ("commit", "commit_datetime", "version", "tag", "build_type")
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (row['commit'].strip(), row['datetime'], row['version'].strip(), None, 'automatic'))
-                cvmfs_build_id = cursor.execute('SELECT "id" FROM "CVMFSBuild" WHERE "commit" = ?', 
-                                                (row['commit'].strip(),)).fetchone()[0]
-
-                # Check if BenchmarkResult exists
+                command = row['command'].strip()
+                if command not in command_ids:
+                    cursor.execute('INSERT OR IGNORE INTO "Command" ("command_name", "command_content") VALUES (?, ?)', 
+                                   (command, command))
+                    command_ids[command] = cursor.execute('SELECT "id" FROM "Command" WHERE "command_name" = ?', 
+                                                          (command,)).fetchone()[0]
+                command_id = command_ids[command]
+
+                client_config = row['client_config'].strip()
+                if client_config not in client_config_ids:
+                    cursor.execute('INSERT OR IGNORE INTO "ClientConfig" ("config_name", "config_content") VALUES (?, ?)', 
+                                   (client_config, client_config))
+                    client_config_ids[client_config] = cursor.execute(
+                        'SELECT "id" FROM "ClientConfig" WHERE "config_name" = ? AND "config_content" = ?', 
+                        (client_config, client_config)).fetchone()[0]
+                client_config_id = client_config_ids[client_config]
+
+                metric = row['metric'].strip()
+                if metric not in metric_ids:
+                    cursor.execute('INSERT OR IGNORE INTO "Metric" ("metric_name", "metric_description") VALUES (?, ?)', 
+                                   (metric, metric))
+                    metric_ids[metric] = cursor.execute('SELECT "id" FROM "Metric" WHERE "metric_name" = ?', 
+                                                        (metric,)).fetchone()[0]
+                metric_id = metric_ids[metric]
+
+                commit = row['commit'].strip()
+                if commit not in build_ids:
+                    # Git tags of the commit from the node's commit index, absent in uploads of older nodes
+                    tag = row.get('tag')
+                    tag = tag.strip() if isinstance(tag, str) and tag.strip() else None
+                    cursor.execute('''
+                        INSERT OR IGNORE INTO "CVMFSBuild" ("commit", "commit_datetime", "version", "tag", "build_type")
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', (commit, row['datetime'], row['version'].strip(), tag, 'automatic'))
+                    build_ids[commit] = cursor.execute('SELECT "id" FROM "CVMFSBuild" WHERE "commit" = ?', 
+                                                       (commit,)).fetchone()[0]
+                    if tag:
+                        # A commit can be tagged after its first upload, e.g. when it becomes a release
+                        cursor.execute('UPDATE "CVMFSBuild" SET "tag" = ? WHERE "id" = ?', (tag, build_ids[commit]))
+                    changed_builds.append(build_ids[commit])
+                cvmfs_build_id = build_ids[commit]
+
+                # Check if BenchmarkResult exists for the hardware profile of the uploading node
                 cursor.execute('''
                     SELECT "id" FROM "BenchmarkResult" 
                     WHERE "cvmfs_build_id" = ? AND "command_id" = ? AND "client_config_id" = ? AND "metric_id" = ?
-                ''', (cvmfs_build_id, command_id, client_config_id, metric_id))
+                        AND "hardware_profile_id" = ?
+                ''', (cvmfs_build_id, command_id, client_config_id, metric_id, hardware_profile_id))
 
                 result = cursor.fetchone()
+                # Uploads from nodes without parallel execution have no execution_mode column
+                execution_mode = row.get('execution_mode')
+                if not isinstance(execution_mode, str):
+                    execution_mode = 'serial'
 
                 if result:
                     # Update existing entry
@@ -134,34 +556,38 @@ def insert_data():
                             "cold_cache_third_quartile" = ?, "cold_cache_max_val" = ?, "warm_cache_min_val" = ?,
                             "warm_cache_first_quartile" = ?, "warm_cache_median" = ?, "warm_cache_third_quartile" = ?,
                             "warm_cache_max_val" = ?, "hot_cache_min_val" = ?, "hot_cache_first_quartile" = ?,
-                            "hot_cache_median" = ?, "hot_cache_third_quartile" = ?, "hot_cache_max_val" = ?
+                            "hot_cache_median" = ?, "hot_cache_third_quartile" = ?, "hot_cache_max_val" = ?,
+                            "node_id" = ?, "execution_mode" = ?
                         WHERE "id" = ?
                     ''', (row['cold_cache_min_val'], row['cold_cache_first_quartile'], row['cold_cache_median'],
                           row['cold_cache_third_quartile'], row['cold_cache_max_val'], row['warm_cache_min_val'],
                           row['warm_cache_first_quartile'], row['warm_cache_median'], row['warm_cache_third_quartile'],
                           row['warm_cache_max_val'], row['hot_cache_min_val'], row['hot_cache_first_quartile'],
                           row['hot_cache_median'], row['hot_cache_third_quartile'], row['hot_cache_max_val'],
-                          benchmark_result_id))
+                          node_id, execution_mode, benchmark_result_id))
                 else:
                     # Insert new BenchmarkResult entry
                     cursor.execute('''
                         INSERT INTO "BenchmarkResult" (
-                            "cvmfs_build_id", "command_id", "client_config_id", "metric_id",
-                            "cold_cache_min_val", "cold_cache_first_quartile", "cold_cache_median",
+                            "cvmfs_build_id", "command_id", "client_config_id", "metric_id", "hardware_profile_id", "node_id",
+                            "execution_mode", "cold_cache_min_val", "cold_cache_first_quartile", "cold_cache_median",
                             "cold_cache_third_quartile", "cold_cache_max_val", "warm_cache_min_val",
                             "warm_cache_first_quartile", "warm_cache_median", "warm_cache_third_quartile",
                             "warm_cache_max_val", "hot_cache_min_val", "hot_cache_first_quartile",
                             "hot_cache_median", "hot_cache_third_quartile", "hot_cache_max_val"
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (cvmfs_build_id, command_id, client_config_id, metric_id,
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (cvmfs_build_id, command_id, client_config_id, metric_id, hardware_profile_id, node_id,
+                          execution_mode,
                           row['cold_cache_min_val'], row['cold_cache_first_quartile'], row['cold_cache_median'],
                           row['cold_cache_third_quartile'], row['cold_cache_max_val'], row['warm_cache_min_val'],
                           row['warm_cache_first_quartile'], row['warm_cache_median'], row['warm_cache_third_quartile'],
                           row['warm_cache_max_val'], row['hot_cache_min_val'], row['hot_cache_first_quartile'],
                           row['hot_cache_median'], row['hot_cache_third_quartile'], row['hot_cache_max_val']))
 
+            record_data_change(cursor, changed_builds)
             conn.commit()
             logging.info("CSV data inserted into the database successfully.")
+            snapshot_marker.mark_stale()
             return jsonify({"message": "Benchmark data inserted successfully"}), 201
         
         except Exception as e:
@@ -176,6 +602,317 @@ def insert_data():
         logging.error("Invalid file type, only .csv files are allowed")
         return "Invalid file type, only .csv files are allowed", 400
 
+TELEMETRY_COLUMNS = [
+    'stage', 'command', 'started_at', 'exit_code', 'wall_time', 'user_time', 'system_time',
+    'max_rss_kb', 'read_bytes', 'write_bytes', 'load_avg_start', 'load_avg_end',
+    'other_cpu_time', 'num_cpus'
+]
+
+@app.route('/api/insert_telemetry', methods=['POST'])
+def insert_telemetry():
+    node_id, _ = authenticate_node()
+
+    data = request.get_json()
+    if not data or not data.get('commit') or not data.get('stages'):
+        return jsonify({"error": "Missing commit or stages"}), 400
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        build = cursor.execute('SELECT "id" FROM "CVMFSBuild" WHERE "commit" = ?',
+                               (data['commit'].strip(),)).fetchone()
+        if not build:
+            return jsonify({"error": "Commit not found"}), 404
+
+        # A rerun of the pipeline on the same node replaces the telemetry of its previous run
+        cursor.execute('DELETE FROM "RunTelemetry" WHERE "cvmfs_build_id" = ? AND "node_id" IS ?', (build[0], node_id))
+        columns = ', '.join(f'"{column}"' for column in TELEMETRY_COLUMNS)
+        placeholders = ', '.join('?' for _ in TELEMETRY_COLUMNS)
+        cursor.executemany(
+            f'INSERT INTO "RunTelemetry" ("cvmfs_build_id", "node_id", {columns}) VALUES (?, ?, {placeholders})',
+            [(build[0], node_id, *(stage.get(column) for column in TELEMETRY_COLUMNS)) for stage in data['stages']]
+        )
+
+        # Settings the run was made with (e.g. quiet run mode), stored as JSON next to the results
+        if data.get('settings'):
+            cursor.execute('INSERT OR REPLACE INTO "RunSettings" ("cvmfs_build_id", "settings") VALUES (?, ?)',
+                           (build[0], json.dumps(data['settings'])))
+
+        conn.commit()
+        logging.info(f"Inserted {len(data['stages'])} telemetry records for commit {data['commit']}.")
+        snapshot_marker.mark_stale()
+        return jsonify({"message": "Telemetry inserted successfully"}), 201
+
+    except Exception as e:
+        logging.error(f"Failed to insert telemetry: {e}")
+        conn.rollback()
+        return jsonify({"error": str(e)}), 500
+
+    finally:
+        conn.close()
+
+@app.route('/api/regression_flags', methods=['POST'])
+def set_regression_flag():
+    """Flag or unflag a result of one hardware profile, the requesting node's unless hardware_profile names one."""
+    _, node_profile_id = authenticate_node()
+
+    data = request.get_json()
+    required = ['commit', 'client_config', 'command', 'metric']
+    if not data or not all(data.get(key) for key in required):
+        return jsonify({"error": f"Missing one of {required}"}), 400
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        hardware_profile_id = node_profile_id
+        if data.get('hardware_profile'):
+            profile = cursor.execute('SELECT "id" FROM "HardwareProfile" WHERE "name" = ?',
+                                     (data['hardware_profile'],)).fetchone()
+            if not profile:
+                return jsonify({"error": "Hardware profile not found"}), 404
+            hardware_profile_id = profile[0]
+        result = cursor.execute('''
+            SELECT
+                "BenchmarkResult"."cvmfs_build_id", "BenchmarkResult"."command_id",
+                "BenchmarkResult"."client_config_id", "BenchmarkResult"."metric_id",
+                "BenchmarkResult"."hardware_profile_id"
+            FROM "BenchmarkResult"
+            INNER JOIN "CVMFSBuild" ON "BenchmarkResult"."cvmfs_build_id" = "CVMFSBuild"."id"
+            INNER JOIN "ClientConfig" ON "BenchmarkResult"."client_config_id" = "ClientConfig"."id"
+            INNER JOIN "Command" ON "BenchmarkResult"."command_id" = "Command"."id"
+            INNER JOIN "Metric" ON "BenchmarkResult"."metric_id" = "Metric"."id"
+            WHERE "CVMFSBuild"."commit" = ? AND "ClientConfig"."config_name" = ?
+                AND "Command"."command_name" = ? AND "Metric"."metric_name" = ?
+                AND "BenchmarkResult"."hardware_profile_id" = ?
+        ''', (*(data[key] for key in required), hardware_profile_id)).fetchone()
+        if not result:
+            return jsonify({"error": "Benchmark result not found"}), 404
+
+        # "flagged": false removes an existing flag
+        if data.get('flagged', True):
+            cursor.execute('''
+                INSERT OR REPLACE INTO "RegressionFlag"
+                    ("cvmfs_build_id", "command_id", "client_config_id", "metric_id", "hardware_profile_id", "note")
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (*result, data.get('note')))
+        else:
+            cursor.execute('''
+                DELETE FROM "RegressionFlag"
+                WHERE "cvmfs_build_id" = ? AND "command_id" = ? AND "client_config_id" = ? AND "metric_id" = ?
+                    AND "hardware_profile_id" = ?
+            ''', result)
+
+        record_data_change(cursor, [result[0]])
+        conn.commit()
+        snapshot_marker.mark_stale()
+        return jsonify({"message": "Regression flag updated"}), 200
+
+    except Exception as e:
+        logging.error(f"Failed to update regression flag: {e}")
+        conn.rollback()
+        return jsonify({"error": str(e)}), 500
+
+    finally:
+        conn.close()
+
+DEFAULT_LEASE_TTL = 3600
+
+def complete_units(cursor, commits, combinations, metrics, hardware_profile_id):
+    """(commit, client config, command) units with results for all metrics in a hardware profile.
+
+    Every unit of a commit whose results of the profile were rolled up by retention.py is complete,
+    its results now live in WeeklyAggregate.
+    """
+    commit_placeholders = ', '.join('?' for _ in commits)
+    metric_placeholders = ', '.join('?' for _ in metrics)
+    cursor.execute(f'''
+        SELECT "CVMFSBuild"."commit", "ClientConfig"."config_name", "Command"."command_name"
+        FROM "BenchmarkResult"
+        INNER JOIN "CVMFSBuild" ON "BenchmarkResult"."cvmfs_build_id" = "CVMFSBuild"."id"
+        INNER JOIN "ClientConfig" ON "BenchmarkResult"."client_config_id" = "ClientConfig"."id"
+        INNER JOIN "Command" ON "BenchmarkResult"."command_id" = "Command"."id"
+        INNER JOIN "Metric" ON "BenchmarkResult"."metric_id" = "Metric"."id"
+        WHERE "CVMFSBuild"."commit" IN ({commit_placeholders})
+            AND "Metric"."metric_name" IN ({metric_placeholders})
+            AND "BenchmarkResult"."hardware_profile_id" = ?
+        GROUP BY "CVMFSBuild"."commit", "ClientConfig"."config_name", "Command"."command_name"
+        HAVING COUNT(DISTINCT "Metric"."metric_name") = ?
+    ''', (*commits, *metrics, hardware_profile_id, len(set(metrics))))
+    complete = set(cursor.fetchall())
+    cursor.execute(f'''
+        SELECT "CVMFSBuild"."commit"
+        FROM "RolledUpBuild"
+        INNER JOIN "CVMFSBuild" ON "RolledUpBuild"."cvmfs_build_id" = "CVMFSBuild"."id"
+        WHERE "CVMFSBuild"."commit" IN ({commit_placeholders}) AND "RolledUpBuild"."hardware_profile_id" = ?
+    ''', (*commits, hardware_profile_id))
+    complete.update((commit, client_config, command)
+                    for commit, in cursor.fetchall() for client_config, command in combinations)
+    return complete
+
+def runner_node_required():
+    """Authenticate a registered runner node, leases are never handed to the token-less legacy node."""
+    node_id, hardware_profile_id = authenticate_node()
+    if node_id is None:
+        abort(403)
+    return node_id, hardware_profile_id
+
+@app.route('/api/leases/claim', methods=['POST'])
+def claim_leases():
+    node_id, hardware_profile_id = runner_node_required()
+
+    data = request.get_json()
+    if not data or not data.get('commits') or not data.get('combinations') or not data.get('metrics'):
+        return jsonify({"error": "Missing commits, combinations or metrics"}), 400
+    commits = data['commits']
+    combinations = [(combination['client_config'], combination['command']) for combination in data['combinations']]
+    metrics = data['metrics']
+    max_units = data.get('max_units') or len(commits) * len(combinations)
+    ttl = data.get('ttl', DEFAULT_LEASE_TTL)
+
+    conn = get_db_connection()
+    conn.isolation_level = None
+    try:
+        cursor = conn.cursor()
+        # Serialize claims of concurrent nodes so a unit is never leased twice
+        cursor.execute('BEGIN IMMEDIATE')
+        if data.get('hardware'):
+            cursor.execute('UPDATE "RunnerNode" SET "hardware" = ? WHERE "id" = ?',
+                           (json.dumps(data['hardware'], sort_keys=True), node_id))
+
+        now = time.time()
+        commit_placeholders = ', '.join('?' for _ in commits)
+        unavailable = complete_units(cursor, commits, combinations, metrics, hardware_profile_id)
+
+        # Units finished or held under a live lease by a node of the same profile
+        cursor.execute(f'''
+            SELECT "commit", "client_config", "command"
+            FROM "WorkLease"
+            WHERE "commit" IN ({commit_placeholders})
+                AND "hardware_profile_id" = ?
+                AND ("completed_at" IS NOT NULL OR "expires_at" > ?)
+        ''', (*commits, hardware_profile_id, now))
+        unavailable.update(cursor.fetchall())
+
+        # Commits are offered in the node's priority order, expired leases are reissued
+        leases = []
+        for commit in commits:
+            for client_config, command in combinations:
+                if len(leases) >= max_units:
+                    break
+                if (commit, client_config, command) in unavailable:
+                    continue
+                cursor.execute('''
+                    INSERT OR REPLACE INTO "WorkLease"
+                        ("commit", "client_config", "command", "hardware_profile_id", "node_id", "claimed_at", "expires_at")
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (commit, client_config, command, hardware_profile_id, node_id, now, now + ttl))
+                leases.append({"id": cursor.lastrowid, "commit": commit, "client_config": client_config,
+                               "command": command, "expires_at": now + ttl})
+        cursor.execute('COMMIT')
+
+        logging.info(f"Runner node {node_id} claimed {len(leases)} units.")
+        return jsonify({"leases": leases, "ttl": ttl}), 200
+
+    except Exception as e:
+        logging.error(f"Failed to claim leases: {e}")
+        if conn.in_transaction:
+            cursor.execute('ROLLBACK')
+        return jsonify({"error": str(e)}), 500
+
+    finally:
+        conn.close()
+
+@app.route('/api/leases/renew', methods=['POST'])
+def renew_leases():
+    node_id, _ = runner_node_required()
+
+    data = request.get_json()
+    if not data or not data.get('lease_ids'):
+        return jsonify({"error": "Missing lease_ids"}), 400
+    lease_ids = data['lease_ids']
+    expires_at = time.time() + data.get('ttl', DEFAULT_LEASE_TTL)
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        placeholders = ', '.join('?' for _ in lease_ids)
+        # A lease that expired and was reissued to another node is lost and not renewed
+        cursor.execute(f'''
+            UPDATE "WorkLease" SET "expires_at" = ?
+            WHERE "id" IN ({placeholders}) AND "node_id" = ? AND "completed_at" IS NULL
+        ''', (expires_at, *lease_ids, node_id))
+        renewed = [row[0] for row in cursor.execute(f'''
+            SELECT "id" FROM "WorkLease"
+            WHERE "id" IN ({placeholders}) AND "node_id" = ? AND "completed_at" IS NULL
+        ''', (*lease_ids, node_id))]
+        conn.commit()
+        return jsonify({"renewed": renewed, "expires_at": expires_at}), 200
+
+    except Exception as e:
+        logging.error(f"Failed to renew leases: {e}")
+        conn.rollback()
+        return jsonify({"error": str(e)}), 500
+
+    finally:
+        conn.close()
+
+@app.route('/api/leases/finish', methods=['POST'])
+def finish_leases():
+    node_id, _ = runner_node_required()
+
+    data = request.get_json()
+    if not data or not data.get('lease_ids'):
+        return jsonify({"error": "Missing lease_ids"}), 400
+    lease_ids = data['lease_ids']
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        placeholders = ', '.join('?' for _ in lease_ids)
+        now = time.time()
+        # "failed": true releases the units right away so any node can claim them again
+        column = 'expires_at' if data.get('failed') else 'completed_at'
+        cursor.execute(f'''
+            UPDATE "WorkLease" SET "{column}" = ?
+            WHERE "id" IN ({placeholders}) AND "node_id" = ? AND "completed_at" IS NULL
+        ''', (now, *lease_ids, node_id))
+        conn.commit()
+        return jsonify({"finished": cursor.rowcount}), 200
+
+    except Exception as e:
+        logging.error(f"Failed to finish leases: {e}")
+        conn.rollback()
+        return jsonify({"error": str(e)}), 500
+
+    finally:
+        conn.close()
+
+@app.route('/api/hardware_profiles', methods=['GET'])
+def get_hardware_profiles():
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('SELECT "id", "name", "description" FROM "HardwareProfile" ORDER BY "id"')
+        profiles = [{"id": row[0], "name": row[1], "description": json.loads(row[2]), "nodes": []}
+                    for row in cursor.fetchall()]
+        profiles_by_id = {profile['id']: profile for profile in profiles}
+
+        cursor.execute('SELECT "name", "hardware_profile_id", "hardware", "last_seen" FROM "RunnerNode" ORDER BY "name"')
+        for name, hardware_profile_id, hardware, last_seen in cursor.fetchall():
+            profiles_by_id[hardware_profile_id]['nodes'].append({
+                "name": name,
+                "hardware": json.loads(hardware) if hardware else None,
+                "last_seen": last_seen,
+            })
+
+        conn.close()
+        return jsonify(profiles), 200
+
+    except Exception as e:
+        logging.error(f"Failed to retrieve hardware profiles: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/configurations', methods=['GET'])
 def get_configurations():
     try:
@@ -228,6 +965,13 @@ def get_head():
             return jsonify({"error": "Missing required parameters"}), 400
 
         conn = get_db_connection()
+        hardware_profile_id = requested_hardware_profile_id(conn.cursor())
+        store = get_series_store(conn)
+        if store is not None:
+            results = store.head((int(client_config_id), int(command_id), int(metric_id), hardware_profile_id))
+            conn.close()
+            return jsonify(results), 200
+
         cursor = conn.cursor()
 
         query = '''
@@ -260,6 +1004,7 @@ def get_head():
             "BenchmarkResult"."client_config_id" = ?
             AND "BenchmarkResult"."command_id" = ?
             AND "BenchmarkResult"."metric_id" = ?
+            AND "BenchmarkResult"."hardware_profile_id" = ?
             AND "CVMFSBuild"."id" IN (
                 SELECT "id"
                 FROM "CVMFSBuild"
@@ -270,7 +1015,7 @@ def get_head():
             "CVMFSBuild"."commit_datetime" DESC;
         '''
 
-        cursor.execute(query, (client_config_id, command_id, metric_id))
+        cursor.execute(query, (client_config_id, command_id, metric_id, hardware_profile_id))
         rows = cursor.fetchall()
 
         # Fetch column names
@@ -323,6 +1068,9 @@ def get_benchmark_combinations():
 
         conn = get_db_connection()
         cursor = conn.cursor()
+        # Coverage is per hardware profile: of the requesting runner node, else the requested one
+        node = node_from_token(cursor)
+        hardware_profile_id = node[1] if node else requested_hardware_profile_id(cursor)
 
         # Get benchmarked configurations for the commit from the database
         query = '''
@@ -342,9 +1090,10 @@ def get_benchmark_combinations():
             "Metric" ON "BenchmarkResult"."metric_id" = "Metric"."id"
         WHERE 
             "CVMFSBuild"."commit" = ?
+            AND "BenchmarkResult"."hardware_profile_id" = ?
         '''
 
-        cursor.execute(query, (commit_hash,))
+        cursor.execute(query, (commit_hash, hardware_profile_id))
         benchmarked_combinations = cursor.fetchall()
 
         # Convert benchmarked results into a set of tuples for easier comparison
@@ -365,6 +1114,184 @@ def get_benchmark_combinations():
         logging.error(f"Failed to retrieve benchmark combinations: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/coverage', methods=['POST'])
+def get_coverage():
+    """Commits of a batch whose results are complete for every combination and metric."""
+    data = request.get_json()
+    if not data or not data.get('commits') or not data.get('combinations') or not data.get('metrics'):
+        return jsonify({"error": "Missing commits, combinations or metrics"}), 400
+    combinations = {(combination['client_config'], combination['command']) for combination in data['combinations']}
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        node = node_from_token(cursor)
+        hardware_profile_id = node[1] if node else requested_hardware_profile_id(cursor)
+
+        covered = {}
+        for commit, client_config, command in complete_units(cursor, data['commits'], combinations,
+                                                             data['metrics'], hardware_profile_id):
+            covered.setdefault(commit, set()).add((client_config, command))
+        complete = [commit for commit in data['commits'] if combinations <= covered.get(commit, set())]
+        return jsonify({"complete": complete}), 200
+
+    except Exception as e:
+        logging.error(f"Failed to retrieve coverage: {e}")
+        return jsonify({"error": str(e)}), 500
+
+    finally:
+        conn.close()
+
+def lttb_indices(values, n_out):
+    """Largest-Triangle-Three-Buckets: indices of n_out points that best preserve the shape of the series."""
+    n = len(values)
+    if n_out >= n:
+        return list(range(n))
+
+    x = np.arange(n, dtype=float)
+    y = np.nan_to_num(np.asarray(values, dtype=float))
+    # The first and last points are always kept, the others are split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = [0]
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        prev = selected[-1]
+        areas = np.abs((x[prev] - avg_x) * (y[start:end] - y[prev]) - (x[prev] - x[start:end]) * (avg_y - y[prev]))
+        selected.append(start + int(np.argmax(areas)))
+    selected.append(n - 1)
+    return selected
+
+
+def split_into_buckets(n, keep, n_buckets):
+    """Split row positions 0..n-1 into contiguous buckets; positions in keep get a bucket of their own."""
+    segments, current = [], []
+    for i in range(n):
+        if i in keep:
+            if current:
+                segments.append(current)
+                current = []
+            segments.append([i])
+        else:
+            current.append(i)
+    if current:
+        segments.append(current)
+
+    free_rows = n - len(keep)
+    free_buckets = max(n_buckets - len(keep), 1)
+    buckets = []
+    for segment in segments:
+        if segment[0] in keep:
+            buckets.append(segment)
+            continue
+        parts = min(len(segment), max(1, round(len(segment) * free_buckets / free_rows)))
+        buckets.extend(chunk.tolist() for chunk in np.array_split(segment, parts))
+    return buckets
+
+
+def downsample_results(results, max_points, mode):
+    """Reduce a time series to about max_points rows. Tagged releases and flagged regressions are always kept.
+
+    Mode 'line' keeps the commits chosen by LTTB on the medians of every cache type. Mode 'box'
+    merges neighbouring commits into one box per bucket spanning the envelope of their quartiles.
+    """
+    if not max_points or len(results) <= max_points:
+        return results
+
+    keep = {i for i, row in enumerate(results) if row.get('tag') or row.get('regression')}
+
+    if mode == 'box':
+        buckets = split_into_buckets(len(results), keep, max_points)
+        # Buckets are contiguous, so every envelope is a reduction between consecutive bucket starts
+        starts = np.array([bucket[0] for bucket in buckets])
+        envelope = {}
+        for cache_type in CACHE_TYPES:
+            values = {field: np.array([row[f'{cache_type}_{field}'] for row in results], dtype=float)
+                      for field in QUARTILE_FIELDS}
+            envelope[f'{cache_type}_min_val'] = np.fmin.reduceat(values['min_val'], starts)
+            envelope[f'{cache_type}_first_quartile'] = np.fmin.reduceat(values['first_quartile'], starts)
+            envelope[f'{cache_type}_median'] = [np.nanmedian(values['median'][bucket[0]:bucket[-1] + 1])
+                                                for bucket in buckets]
+            envelope[f'{cache_type}_third_quartile'] = np.fmax.reduceat(values['third_quartile'], starts)
+            envelope[f'{cache_type}_max_val'] = np.fmax.reduceat(values['max_val'], starts)
+
+        merged = []
+        for index, bucket in enumerate(buckets):
+            if len(bucket) == 1:
+                merged.append(results[bucket[0]])
+                continue
+            # Rows are newest first, the newest commit labels the merged box; weekly roll-ups count their commits
+            oldest = results[bucket[-1]]
+            row = dict(results[bucket[0]], merged_commits=sum(results[i].get('merged_commits') or 1 for i in bucket),
+                       oldest_commit=oldest.get('oldest_commit') or oldest['commit'])
+            row.update({column: float(values[index]) for column, values in envelope.items()})
+            merged.append(row)
+        return merged
+
+    selected = set(keep)
+    per_cache = max((max_points - len(keep)) // len(CACHE_TYPES), 3)
+    for cache_type in CACHE_TYPES:
+        selected.update(lttb_indices([row[f'{cache_type}_median'] for row in results], per_cache))
+    return [results[i] for i in sorted(selected)]
+
+def add_weekly_aggregates(cursor, results, key, by_names, limit):
+    """Merge the weekly roll-ups of compacted commits into a newest-first series and re-apply the limit.
+
+    A roll-up is returned like a merged box of the downsampling: labelled by the week's newest commit,
+    with merged_commits and oldest_commit.
+    """
+    if by_names:
+        series_filter = '''
+            INNER JOIN "ClientConfig" ON "WeeklyAggregate"."client_config_id" = "ClientConfig"."id"
+            INNER JOIN "Command" ON "WeeklyAggregate"."command_id" = "Command"."id"
+            INNER JOIN "Metric" ON "WeeklyAggregate"."metric_id" = "Metric"."id"
+            WHERE "ClientConfig"."config_name" = ? AND "Command"."command_name" = ? AND "Metric"."metric_name" = ?
+        '''
+    else:
+        series_filter = '''
+            WHERE "WeeklyAggregate"."client_config_id" = ? AND "WeeklyAggregate"."command_id" = ?
+                AND "WeeklyAggregate"."metric_id" = ?
+        '''
+    cursor.execute(f'''
+        SELECT
+            'weekly' AS "build_type",
+            "WeeklyAggregate"."last_commit" AS "commit",
+            "WeeklyAggregate"."last_datetime" AS "commit_datetime",
+            NULL AS "tag",
+            "WeeklyAggregate"."version",
+            "WeeklyAggregate"."cold_cache_min_val",
+            "WeeklyAggregate"."cold_cache_first_quartile",
+            "WeeklyAggregate"."cold_cache_median",
+            "WeeklyAggregate"."cold_cache_third_quartile",
+            "WeeklyAggregate"."cold_cache_max_val",
+            "WeeklyAggregate"."warm_cache_min_val",
+            "WeeklyAggregate"."warm_cache_first_quartile",
+            "WeeklyAggregate"."warm_cache_median",
+            "WeeklyAggregate"."warm_cache_third_quartile",
+            "WeeklyAggregate"."warm_cache_max_val",
+            "WeeklyAggregate"."hot_cache_min_val",
+            "WeeklyAggregate"."hot_cache_first_quartile",
+            "WeeklyAggregate"."hot_cache_median",
+            "WeeklyAggregate"."hot_cache_third_quartile",
+            "WeeklyAggregate"."hot_cache_max_val",
+            0 AS "regression",
+            "WeeklyAggregate"."num_commits" AS "merged_commits",
+            "WeeklyAggregate"."first_commit" AS "oldest_commit"
+        FROM "WeeklyAggregate"
+        {series_filter}
+            AND "WeeklyAggregate"."hardware_profile_id" = ?
+        ORDER BY "WeeklyAggregate"."last_datetime" DESC
+        LIMIT ?
+    ''', (*key, limit))
+    columns = [column[0] for column in cursor.description]
+    aggregates = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    if not aggregates:
+        return results
+
+    merged = sorted(results + aggregates, key=lambda row: row['commit_datetime'], reverse=True)
+    return merged[:limit] if limit >= 0 else merged
+
 @app.route('/api/commits_data', methods=['GET'])
 def get_commits_data():
     try:
@@ -373,12 +1300,25 @@ def get_commits_data():
         command_id = request.args.get('command_id')
         metric_id = request.args.get('metric_id')
         num_commits = request.args.get('num_commits', 12)  # Default to 12 if not provided
+        max_points = request.args.get('max_points', type=int)
+        mode = request.args.get('mode', 'line')
+        if num_commits == 'all':
+            num_commits = -1  # SQLite treats a negative LIMIT as no limit
 
         # Validate that the required parameters are provided
         if not all([client_config_id, command_id, metric_id]):
             return jsonify({"error": "Missing required parameters"}), 400
 
         conn = get_db_connection()
+        hardware_profile_id = requested_hardware_profile_id(conn.cursor())
+        store = get_series_store(conn)
+        if store is not None:
+            key = (int(client_config_id), int(command_id), int(metric_id), hardware_profile_id)
+            results = store.commits_data(key, by_names=False, limit=int(num_commits))
+            results = add_weekly_aggregates(conn.cursor(), results, key, False, int(num_commits))
+            conn.close()
+            return jsonify(downsample_results(results, max_points, mode)), 200
+
         cursor = conn.cursor()
 
         query = '''
@@ -402,21 +1342,29 @@ def get_commits_data():
             "BenchmarkResult"."hot_cache_first_quartile",
             "BenchmarkResult"."hot_cache_median",
             "BenchmarkResult"."hot_cache_third_quartile",
-            "BenchmarkResult"."hot_cache_max_val"
+            "BenchmarkResult"."hot_cache_max_val",
+            "RegressionFlag"."id" IS NOT NULL AS "regression"
         FROM 
             "BenchmarkResult"
         INNER JOIN 
             "CVMFSBuild" ON "BenchmarkResult"."cvmfs_build_id" = "CVMFSBuild"."id"
+        LEFT JOIN
+            "RegressionFlag" ON "RegressionFlag"."cvmfs_build_id" = "BenchmarkResult"."cvmfs_build_id"
+            AND "RegressionFlag"."command_id" = "BenchmarkResult"."command_id"
+            AND "RegressionFlag"."client_config_id" = "BenchmarkResult"."client_config_id"
+            AND "RegressionFlag"."metric_id" = "BenchmarkResult"."metric_id"
+            AND "RegressionFlag"."hardware_profile_id" = "BenchmarkResult"."hardware_profile_id"
         WHERE 
             "BenchmarkResult"."client_config_id" = ?
             AND "BenchmarkResult"."command_id" = ?
             AND "BenchmarkResult"."metric_id" = ?
+            AND "BenchmarkResult"."hardware_profile_id" = ?
         ORDER BY 
             "CVMFSBuild"."commit_datetime" DESC
         LIMIT ?
         '''
 
-        cursor.execute(query, (client_config_id, command_id, metric_id, num_commits))
+        cursor.execute(query, (client_config_id, command_id, metric_id, hardware_profile_id, num_commits))
         rows = cursor.fetchall()
 
         # Fetch column names
@@ -424,9 +1372,11 @@ def get_commits_data():
 
         # Convert the rows into a list of dictionaries
         results = [dict(zip(columns, row)) for row in rows]
+        results = add_weekly_aggregates(cursor, results, (client_config_id, command_id, metric_id, hardware_profile_id),
+                                        False, int(num_commits))
 
         conn.close()
-        return jsonify(results), 200
+        return jsonify(downsample_results(results, max_points, mode)), 200
 
     except Exception as e:
         logging.error(f"Failed to retrieve data: {e}")
@@ -440,12 +1390,25 @@ def get_commits_data_by_names():
         command_name = request.args.get('command_name')
         metric_name = request.args.get('metric_name')
         num_commits = request.args.get('num_commits', 12)  # Default to 12 if not provided
+        max_points = request.args.get('max_points', type=int)
+        mode = request.args.get('mode', 'line')
+        if num_commits == 'all':
+            num_commits = -1  # SQLite treats a negative LIMIT as no limit
 
         # Validate that the required parameters are provided
         if not all([client_config_name, command_name, metric_name]):
             return jsonify({"error": "Missing required parameters"}), 400
 
         conn = get_db_connection()
+        hardware_profile_id = requested_hardware_profile_id(conn.cursor())
+        store = get_series_store(conn)
+        if store is not None:
+            key = (client_config_name, command_name, metric_name, hardware_profile_id)
+            results = store.commits_data(key, by_names=True, limit=int(num_commits))
+            results = add_weekly_aggregates(conn.cursor(), results, key, True, int(num_commits))
+            conn.close()
+            return jsonify(downsample_results(results, max_points, mode)), 200
+
         cursor = conn.cursor()
 
         query = '''
@@ -469,7 +1432,8 @@ def get_commits_data_by_names():
             "BenchmarkResult"."hot_cache_first_quartile",
             "BenchmarkResult"."hot_cache_median",
             "BenchmarkResult"."hot_cache_third_quartile",
-            "BenchmarkResult"."hot_cache_max_val"
+            "BenchmarkResult"."hot_cache_max_val",
+            "RegressionFlag"."id" IS NOT NULL AS "regression"
         FROM 
             "BenchmarkResult"
         INNER JOIN 
@@ -480,16 +1444,23 @@ def get_commits_data_by_names():
             "Command" ON "BenchmarkResult"."command_id" = "Command"."id"
         INNER JOIN
             "Metric" ON "BenchmarkResult"."metric_id" = "Metric"."id"
+        LEFT JOIN
+            "RegressionFlag" ON "RegressionFlag"."cvmfs_build_id" = "BenchmarkResult"."cvmfs_build_id"
+            AND "RegressionFlag"."command_id" = "BenchmarkResult"."command_id"
+            AND "RegressionFlag"."client_config_id" = "BenchmarkResult"."client_config_id"
+            AND "RegressionFlag"."metric_id" = "BenchmarkResult"."metric_id"
+            AND "RegressionFlag"."hardware_profile_id" = "BenchmarkResult"."hardware_profile_id"
         WHERE 
             "ClientConfig"."config_name" = ?
             AND "Command"."command_name" = ?
             AND "Metric"."metric_name" = ?
+            AND "BenchmarkResult"."hardware_profile_id" = ?
         ORDER BY 
             "CVMFSBuild"."commit_datetime" DESC
         LIMIT ?
         '''
 
-        cursor.execute(query, (client_config_name, command_name, metric_name, num_commits))
+        cursor.execute(query, (client_config_name, command_name, metric_name, hardware_profile_id, num_commits))
         rows = cursor.fetchall()
 
         # Fetch column names
@@ -497,9 +1468,12 @@ def get_commits_data_by_names():
 
         # Convert the rows into a list of dictionaries
         results = [dict(zip(columns, row)) for row in rows]
+        results = add_weekly_aggregates(cursor, results,
+                                        (client_config_name, command_name, metric_name, hardware_profile_id),
+                                        True, int(num_commits))
 
         conn.close()
-        return jsonify(results), 200
+        return jsonify(downsample_results(results, max_points, mode)), 200
 
     except Exception as e:
         logging.error(f"Failed to retrieve data by names: {e}")
@@ -521,11 +1495,13 @@ def get_commits_list():
             "CVMFSBuild"
         INNER JOIN
             "BenchmarkResult" ON "BenchmarkResult"."cvmfs_build_id" = "CVMFSBuild"."id"
+        WHERE
+            "BenchmarkResult"."hardware_profile_id" = ?
         ORDER BY
             "CVMFSBuild"."commit_datetime" DESC
         '''
 
-        cursor.execute(query)
+        cursor.execute(query, (requested_hardware_profile_id(cursor),))
         rows = cursor.fetchall()
 
         # Convert the rows into a list of dictionaries
@@ -566,6 +1542,16 @@ def get_results_by_commit():
 
         commit_info_dict = dict(zip([column[0] for column in cursor.description], commit_info))
 
+        # Attach the settings the run was made with, if any were recorded
+        cursor.execute('''
+            SELECT "RunSettings"."settings"
+            FROM "RunSettings"
+            INNER JOIN "CVMFSBuild" ON "RunSettings"."cvmfs_build_id" = "CVMFSBuild"."id"
+            WHERE "CVMFSBuild"."commit" = ?
+        ''', (commit,))
+        run_settings = cursor.fetchone()
+        commit_info_dict['run_settings'] = json.loads(run_settings[0]) if run_settings else None
+
         # Get results
         query = '''
         SELECT
@@ -585,12 +1571,14 @@ def get_results_by_commit():
             "Metric" ON "BenchmarkResult"."metric_id" = "Metric"."id"
         WHERE 
             "CVMFSBuild"."commit" = ?
+            AND "BenchmarkResult"."hardware_profile_id" = ?
         '''
 
-        df = pd.read_sql_query(query, conn, params=(commit,))
+        df = pd.read_sql_query(query, conn, params=(commit, requested_hardware_profile_id(cursor)))
 
         # Exclude unwanted columns
-        df = df.drop(columns=['id', 'cvmfs_build_id', 'client_config_id', 'command_id', 'metric_id'])
+        df = df.drop(columns=['id', 'cvmfs_build_id', 'client_config_id', 'command_id', 'metric_id',
+                              'hardware_profile_id', 'node_id'])
 
         # Convert DataFrame to list of dictionaries
         results = df.to_dict(orient='records')
@@ -602,6 +1590,157 @@ def get_results_by_commit():
         logging.error(f"Failed to retrieve results by commit: {e}")
         return jsonify({"error": str(e)}), 500
 
+COMPARE_KEYS = ['command_name', 'client_config_name', 'metric_name']
+COMPARE_FIELDS = [f'{cache_type}_{field}' for cache_type in CACHE_TYPES
+                  for field in ('first_quartile', 'median', 'third_quartile')]
+
+def compare_results(pairs):
+    """Compare the base_* and head_* quartiles of every combination, sorted by effect size.
+
+    For each cache type the medians give an absolute delta and a head/base ratio. A change is
+    significant when the interquartile ranges of base and head do not overlap. The effect size is
+    the largest absolute log ratio over the cache types, so a 2x slowdown and a 2x speedup rank equally.
+    """
+    comparison = pairs[COMPARE_KEYS].copy()
+    effects, significant = [], []
+    for cache_type in CACHE_TYPES:
+        base = pairs[f'base_{cache_type}_median'].to_numpy(dtype=float)
+        head = pairs[f'head_{cache_type}_median'].to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(base != 0, head / base, np.nan)
+            effects.append(np.abs(np.log(ratio)))
+        disjoint = ((pairs[f'head_{cache_type}_first_quartile'] > pairs[f'base_{cache_type}_third_quartile'])
+                    | (pairs[f'head_{cache_type}_third_quartile'] < pairs[f'base_{cache_type}_first_quartile']))
+        comparison[f'{cache_type}_base_median'] = base
+        comparison[f'{cache_type}_head_median'] = head
+        comparison[f'{cache_type}_delta'] = head - base
+        comparison[f'{cache_type}_ratio'] = ratio
+        comparison[f'{cache_type}_significant'] = disjoint.to_numpy()
+        significant.append(disjoint.to_numpy())
+
+    comparison['effect_size'] = np.fmax.reduce(np.column_stack(effects), axis=1) if len(pairs) else []
+    comparison['significant'] = np.logical_or.reduce(significant) if len(pairs) else []
+    comparison = comparison.sort_values('effect_size', ascending=False, na_position='last', kind='stable')
+    # NaN (e.g. a zero base median) is returned as null
+    return comparison.astype(object).where(comparison.notna(), None).to_dict(orient='records')
+
+@app.route('/api/compare', methods=['GET'])
+def compare_commits():
+    try:
+        base = request.args.get('base')
+        head = request.args.get('head')
+        significant_only = request.args.get('significant_only', 'false').lower() == 'true'
+        limit = request.args.get('limit', type=int)
+        if not base or not head:
+            return jsonify({"error": "Missing required parameters 'base' and 'head'"}), 400
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        commit_infos = {}
+        for commit in (base, head):
+            cursor.execute('SELECT "commit", "commit_datetime", "version" FROM "CVMFSBuild" WHERE "commit" = ?',
+                           (commit,))
+            commit_info = cursor.fetchone()
+            if not commit_info:
+                conn.close()
+                return jsonify({"error": f"Commit {commit} not found"}), 404
+            commit_infos[commit] = dict(zip([column[0] for column in cursor.description], commit_info))
+
+        hardware_profile_id = requested_hardware_profile_id(cursor)
+        store = get_series_store(conn)
+        if store is not None:
+            frames = []
+            for prefix, commit in (('base', base), ('head', head)):
+                frame = store.results_for_commit(commit, hardware_profile_id).rename(columns={'config_name': 'client_config_name'})
+                frames.append(frame[COMPARE_KEYS + COMPARE_FIELDS].rename(
+                    columns={field: f'{prefix}_{field}' for field in COMPARE_FIELDS}))
+            pairs = frames[0].merge(frames[1], on=COMPARE_KEYS)
+        else:
+            # Both builds are matched per combination in a single self-join
+            quartiles = ',\n'.join(f'"{alias}"."{field}" AS "{prefix}_{field}"'
+                                   for prefix, alias in (('base', 'Base'), ('head', 'Head'))
+                                   for field in COMPARE_FIELDS)
+            query = f'''
+            SELECT
+                "Command"."command_name",
+                "ClientConfig"."config_name" AS "client_config_name",
+                "Metric"."metric_name",
+                {quartiles}
+            FROM
+                "BenchmarkResult" AS "Base"
+            INNER JOIN
+                "CVMFSBuild" AS "BaseBuild" ON "Base"."cvmfs_build_id" = "BaseBuild"."id"
+            INNER JOIN
+                "BenchmarkResult" AS "Head" ON "Head"."command_id" = "Base"."command_id"
+                AND "Head"."client_config_id" = "Base"."client_config_id"
+                AND "Head"."metric_id" = "Base"."metric_id"
+                AND "Head"."hardware_profile_id" = "Base"."hardware_profile_id"
+            INNER JOIN
+                "CVMFSBuild" AS "HeadBuild" ON "Head"."cvmfs_build_id" = "HeadBuild"."id"
+            INNER JOIN
+                "ClientConfig" ON "Base"."client_config_id" = "ClientConfig"."id"
+            INNER JOIN
+                "Command" ON "Base"."command_id" = "Command"."id"
+            INNER JOIN
+                "Metric" ON "Base"."metric_id" = "Metric"."id"
+            WHERE
+                "BaseBuild"."commit" = ?
+                AND "HeadBuild"."commit" = ?
+                AND "Base"."hardware_profile_id" = ?
+            '''
+            pairs = pd.read_sql_query(query, conn, params=(base, head, hardware_profile_id))
+        conn.close()
+
+        results = compare_results(pairs)
+        if significant_only:
+            results = [result for result in results if result['significant']]
+        if limit is not None:
+            results = results[:limit]
+
+        return jsonify({"base": commit_infos[base], "head": commit_infos[head], "results": results}), 200
+
+    except Exception as e:
+        logging.error(f"Failed to compare commits: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/telemetry_by_commit', methods=['GET'])
+def get_telemetry_by_commit():
+    try:
+        commit = request.args.get('commit')
+        if not commit:
+            return jsonify({"error": "Missing required parameter 'commit'"}), 400
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        columns = ', '.join(f'"RunTelemetry"."{column}"' for column in TELEMETRY_COLUMNS)
+        query = f'''
+        SELECT
+            {columns}
+        FROM
+            "RunTelemetry"
+        INNER JOIN
+            "CVMFSBuild" ON "RunTelemetry"."cvmfs_build_id" = "CVMFSBuild"."id"
+        WHERE
+            "CVMFSBuild"."commit" = ?
+        ORDER BY
+            "RunTelemetry"."id"
+        '''
+
+        cursor.execute(query, (commit,))
+        rows = cursor.fetchall()
+
+        # Convert the rows into a list of dictionaries
+        results = [dict(zip([column[0] for column in cursor.description], row)) for row in rows]
+
+        conn.close()
+        return jsonify(results), 200
+
+    except Exception as e:
+        logging.error(f"Failed to retrieve telemetry by commit: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/results_by_commit_csv', methods=['GET'])
 def get_results_by_commit_csv():
     try:
@@ -632,9 +1771,10 @@ def get_results_by_commit_csv():
             "Metric" ON "BenchmarkResult"."metric_id" = "Metric"."id"
         WHERE 
             "CVMFSBuild"."commit" = ?
+            AND "BenchmarkResult"."hardware_profile_id" = ?
         '''
 
-        df = pd.read_sql_query(query, conn, params=(commit,))
+        df = pd.read_sql_query(query, conn, params=(commit, requested_hardware_profile_id(conn.cursor())))
 
         # Exclude unwanted columns
         df = df.drop(columns=['id', 'cvmfs_build_id', 'client_config_id', 'command_id', 'metric_id'])
@@ -648,7 +1788,7 @@ def get_results_by_commit_csv():
             'warm_cache_third_quartile', 'warm_cache_max_val',
             'hot_cache_min_val', 'hot_cache_first_quartile', 'hot_cache_median',
             'hot_cache_third_quartile', 'hot_cache_max_val',
-            'version', 'commit', 'build_type'
+            'version', 'commit', 'build_type', 'execution_mode'
         ]
         df = df[columns_order]
 
@@ -670,6 +1810,11 @@ def get_results_by_commit_csv():
         return jsonify({"error": str(e)}), 500
 
 
+# Every start regenerates the snapshot, so the prerendered page refers to the current static assets
+snapshot_marker.mark_stale()
+threading.Thread(target=refresh_snapshots_in_background, name='snapshot-refresh', daemon=True).start()
+
+
 if __name__ == '__main__':
     logging.info("Starting the Flask server.")
     app.run(debug=True, host='0.0.0.0')
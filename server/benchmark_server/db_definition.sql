@@ -1,22 +1,25 @@
-CREATE TABLE "Command" (
+-- Pages freed by retention.py are returned to the file system with incremental vacuums
+PRAGMA auto_vacuum = INCREMENTAL;
+
+CREATE TABLE IF NOT EXISTS "Command" (
     "id" INTEGER PRIMARY KEY AUTOINCREMENT,
     "command_name" TEXT NOT NULL UNIQUE,
     "command_content" TEXT NOT NULL
 );
 
-CREATE TABLE "ClientConfig" (
+CREATE TABLE IF NOT EXISTS "ClientConfig" (
     "id" INTEGER PRIMARY KEY AUTOINCREMENT,
     "config_name" TEXT NOT NULL UNIQUE,
     "config_content" TEXT NOT NULL
 );
 
-CREATE TABLE "Metric" (
+CREATE TABLE IF NOT EXISTS "Metric" (
     "id" INTEGER PRIMARY KEY AUTOINCREMENT,
     "metric_name" TEXT NOT NULL UNIQUE,
     "metric_description" TEXT NOT NULL
 );
 
-CREATE TABLE "CVMFSBuild" (
+CREATE TABLE IF NOT EXISTS "CVMFSBuild" (
     "id" INTEGER PRIMARY KEY AUTOINCREMENT,
     "build_type" TEXT,
     "commit" TEXT NOT NULL UNIQUE,
@@ -25,12 +28,37 @@ CREATE TABLE "CVMFSBuild" (
     "version" TEXT NOT NULL
 );
 
-CREATE TABLE "BenchmarkResult" (
+-- Machines with the same hardware profile share time series, results of different profiles are never mixed
+CREATE TABLE IF NOT EXISTS "HardwareProfile" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT,
+    "name" TEXT NOT NULL UNIQUE,
+    "description" TEXT NOT NULL DEFAULT '{}'
+);
+
+-- Results uploaded before runner nodes existed belong to the default profile
+INSERT OR IGNORE INTO "HardwareProfile" ("id", "name") VALUES (1, 'default');
+
+CREATE TABLE IF NOT EXISTS "RunnerNode" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT,
+    "name" TEXT NOT NULL UNIQUE,
+    "token_hash" TEXT NOT NULL UNIQUE,
+    "hardware_profile_id" INTEGER NOT NULL,
+    "hardware" TEXT,
+    "registered_at" TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "last_seen" TEXT,
+    FOREIGN KEY ("hardware_profile_id") REFERENCES "HardwareProfile"("id") ON UPDATE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS "BenchmarkResult" (
     "id" INTEGER PRIMARY KEY AUTOINCREMENT,
     "cvmfs_build_id" INTEGER NOT NULL,
     "command_id" INTEGER NOT NULL,
     "client_config_id" INTEGER NOT NULL,
     "metric_id" INTEGER NOT NULL,
+    "hardware_profile_id" INTEGER NOT NULL DEFAULT 1,
+    "node_id" INTEGER,
+    -- parallel or serial run of the (client config, command) unit, mixed if both contributed repetitions
+    "execution_mode" TEXT NOT NULL DEFAULT 'serial',
     "cold_cache_min_val" REAL NOT NULL,
     "cold_cache_first_quartile" REAL NOT NULL,
     "cold_cache_median" REAL NOT NULL,
@@ -50,5 +78,128 @@ CREATE TABLE "BenchmarkResult" (
     FOREIGN KEY ("client_config_id") REFERENCES "ClientConfig"("id") ON UPDATE CASCADE,
     FOREIGN KEY ("metric_id") REFERENCES "Metric"("id") ON UPDATE CASCADE,
     FOREIGN KEY ("cvmfs_build_id") REFERENCES "CVMFSBuild"("id") ON UPDATE CASCADE,
-    UNIQUE ("cvmfs_build_id", "command_id", "client_config_id", "metric_id")
+    FOREIGN KEY ("hardware_profile_id") REFERENCES "HardwareProfile"("id") ON UPDATE CASCADE,
+    FOREIGN KEY ("node_id") REFERENCES "RunnerNode"("id") ON UPDATE CASCADE,
+    UNIQUE ("cvmfs_build_id", "command_id", "client_config_id", "metric_id", "hardware_profile_id")
+);
+
+CREATE TABLE IF NOT EXISTS "RunTelemetry" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT,
+    "cvmfs_build_id" INTEGER NOT NULL,
+    "node_id" INTEGER,
+    "stage" TEXT NOT NULL,
+    "command" TEXT,
+    "started_at" TEXT,
+    "exit_code" INTEGER,
+    "wall_time" REAL NOT NULL,
+    "user_time" REAL,
+    "system_time" REAL,
+    "max_rss_kb" INTEGER,
+    "read_bytes" INTEGER,
+    "write_bytes" INTEGER,
+    "load_avg_start" REAL,
+    "load_avg_end" REAL,
+    "other_cpu_time" REAL,
+    "num_cpus" INTEGER,
+    FOREIGN KEY ("cvmfs_build_id") REFERENCES "CVMFSBuild"("id") ON UPDATE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS "RunSettings" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT,
+    "cvmfs_build_id" INTEGER NOT NULL UNIQUE,
+    "settings" TEXT NOT NULL,
+    FOREIGN KEY ("cvmfs_build_id") REFERENCES "CVMFSBuild"("id") ON UPDATE CASCADE
+);
+
+-- Flags mark a result of one hardware profile's series, like the results they are never shared between profiles
+CREATE TABLE IF NOT EXISTS "RegressionFlag" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT,
+    "cvmfs_build_id" INTEGER NOT NULL,
+    "command_id" INTEGER NOT NULL,
+    "client_config_id" INTEGER NOT NULL,
+    "metric_id" INTEGER NOT NULL,
+    "hardware_profile_id" INTEGER NOT NULL DEFAULT 1,
+    "note" TEXT,
+    FOREIGN KEY ("command_id") REFERENCES "Command"("id") ON UPDATE CASCADE,
+    FOREIGN KEY ("client_config_id") REFERENCES "ClientConfig"("id") ON UPDATE CASCADE,
+    FOREIGN KEY ("metric_id") REFERENCES "Metric"("id") ON UPDATE CASCADE,
+    FOREIGN KEY ("cvmfs_build_id") REFERENCES "CVMFSBuild"("id") ON UPDATE CASCADE,
+    FOREIGN KEY ("hardware_profile_id") REFERENCES "HardwareProfile"("id") ON UPDATE CASCADE,
+    UNIQUE ("cvmfs_build_id", "command_id", "client_config_id", "metric_id", "hardware_profile_id")
+);
+
+-- Builds whose results changed, in ingest order, so in-memory copies can refresh incrementally
+CREATE TABLE IF NOT EXISTS "DataChange" (
+    "version" INTEGER PRIMARY KEY AUTOINCREMENT,
+    "cvmfs_build_id" INTEGER NOT NULL,
+    "changed_at" TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY ("cvmfs_build_id") REFERENCES "CVMFSBuild"("id") ON UPDATE CASCADE
+);
+
+-- Units of work (a commit benchmarked with one client config and command) claimed by runner nodes.
+-- A lease expires unless renewed; expired leases are handed out again.
+CREATE TABLE IF NOT EXISTS "WorkLease" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT,
+    "commit" TEXT NOT NULL,
+    "client_config" TEXT NOT NULL,
+    "command" TEXT NOT NULL,
+    "hardware_profile_id" INTEGER NOT NULL,
+    "node_id" INTEGER NOT NULL,
+    "claimed_at" REAL NOT NULL,
+    "expires_at" REAL NOT NULL,
+    "completed_at" REAL,
+    FOREIGN KEY ("hardware_profile_id") REFERENCES "HardwareProfile"("id") ON UPDATE CASCADE,
+    FOREIGN KEY ("node_id") REFERENCES "RunnerNode"("id") ON UPDATE CASCADE,
+    UNIQUE ("commit", "client_config", "command", "hardware_profile_id")
+);
+
+-- Results of old intermediate commits rolled up per week and series by retention.py, the commits'
+-- BenchmarkResult rows are deleted. Quartiles are the envelope of the week's boxes, the median is the
+-- median of the commits' medians. Commits of a week rolled up in a later compaction are merged in with
+-- the mean of both medians, weighted by their number of commits.
+CREATE TABLE IF NOT EXISTS "WeeklyAggregate" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT,
+    "week_start" TEXT NOT NULL,
+    "command_id" INTEGER NOT NULL,
+    "client_config_id" INTEGER NOT NULL,
+    "metric_id" INTEGER NOT NULL,
+    "hardware_profile_id" INTEGER NOT NULL DEFAULT 1,
+    "num_commits" INTEGER NOT NULL,
+    "first_commit" TEXT NOT NULL,
+    "first_datetime" TEXT NOT NULL,
+    "last_commit" TEXT NOT NULL,
+    "last_datetime" TEXT NOT NULL,
+    "version" TEXT NOT NULL,
+    "cold_cache_min_val" REAL NOT NULL,
+    "cold_cache_first_quartile" REAL NOT NULL,
+    "cold_cache_median" REAL NOT NULL,
+    "cold_cache_third_quartile" REAL NOT NULL,
+    "cold_cache_max_val" REAL NOT NULL,
+    "warm_cache_min_val" REAL NOT NULL,
+    "warm_cache_first_quartile" REAL NOT NULL,
+    "warm_cache_median" REAL NOT NULL,
+    "warm_cache_third_quartile" REAL NOT NULL,
+    "warm_cache_max_val" REAL NOT NULL,
+    "hot_cache_min_val" REAL NOT NULL,
+    "hot_cache_first_quartile" REAL NOT NULL,
+    "hot_cache_median" REAL NOT NULL,
+    "hot_cache_third_quartile" REAL NOT NULL,
+    "hot_cache_max_val" REAL NOT NULL,
+    FOREIGN KEY ("command_id") REFERENCES "Command"("id") ON UPDATE CASCADE,
+    FOREIGN KEY ("client_config_id") REFERENCES "ClientConfig"("id") ON UPDATE CASCADE,
+    FOREIGN KEY ("metric_id") REFERENCES "Metric"("id") ON UPDATE CASCADE,
+    FOREIGN KEY ("hardware_profile_id") REFERENCES "HardwareProfile"("id") ON UPDATE CASCADE,
+    UNIQUE ("client_config_id", "command_id", "metric_id", "hardware_profile_id", "week_start")
+);
+
+-- Builds whose results of a hardware profile were rolled up into WeeklyAggregate, they count as complete
+-- for that profile
+CREATE TABLE IF NOT EXISTS "RolledUpBuild" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT,
+    "cvmfs_build_id" INTEGER NOT NULL,
+    "hardware_profile_id" INTEGER NOT NULL,
+    "week_start" TEXT NOT NULL,
+    FOREIGN KEY ("cvmfs_build_id") REFERENCES "CVMFSBuild"("id") ON UPDATE CASCADE,
+    FOREIGN KEY ("hardware_profile_id") REFERENCES "HardwareProfile"("id") ON UPDATE CASCADE,
+    UNIQUE ("cvmfs_build_id", "hardware_profile_id")
 );
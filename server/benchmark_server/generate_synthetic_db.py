@@ -0,0 +1,76 @@
+import os
+import sys
+import random
+import sqlite3
+import argparse
+from datetime import datetime, timedelta
+
+from series_store import CACHE_COLUMNS
+
+DB_DEFINITION = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'db_definition.sql')
+
+
+def generate(database, num_commits, client_configs, commands, metrics, seed=1):
+    """Create a benchmarks database filled with synthetic results for load and latency tests.
+
+    Every commit gets a result for every (client config, command, metric) combination. Medians
+    drift slowly with a step change half way through the history, every 500th commit is tagged.
+    """
+    random.seed(seed)
+    conn = sqlite3.connect(database)
+    cursor = conn.cursor()
+    with open(DB_DEFINITION, 'r') as f:
+        cursor.executescript(f.read())
+
+    cursor.executemany('INSERT OR IGNORE INTO "ClientConfig" ("config_name", "config_content") VALUES (?, ?)',
+                       [(name, name) for name in client_configs])
+    cursor.executemany('INSERT OR IGNORE INTO "Command" ("command_name", "command_content") VALUES (?, ?)',
+                       [(name, name) for name in commands])
+    cursor.executemany('INSERT OR IGNORE INTO "Metric" ("metric_name", "metric_description") VALUES (?, ?)',
+                       [(name, name) for name in metrics])
+    ids = {table: [row[0] for row in cursor.execute(f'SELECT "id" FROM "{table}" ORDER BY "id"')]
+           for table in ('ClientConfig', 'Command', 'Metric')}
+
+    columns = ', '.join(f'"{column}"' for column in CACHE_COLUMNS)
+    placeholders = ', '.join('?' for _ in CACHE_COLUMNS)
+    for i in range(num_commits):
+        commit_datetime = (datetime(2020, 1, 1) + timedelta(minutes=i)).strftime('%Y%m%d%H%M%S')
+        cursor.execute('''
+            INSERT INTO "CVMFSBuild" ("commit", "commit_datetime", "version", "tag", "build_type")
+            VALUES (?, ?, ?, ?, ?)
+        ''', (f'{random.getrandbits(160):040x}', commit_datetime, '2.12.0.0',
+              f'cvmfs-2.{i // 500}.0' if i % 500 == 0 else None, 'automatic'))
+        build_id = cursor.lastrowid
+
+        rows = []
+        for client_config_id in ids['ClientConfig']:
+            for command_id in ids['Command']:
+                for metric_id in ids['Metric']:
+                    values = []
+                    for cache_index in range(3):
+                        median = 10 + cache_index + (2 if i > num_commits // 2 else 0) + random.random()
+                        spread = 0.2 + random.random() * 0.3
+                        values += [median - 2 * spread, median - spread, median, median + spread, median + 2 * spread]
+                    rows.append((build_id, command_id, client_config_id, metric_id, *values))
+        cursor.executemany(f'''
+            INSERT INTO "BenchmarkResult" ("cvmfs_build_id", "command_id", "client_config_id", "metric_id", {columns})
+            VALUES (?, ?, ?, ?, {placeholders})
+        ''', rows)
+
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic benchmarks database.")
+    parser.add_argument('database', help="Path of the SQLite database to create")
+    parser.add_argument('--commits', type=int, default=3000)
+    parser.add_argument('--client-configs', nargs='+', default=['default', 'no_proxy'])
+    parser.add_argument('--commands', nargs='+', default=['root', 'tensorflow', 'lhcb'])
+    parser.add_argument('--metrics', nargs='+', default=['real', 'user', 'sys', 'sft.cern.ch_nopen'])
+    args = parser.parse_args()
+
+    if os.path.exists(args.database):
+        print(f"{args.database} already exists, refusing to overwrite it.")
+        sys.exit(1)
+    generate(args.database, args.commits, args.client_configs, args.commands, args.metrics)
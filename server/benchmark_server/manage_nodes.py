@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+import sqlite3
+import hashlib
+import secrets
+import argparse
+from dotenv import load_dotenv
+
+import snapshot_marker
+
+load_dotenv()
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATABASE = os.getenv('BENCHMARK_DATABASE', os.path.join(BASE_DIR, 'benchmarks.db'))
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def get_profile_id(cursor, name, description):
+    """Return the id of a hardware profile, creating it if it does not exist."""
+    cursor.execute('INSERT OR IGNORE INTO "HardwareProfile" ("name", "description") VALUES (?, ?)',
+                   (name, json.dumps(description or {})))
+    if description:
+        cursor.execute('UPDATE "HardwareProfile" SET "description" = ? WHERE "name" = ?',
+                       (json.dumps(description), name))
+    return cursor.execute('SELECT "id" FROM "HardwareProfile" WHERE "name" = ?', (name,)).fetchone()[0]
+
+
+def register(conn, name, profile, description):
+    """Register a runner node and return its token; only the token's hash is stored."""
+    token = secrets.token_urlsafe(32)
+    cursor = conn.cursor()
+    profile_id = get_profile_id(cursor, profile, description)
+    cursor.execute('INSERT INTO "RunnerNode" ("name", "token_hash", "hardware_profile_id") VALUES (?, ?, ?)',
+                   (name, hash_token(token), profile_id))
+    conn.commit()
+    # A new hardware profile gets its own landing page in the next snapshot
+    snapshot_marker.mark_stale()
+    return token
+
+
+def rotate(conn, name):
+    """Replace the token of a runner node, the old token stops working immediately."""
+    token = secrets.token_urlsafe(32)
+    cursor = conn.execute('UPDATE "RunnerNode" SET "token_hash" = ? WHERE "name" = ?', (hash_token(token), name))
+    conn.commit()
+    return token if cursor.rowcount else None
+
+
+def remove(conn, name):
+    """Unregister a runner node; its results stay, its unfinished leases expire and are reissued."""
+    cursor = conn.execute('DELETE FROM "RunnerNode" WHERE "name" = ?', (name,))
+    conn.commit()
+    snapshot_marker.mark_stale()
+    return cursor.rowcount > 0
+
+
+def list_nodes(conn):
+    return conn.execute('''
+        SELECT "RunnerNode"."name", "HardwareProfile"."name", "RunnerNode"."last_seen", "RunnerNode"."hardware"
+        FROM "RunnerNode"
+        INNER JOIN "HardwareProfile" ON "RunnerNode"."hardware_profile_id" = "HardwareProfile"."id"
+        ORDER BY "HardwareProfile"."name", "RunnerNode"."name"
+    ''').fetchall()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the runner nodes allowed to upload benchmark results.")
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    register_parser = subparsers.add_parser('register', help="Register a node and print its token")
+    register_parser.add_argument('name')
+    register_parser.add_argument('--profile', default='default',
+                                 help="Hardware profile; nodes with identical hardware share one profile")
+    register_parser.add_argument('--description', type=json.loads, default=None,
+                                 help="JSON description of the profile's hardware")
+    rotate_parser = subparsers.add_parser('rotate', help="Issue a new token for a node")
+    rotate_parser.add_argument('name')
+    remove_parser = subparsers.add_parser('remove', help="Unregister a node")
+    remove_parser.add_argument('name')
+    subparsers.add_parser('list', help="List registered nodes")
+    args = parser.parse_args()
+
+    if not os.path.exists(DATABASE):
+        print(f"Database {DATABASE} not found, start the server once to create it.")
+        sys.exit(1)
+
+    conn = sqlite3.connect(DATABASE)
+    try:
+        if args.action == 'register':
+            try:
+                print(register(conn, args.name, args.profile, args.description))
+            except sqlite3.IntegrityError:
+                print(f"Node {args.name} is already registered.")
+                sys.exit(1)
+        elif args.action == 'rotate':
+            token = rotate(conn, args.name)
+            if token is None:
+                print(f"Node {args.name} is not registered.")
+                sys.exit(1)
+            print(token)
+        elif args.action == 'remove':
+            if not remove(conn, args.name):
+                print(f"Node {args.name} is not registered.")
+                sys.exit(1)
+        else:
+            for name, profile, last_seen, hardware in list_nodes(conn):
+                print(f"{name}\t{profile}\t{last_seen or 'never'}\t{hardware or ''}")
+    finally:
+        conn.close()
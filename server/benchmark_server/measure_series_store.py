@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import argparse
+import tracemalloc
+import importlib
+
+from generate_synthetic_db import generate
+
+
+def time_requests(client, urls, repeat):
+    """Median latency in milliseconds of each URL over repeated requests."""
+    latencies = {}
+    for url in urls:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.get(url)
+            samples.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, (url, response.status_code)
+        latencies[url] = sorted(samples)[len(samples) // 2]
+    return latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare read latency and memory of SQLite and the series store.")
+    parser.add_argument('--commits', type=int, default=3000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'benchmarks.db')
+        generate(database, args.commits, ['default', 'no_proxy'], ['root', 'tensorflow', 'lhcb'],
+                 ['real', 'user', 'sys', 'sft.cern.ch_nopen'])
+        os.environ['BENCHMARK_DATABASE'] = database
+        os.environ['SERIES_STORE'] = '0'
+        app_module = importlib.import_module('app')
+        client = app_module.app.test_client()
+
+        urls = [
+            '/api/head?client_config_id=1&command_id=1&metric_id=1',
+            '/api/commits_data?client_config_id=1&command_id=1&metric_id=1&num_commits=12',
+            '/api/commits_data?client_config_id=1&command_id=1&metric_id=1&num_commits=all',
+            '/api/commits_data?client_config_id=1&command_id=1&metric_id=1&num_commits=all&max_points=200',
+            '/api/commits_data_by_names?client_config_name=default&command_name=root&metric_name=real'
+            '&num_commits=all&max_points=200&mode=box',
+        ]
+        sqlite_latencies = time_requests(client, urls, args.repeat)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        store = app_module.SeriesStore()
+        conn = sqlite3.connect(database)
+        store.refresh(conn)
+        load_time = time.perf_counter() - start
+        store_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        app_module.series_store = store
+        store_latencies = time_requests(client, urls, args.repeat)
+
+        # Incremental refresh after one more build is ingested
+        build_id = conn.execute('SELECT MAX("id") FROM "CVMFSBuild"').fetchone()[0]
+        conn.execute('INSERT INTO "DataChange" ("cvmfs_build_id") VALUES (?)', (build_id,))
+        conn.commit()
+        start = time.perf_counter()
+        store.refresh(conn)
+        refresh_time = time.perf_counter() - start
+        conn.close()
+
+        rows = len(store.build_ids)
+        print(f"{rows} results, {args.commits} commits")
+        print(f"store load {load_time * 1000:.0f} ms, incremental refresh {refresh_time * 1000:.0f} ms")
+        print(f"store memory {store_memory / 2**20:.1f} MiB traced, {store.nbytes() / 2**20:.1f} MiB numeric columns")
+        print(f"{'endpoint':<100} {'sqlite ms':>10} {'store ms':>10}")
+        for url in urls:
+            print(f"{url:<100} {sqlite_latencies[url]:>10.2f} {store_latencies[url]:>10.2f}")
+    sys.exit(0)
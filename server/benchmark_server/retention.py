@@ -0,0 +1,301 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import pandas as pd
+from dotenv import load_dotenv
+
+from series_store import CACHE_TYPES, CACHE_COLUMNS, SERIES_ID_COLUMNS
+import snapshot_marker
+
+load_dotenv()
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATABASE = os.getenv('BENCHMARK_DATABASE', os.path.join(BASE_DIR, 'benchmarks.db'))
+# Commits younger than KEEP_DAYS or among the KEEP_COMMITS newest keep their full results
+KEEP_DAYS = int(os.getenv('RETENTION_KEEP_DAYS', 180))
+KEEP_COMMITS = int(os.getenv('RETENTION_KEEP_COMMITS', 500))
+# Pages freed per incremental vacuum step, writers of the server get the database between steps
+VACUUM_STEP_PAGES = int(os.getenv('RETENTION_VACUUM_STEP_PAGES', 1000))
+
+AGGREGATE_COLUMNS = (['week_start'] + SERIES_ID_COLUMNS + ['num_commits', 'first_commit', 'first_datetime',
+                     'last_commit', 'last_datetime', 'version'] + CACHE_COLUMNS)
+# Telemetry of compacted builds, from the nodes of the compacted hardware profile; legacy uploads are profile 1
+COMPACTED_TELEMETRY = '''
+    ("cvmfs_build_id",
+     COALESCE((SELECT "hardware_profile_id" FROM "RunnerNode" WHERE "RunnerNode"."id" = "RunTelemetry"."node_id"), 1))
+    IN (SELECT "id", "hardware_profile_id" FROM "CompactedBuild")
+'''
+
+
+def week_start(commit_datetimes):
+    """Monday 00:00 of the week of YYYYMMDDHHMMSS datetimes, in the same format."""
+    days = pd.to_datetime(commit_datetimes, format='%Y%m%d%H%M%S').dt.normalize()
+    return (days - pd.to_timedelta(days.dt.weekday, unit='D')).dt.strftime('%Y%m%d%H%M%S')
+
+
+def retention_cutoff(conn, keep_days, keep_commits):
+    """Start of the oldest week that keeps full detail; only whole weeks before it are rolled up."""
+    cutoff = pd.Timestamp.now() - pd.Timedelta(days=keep_days)
+    newest = conn.execute('''
+        SELECT "commit_datetime" FROM "CVMFSBuild"
+        WHERE EXISTS (SELECT 1 FROM "BenchmarkResult" WHERE "BenchmarkResult"."cvmfs_build_id" = "CVMFSBuild"."id")
+        ORDER BY "commit_datetime" DESC
+        LIMIT 1 OFFSET ?
+    ''', (max(keep_commits - 1, 0),)).fetchone()
+    if keep_commits and newest is None:
+        return None  # Fewer commits than keep_commits, nothing to roll up
+    if newest is not None:
+        cutoff = min(cutoff, pd.to_datetime(newest[0], format='%Y%m%d%H%M%S'))
+    return week_start(pd.Series([cutoff.strftime('%Y%m%d%H%M%S')])).iloc[0]
+
+
+def find_compactable_builds(conn, cutoff):
+    """(build, hardware profile) pairs of untagged builds with results from the weeks before cutoff.
+
+    A build flagged as a regression in a hardware profile is kept in that profile.
+    Pairs that were rolled up before and received results again are returned as well; those
+    results are already part of an aggregate and are only deleted.
+    """
+    return pd.read_sql_query('''
+        SELECT DISTINCT "BenchmarkResult"."cvmfs_build_id", "BenchmarkResult"."hardware_profile_id",
+            EXISTS (SELECT 1 FROM "RolledUpBuild"
+                    WHERE "RolledUpBuild"."cvmfs_build_id" = "BenchmarkResult"."cvmfs_build_id"
+                        AND "RolledUpBuild"."hardware_profile_id" = "BenchmarkResult"."hardware_profile_id")
+                AS "rolled_up"
+        FROM "BenchmarkResult"
+        INNER JOIN "CVMFSBuild" ON "BenchmarkResult"."cvmfs_build_id" = "CVMFSBuild"."id"
+        WHERE "CVMFSBuild"."commit_datetime" < ?
+            AND "CVMFSBuild"."tag" IS NULL
+            AND NOT EXISTS (SELECT 1 FROM "RegressionFlag"
+                            WHERE "RegressionFlag"."cvmfs_build_id" = "BenchmarkResult"."cvmfs_build_id"
+                                AND "RegressionFlag"."hardware_profile_id" = "BenchmarkResult"."hardware_profile_id")
+    ''', conn, params=(cutoff,))
+
+
+def load_results(conn, builds):
+    conn.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS "CompactedBuild" (
+            "id" INTEGER NOT NULL, "hardware_profile_id" INTEGER NOT NULL, PRIMARY KEY ("id", "hardware_profile_id")
+        )
+    ''')
+    conn.execute('DELETE FROM "CompactedBuild"')
+    pairs = builds[['cvmfs_build_id', 'hardware_profile_id']].astype(object)
+    conn.executemany('INSERT INTO "CompactedBuild" ("id", "hardware_profile_id") VALUES (?, ?)',
+                     pairs.itertuples(index=False, name=None))
+    columns = ', '.join(f'"BenchmarkResult"."{column}"' for column in SERIES_ID_COLUMNS + CACHE_COLUMNS)
+    return pd.read_sql_query(f'''
+        SELECT "BenchmarkResult"."cvmfs_build_id", "CVMFSBuild"."commit", "CVMFSBuild"."commit_datetime",
+            "CVMFSBuild"."version", {columns}
+        FROM "BenchmarkResult"
+        INNER JOIN "CVMFSBuild" ON "BenchmarkResult"."cvmfs_build_id" = "CVMFSBuild"."id"
+        WHERE ("BenchmarkResult"."cvmfs_build_id", "BenchmarkResult"."hardware_profile_id")
+            IN (SELECT "id", "hardware_profile_id" FROM "CompactedBuild")
+    ''', conn)
+
+
+def aggregate_weeks(results):
+    """One row per (week, series): the envelope of the commits' boxes and the median of their medians."""
+    results = results.assign(week_start=week_start(results['commit_datetime'])).sort_values('commit_datetime')
+    aggregations = {
+        'num_commits': ('commit', 'size'),
+        'first_commit': ('commit', 'first'),
+        'first_datetime': ('commit_datetime', 'first'),
+        'last_commit': ('commit', 'last'),
+        'last_datetime': ('commit_datetime', 'last'),
+        'version': ('version', 'last'),
+    }
+    for cache_type in CACHE_TYPES:
+        aggregations[f'{cache_type}_min_val'] = (f'{cache_type}_min_val', 'min')
+        aggregations[f'{cache_type}_first_quartile'] = (f'{cache_type}_first_quartile', 'min')
+        aggregations[f'{cache_type}_median'] = (f'{cache_type}_median', 'median')
+        aggregations[f'{cache_type}_third_quartile'] = (f'{cache_type}_third_quartile', 'max')
+        aggregations[f'{cache_type}_max_val'] = (f'{cache_type}_max_val', 'max')
+    return results.groupby(['week_start'] + SERIES_ID_COLUMNS, as_index=False).agg(**aggregations)
+
+
+def merge_existing(conn, aggregates):
+    """Combine new aggregates with roll-ups already stored for the same week and series.
+
+    Happens when results of an old commit arrive after its week was compacted. The merged median
+    is the mean of both parts' medians weighted by their number of commits, not a median.
+    """
+    existing = pd.read_sql_query(f'''
+        SELECT {', '.join(f'"{column}"' for column in AGGREGATE_COLUMNS)}
+        FROM "WeeklyAggregate"
+        WHERE "week_start" IN ({', '.join('?' for _ in aggregates['week_start'].unique())})
+    ''', conn, params=list(aggregates['week_start'].unique()))
+    keys = ['week_start'] + SERIES_ID_COLUMNS
+    existing = existing.merge(aggregates[keys], on=keys)
+    if existing.empty:
+        return aggregates, 0
+
+    combined = pd.concat([existing, aggregates], ignore_index=True).sort_values('first_datetime')
+    for cache_type in CACHE_TYPES:
+        combined[f'{cache_type}_median'] *= combined['num_commits']
+    aggregations = {
+        'num_commits': ('num_commits', 'sum'),
+        'first_commit': ('first_commit', 'first'),
+        'first_datetime': ('first_datetime', 'first'),
+    }
+    # The newest commit of the week may be in either part
+    latest = combined.sort_values('last_datetime').groupby(keys, as_index=False)[
+        ['last_commit', 'last_datetime', 'version']].last()
+    for cache_type in CACHE_TYPES:
+        aggregations[f'{cache_type}_min_val'] = (f'{cache_type}_min_val', 'min')
+        aggregations[f'{cache_type}_first_quartile'] = (f'{cache_type}_first_quartile', 'min')
+        aggregations[f'{cache_type}_median'] = (f'{cache_type}_median', 'sum')
+        aggregations[f'{cache_type}_third_quartile'] = (f'{cache_type}_third_quartile', 'max')
+        aggregations[f'{cache_type}_max_val'] = (f'{cache_type}_max_val', 'max')
+    merged = combined.groupby(keys, as_index=False).agg(**aggregations).merge(latest, on=keys)
+    for cache_type in CACHE_TYPES:
+        merged[f'{cache_type}_median'] /= merged['num_commits']
+    return merged[AGGREGATE_COLUMNS], len(existing)
+
+
+def table_bytes(conn):
+    """Bytes per row of BenchmarkResult and RunTelemetry, indexes included.
+
+    Uses the dbstat virtual table where SQLite has it, else splits the file size by row counts.
+    """
+    counts = {table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+              for table in ('BenchmarkResult', 'RunTelemetry')}
+    try:
+        sizes = dict(conn.execute('''
+            SELECT COALESCE("sqlite_master"."tbl_name", "dbstat"."name"), SUM("dbstat"."pgsize")
+            FROM "dbstat" LEFT JOIN "sqlite_master" ON "sqlite_master"."name" = "dbstat"."name"
+            GROUP BY 1
+        ''').fetchall())
+    except sqlite3.OperationalError:
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        file_bytes = conn.execute('PRAGMA page_count').fetchone()[0] * page_size
+        total = sum(counts.values()) or 1
+        sizes = {table: file_bytes * count / total for table, count in counts.items()}
+    return {table: sizes.get(table, 0) / count if count else 0 for table, count in counts.items()}
+
+
+def compact(conn, keep_days=KEEP_DAYS, keep_commits=KEEP_COMMITS, dry_run=False):
+    """Roll old intermediate commits up into WeeklyAggregate and delete their detailed rows.
+
+    Returns a report of what was (or, with dry_run, would be) changed.
+    """
+    report = {"cutoff_week": None, "builds": 0, "weeks": 0, "result_rows_deleted": 0, "telemetry_rows_deleted": 0,
+              "aggregate_rows_written": 0, "aggregate_rows_merged": 0, "estimated_bytes_saved": 0}
+    cutoff = retention_cutoff(conn, keep_days, keep_commits)
+    report["cutoff_week"] = cutoff
+    if cutoff is None:
+        return report
+
+    builds = find_compactable_builds(conn, cutoff)
+    if builds.empty:
+        return report
+    results = load_results(conn, builds)
+    new_builds = builds.loc[builds['rolled_up'] == 0, ['cvmfs_build_id', 'hardware_profile_id']]
+    to_aggregate = results.merge(new_builds, on=['cvmfs_build_id', 'hardware_profile_id'])
+
+    if to_aggregate.empty:
+        aggregates, merged_rows = pd.DataFrame(columns=AGGREGATE_COLUMNS), 0
+    else:
+        aggregates, merged_rows = merge_existing(conn, aggregate_weeks(to_aggregate))
+    telemetry_rows = conn.execute(f'''
+        SELECT COUNT(*) FROM "RunTelemetry" WHERE {COMPACTED_TELEMETRY}
+    ''').fetchone()[0]
+    row_bytes = table_bytes(conn)
+
+    report.update({
+        "builds": int(builds['cvmfs_build_id'].nunique()),
+        "weeks": int(aggregates['week_start'].nunique()) if len(aggregates) else 0,
+        "result_rows_deleted": len(results),
+        "telemetry_rows_deleted": telemetry_rows,
+        "aggregate_rows_written": len(aggregates) - merged_rows,
+        "aggregate_rows_merged": merged_rows,
+        # Aggregate rows are about as large as result rows
+        "estimated_bytes_saved": int(row_bytes['BenchmarkResult'] * (len(results) - len(aggregates) + merged_rows)
+                                     + row_bytes['RunTelemetry'] * telemetry_rows),
+    })
+    if dry_run:
+        conn.rollback()
+        return report
+
+    columns = ', '.join(f'"{column}"' for column in AGGREGATE_COLUMNS)
+    placeholders = ', '.join('?' for _ in AGGREGATE_COLUMNS)
+    conn.executemany(f'INSERT OR REPLACE INTO "WeeklyAggregate" ({columns}) VALUES ({placeholders})',
+                     aggregates[AGGREGATE_COLUMNS].astype(object).itertuples(index=False, name=None))
+    weeks = to_aggregate.assign(week=week_start(to_aggregate['commit_datetime']))
+    conn.executemany('''
+        INSERT OR IGNORE INTO "RolledUpBuild" ("cvmfs_build_id", "hardware_profile_id", "week_start") VALUES (?, ?, ?)
+    ''', weeks[['cvmfs_build_id', 'hardware_profile_id', 'week']].drop_duplicates()
+                     .astype(object).itertuples(index=False, name=None))
+    conn.execute('''
+        DELETE FROM "BenchmarkResult" WHERE ("cvmfs_build_id", "hardware_profile_id")
+            IN (SELECT "id", "hardware_profile_id" FROM "CompactedBuild")
+    ''')
+    conn.execute(f'DELETE FROM "RunTelemetry" WHERE {COMPACTED_TELEMETRY}')
+    # In-memory series stores of the server workers drop the deleted rows on their next refresh
+    conn.execute('INSERT INTO "DataChange" ("cvmfs_build_id") SELECT DISTINCT "id" FROM "CompactedBuild"')
+    conn.commit()
+    # The landing page shows the compacted commits as weekly rows once the server regenerated it
+    snapshot_marker.mark_stale()
+    return report
+
+
+def incremental_vacuum(conn, step_pages=VACUUM_STEP_PAGES, pause=0.05):
+    """Return free pages to the file system in small steps. Returns the number of bytes released.
+
+    Databases created before incremental auto_vacuum need one full VACUUM to switch modes.
+    """
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        return free_pages * page_size
+
+    released = 0
+    while free_pages:
+        conn.execute(f'PRAGMA incremental_vacuum({step_pages})').fetchall()
+        remaining = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        released += (free_pages - remaining) * page_size
+        if remaining >= free_pages:
+            break
+        free_pages = remaining
+        time.sleep(pause)
+    return released
+
+
+def format_report(report, reclaimable_bytes):
+    lines = [f"{key}: {value}" for key, value in report.items() if key != 'estimated_bytes_saved']
+    lines.append(f"estimated_space_saved: {report['estimated_bytes_saved'] / 2**20:.1f} MiB")
+    lines.append(f"free_pages_to_release: {reclaimable_bytes / 2**20:.1f} MiB")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Roll old benchmark results up into weekly aggregates.")
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    compact_parser = subparsers.add_parser('compact', help="Roll up old commits, then vacuum incrementally")
+    compact_parser.add_argument('--keep-days', type=int, default=KEEP_DAYS)
+    compact_parser.add_argument('--keep-commits', type=int, default=KEEP_COMMITS)
+    compact_parser.add_argument('--dry-run', action='store_true', help="Only report what would be compacted")
+    compact_parser.add_argument('--no-vacuum', action='store_true')
+    vacuum_parser = subparsers.add_parser('vacuum', help="Release free pages to the file system")
+    vacuum_parser.add_argument('--step-pages', type=int, default=VACUUM_STEP_PAGES)
+    args = parser.parse_args()
+
+    if not os.path.exists(DATABASE):
+        print(f"Database {DATABASE} not found, start the server once to create it.")
+        sys.exit(1)
+
+    conn = sqlite3.connect(DATABASE, timeout=60)
+    try:
+        if args.action == 'compact':
+            report = compact(conn, args.keep_days, args.keep_commits, args.dry_run)
+            page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+            reclaimable = conn.execute('PRAGMA freelist_count').fetchone()[0] * page_size
+            print(format_report(report, reclaimable))
+            if not args.dry_run and not args.no_vacuum:
+                print(f"released: {incremental_vacuum(conn) / 2**20:.1f} MiB")
+        else:
+            print(f"released: {incremental_vacuum(conn, args.step_pages) / 2**20:.1f} MiB")
+    finally:
+        conn.close()
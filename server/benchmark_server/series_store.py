@@ -0,0 +1,204 @@
+import logging
+import threading
+import numpy as np
+import pandas as pd
+
+CACHE_TYPES = ['cold_cache', 'warm_cache', 'hot_cache']
+QUARTILE_FIELDS = ['min_val', 'first_quartile', 'median', 'third_quartile', 'max_val']
+CACHE_COLUMNS = [f'{cache_type}_{field}' for cache_type in CACHE_TYPES for field in QUARTILE_FIELDS]
+BUILD_COLUMNS = ['build_type', 'commit', 'commit_datetime', 'tag', 'version']
+SERIES_ID_COLUMNS = ['client_config_id', 'command_id', 'metric_id', 'hardware_profile_id']
+SERIES_NAME_COLUMNS = ['config_name', 'command_name', 'metric_name']
+# Above this many changed builds a refresh reloads everything instead of patching the arrays
+FULL_RELOAD_BUILDS = 5000
+
+ROWS_QUERY = '''
+SELECT
+    "BenchmarkResult"."cvmfs_build_id",
+    {series_id_columns},
+    {cache_columns},
+    "RegressionFlag"."id" IS NOT NULL AS "regression"
+FROM
+    "BenchmarkResult"
+LEFT JOIN
+    "RegressionFlag" ON "RegressionFlag"."cvmfs_build_id" = "BenchmarkResult"."cvmfs_build_id"
+    AND "RegressionFlag"."command_id" = "BenchmarkResult"."command_id"
+    AND "RegressionFlag"."client_config_id" = "BenchmarkResult"."client_config_id"
+    AND "RegressionFlag"."metric_id" = "BenchmarkResult"."metric_id"
+    AND "RegressionFlag"."hardware_profile_id" = "BenchmarkResult"."hardware_profile_id"
+{where}
+'''.format(
+    series_id_columns=',\n    '.join(f'"BenchmarkResult"."{column}"' for column in SERIES_ID_COLUMNS),
+    cache_columns=',\n    '.join(f'"BenchmarkResult"."{column}"' for column in CACHE_COLUMNS),
+    where='{where}',
+)
+BUILDS_QUERY = 'SELECT "id", {build_columns} FROM "CVMFSBuild" {{where}}'.format(
+    build_columns=', '.join(f'"{column}"' for column in BUILD_COLUMNS))
+NAME_QUERIES = {
+    'config_name': 'SELECT "id", "config_name" FROM "ClientConfig"',
+    'command_name': 'SELECT "id", "command_name" FROM "Command"',
+    'metric_name': 'SELECT "id", "metric_name" FROM "Metric"',
+}
+
+
+class SeriesStore:
+    """Columnar in-memory copy of BenchmarkResult for serving time-series reads.
+
+    Rows are sorted by series (client config, command, metric, hardware profile) and then by commit datetime,
+    newest first, so every series is a contiguous slice of one float64 array per cache column.
+    Rows only hold numbers: the series ids, the build id and the regression flag. Build attributes
+    and names are looked up per build and per id. The store follows the DataChange log: on refresh
+    only the builds changed since the last loaded version are re-read from SQLite.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.columns = {}
+        self.series_ids = np.empty((0, len(SERIES_ID_COLUMNS)), dtype=np.int32)
+        self.build_ids = np.empty(0, dtype=np.int64)
+        self.regression = np.empty(0, dtype=np.int8)
+        self.builds = {}
+        self.build_ids_by_commit = {}
+        self.names = {column: {} for column in SERIES_NAME_COLUMNS}
+        self.offsets_by_ids = {}
+        self.offsets_by_names = {}
+        self.latest_build_ids = np.empty(0, dtype=np.int64)
+
+    def refresh(self, conn):
+        """Bring the store up to date with the database if its data version changed."""
+        version = conn.execute('SELECT COALESCE(MAX("version"), 0) FROM "DataChange"').fetchone()[0]
+        if version == self.version:
+            return
+
+        with self.lock:
+            if version == self.version:
+                return
+            changed = None
+            if self.version is not None:
+                # Changes pruned from the log since the last refresh are unknown, everything is reloaded
+                oldest = conn.execute('SELECT MIN("version") FROM "DataChange"').fetchone()[0]
+                if oldest is not None and oldest <= self.version + 1:
+                    changed = [row[0] for row in conn.execute(
+                        'SELECT DISTINCT "cvmfs_build_id" FROM "DataChange" WHERE "version" > ? AND "version" <= ?',
+                        (self.version, version))]
+            # Bulk changes such as a compaction by retention.py are cheaper to reload than to patch
+            if changed is None or len(changed) > FULL_RELOAD_BUILDS:
+                arrays = self.load_rows(conn, '', [])
+                builds = self.load_builds(conn, '', [])
+                logging.info(f"Series store loaded {len(arrays['build_ids'])} rows at data version {version}.")
+            else:
+                placeholders = ', '.join('?' for _ in changed)
+                changed_rows = self.load_rows(
+                    conn, f'WHERE "BenchmarkResult"."cvmfs_build_id" IN ({placeholders})', changed)
+                keep = ~np.isin(self.build_ids, changed)
+                current = {'series_ids': self.series_ids, 'build_ids': self.build_ids,
+                           'regression': self.regression, **self.columns}
+                arrays = {name: np.concatenate([values[keep], changed_rows[name]]) for name, values in current.items()}
+                builds = dict(self.builds)
+                builds.update(self.load_builds(conn, f'WHERE "id" IN ({placeholders})', changed))
+                logging.info(f"Series store refreshed {len(changed)} builds at data version {version}.")
+
+            names = {column: dict(conn.execute(query).fetchall()) for column, query in NAME_QUERIES.items()}
+            latest = conn.execute('SELECT "id" FROM "CVMFSBuild" ORDER BY "commit_datetime" DESC LIMIT 12').fetchall()
+            self.rebuild(arrays, builds, names, [row[0] for row in latest])
+            self.version = version
+
+    @staticmethod
+    def load_rows(conn, where, params):
+        """Numeric columns of the selected results, as arrays."""
+        frame = pd.read_sql_query(ROWS_QUERY.format(where=where), conn, params=params)
+        arrays = {column: np.ascontiguousarray(frame[column].to_numpy(dtype=np.float64)) for column in CACHE_COLUMNS}
+        arrays['series_ids'] = frame[SERIES_ID_COLUMNS].to_numpy(dtype=np.int32)
+        arrays['build_ids'] = frame['cvmfs_build_id'].to_numpy(dtype=np.int64)
+        arrays['regression'] = frame['regression'].to_numpy(dtype=np.int8)
+        return arrays
+
+    @staticmethod
+    def load_builds(conn, where, params):
+        """Build attributes keyed by build id, NULLs stay None like in the SQLite queries."""
+        return {row[0]: row[1:] for row in conn.execute(BUILDS_QUERY.format(where=where), params)}
+
+    def rebuild(self, arrays, builds, names, latest_build_ids):
+        # Builds are ranked by commit datetime once, rows are sorted by series and then newest build first
+        ranked = sorted(builds, key=lambda build_id: builds[build_id][BUILD_COLUMNS.index('commit_datetime')])
+        rank = dict(zip(ranked, range(len(ranked))))
+        row_rank = np.fromiter((rank.get(build_id, -1) for build_id in arrays['build_ids'].tolist()),
+                               dtype=np.int64, count=len(arrays['build_ids']))
+        series_ids = arrays['series_ids']
+        order = np.lexsort((-row_rank, *(series_ids[:, i] for i in reversed(range(len(SERIES_ID_COLUMNS))))))
+
+        self.columns = {column: np.ascontiguousarray(arrays[column][order]) for column in CACHE_COLUMNS}
+        self.series_ids = series_ids[order]
+        self.build_ids = arrays['build_ids'][order]
+        self.regression = arrays['regression'][order]
+        self.builds = builds
+        self.build_ids_by_commit = {build[BUILD_COLUMNS.index('commit')]: build_id
+                                    for build_id, build in builds.items()}
+        self.names = names
+        self.latest_build_ids = np.asarray(latest_build_ids, dtype=np.int64)
+
+        # Start and end row of every series, addressable by ids or by names (plus the hardware profile id)
+        self.offsets_by_ids, self.offsets_by_names = {}, {}
+        ids = self.series_ids
+        if len(ids):
+            starts = np.flatnonzero(np.r_[True, np.any(ids[1:] != ids[:-1], axis=1)])
+            ends = np.r_[starts[1:], len(ids)]
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                key = tuple(ids[start].tolist())
+                self.offsets_by_ids[key] = (start, end)
+                series_names = tuple(names[column].get(key[i]) for i, column in enumerate(SERIES_NAME_COLUMNS))
+                self.offsets_by_names[(*series_names, key[-1])] = (start, end)
+
+    def rows(self, selection, regression=True):
+        """Convert the selected row positions (slice or index array) into result dictionaries."""
+        builds = [self.builds[build_id] for build_id in self.build_ids[selection].tolist()]
+        columns = {column: [build[i] for build in builds] for i, column in enumerate(BUILD_COLUMNS)}
+        for column, values in self.columns.items():
+            selected = values[selection]
+            columns[column] = selected.tolist()
+            if np.isnan(selected).any():
+                columns[column] = [None if value != value else value for value in columns[column]]
+        if regression:
+            columns['regression'] = self.regression[selection].tolist()
+        names = list(columns)
+        return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+    def series_slice(self, key, by_names, limit=None):
+        offsets = (self.offsets_by_names if by_names else self.offsets_by_ids).get(key)
+        if offsets is None:
+            return slice(0, 0)
+        start, end = offsets
+        if limit is not None and limit >= 0:
+            end = min(end, start + limit)
+        return slice(start, end)
+
+    def commits_data(self, key, by_names, limit=None):
+        """Newest-first rows of one series, like /api/commits_data and /api/commits_data_by_names."""
+        with self.lock:
+            return self.rows(self.series_slice(key, by_names, limit))
+
+    def head(self, key):
+        """Rows of one series among the 12 most recent builds, like /api/head."""
+        with self.lock:
+            selection = self.series_slice(key, by_names=False)
+            positions = np.arange(selection.start, selection.stop)
+            return self.rows(positions[np.isin(self.build_ids[selection], self.latest_build_ids)], regression=False)
+
+    def results_for_commit(self, commit, hardware_profile_id):
+        """All results of one commit on one hardware profile as a DataFrame, for batch and comparison queries."""
+        with self.lock:
+            positions = np.flatnonzero((self.build_ids == self.build_ids_by_commit.get(commit, -1))
+                                       & (self.series_ids[:, SERIES_ID_COLUMNS.index('hardware_profile_id')]
+                                          == hardware_profile_id))
+            series_ids = self.series_ids[positions]
+            frame = pd.DataFrame({column: [self.names[column].get(value) for value in series_ids[:, i].tolist()]
+                                  for i, column in enumerate(SERIES_NAME_COLUMNS)})
+            for column, values in self.columns.items():
+                frame[column] = values[positions]
+        return frame
+
+    def nbytes(self):
+        """Memory held by the numeric arrays of the store."""
+        arrays = list(self.columns.values()) + [self.series_ids, self.build_ids, self.regression]
+        return sum(array.nbytes for array in arrays)
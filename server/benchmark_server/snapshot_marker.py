@@ -0,0 +1,40 @@
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_DIR = os.path.join(BASE_DIR, 'snapshots')
+# Touched whenever the data shown on the landing page changes, the server regenerates the snapshot
+# in the background once the marker is newer than the last refresh
+STALE_PATH = os.path.join(SNAPSHOT_DIR, '.stale')
+# Marker mtime in nanoseconds the current snapshot was started from
+REFRESHED_PATH = os.path.join(SNAPSHOT_DIR, '.refreshed')
+
+
+def mark_stale():
+    """Request a new dashboard snapshot, e.g. after an ingest or a maintenance command changed the data."""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with open(STALE_PATH, 'a'):
+        os.utime(STALE_PATH)
+
+
+def stale_since():
+    """mtime_ns of the stale marker, None if no snapshot was ever requested."""
+    try:
+        return os.stat(STALE_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def last_refresh():
+    """The marker mtime_ns the current snapshot was started from and when it was written, (0, 0) if never."""
+    try:
+        with open(REFRESHED_PATH, 'r') as f:
+            return int(f.read().strip() or 0), os.stat(REFRESHED_PATH).st_mtime_ns
+    except (FileNotFoundError, ValueError):
+        return 0, 0
+
+
+def record_refresh(marker_mtime_ns):
+    tmp_path = f"{REFRESHED_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(str(marker_mtime_ns))
+    os.replace(tmp_path, REFRESHED_PATH)
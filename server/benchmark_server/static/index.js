@@ -1,7 +1,73 @@
+// Results of different hardware profiles are never mixed, the page shows one profile at a time
+const HARDWARE_PROFILE =
+	new URLSearchParams(window.location.search).get("hardware_profile") || "default";
+
+function hardwareProfileParam() {
+	return `&hardware_profile=${encodeURIComponent(HARDWARE_PROFILE)}`;
+}
+
+// Landing data prerendered by the server after every ingest. The page of the default profile inlines
+// it, other profiles load their snapshot file; null if the page was rendered live.
+const SNAPSHOT = loadSnapshot();
+
+function loadSnapshot() {
+	const element = document.getElementById("snapshot-data");
+	if (!element) {
+		return Promise.resolve(null);
+	}
+	let snapshot;
+	try {
+		snapshot = JSON.parse(element.textContent);
+	} catch (error) {
+		console.error("Error reading the dashboard snapshot:", error);
+		return Promise.resolve(null);
+	}
+	if (snapshot.hardware_profile === HARDWARE_PROFILE) {
+		return Promise.resolve(snapshot);
+	}
+	const file = snapshot.profile_files[HARDWARE_PROFILE];
+	if (!file) {
+		return Promise.resolve(null);
+	}
+	return fetch(`/snapshots/${snapshot.version}/${file}`)
+		.then((response) => (response.ok ? response.json() : null))
+		.catch(() => null);
+}
+
+// Requests of the landing page are answered from the snapshot, everything else by the live API
+function fetchJSON(url) {
+	return SNAPSHOT.then((snapshot) => {
+		if (snapshot && Object.hasOwn(snapshot.responses, url)) {
+			return snapshot.responses[url];
+		}
+		return fetch(url).then((response) => response.json());
+	});
+}
+
 document.addEventListener("DOMContentLoaded", () => {
+	// Populate the hardware profile selector, switching profiles reloads the page
+	const hardwareProfileSelect = document.getElementById("hardware-profile-select");
+	fetchJSON("/api/hardware_profiles")
+		.then((profiles) => {
+			hardwareProfileSelect.innerHTML = "";
+			for (const profile of profiles) {
+				const option = document.createElement("option");
+				option.value = profile.name;
+				const nodes = profile.nodes.map((node) => node.name).join(", ");
+				option.text = nodes ? `${profile.name} (${nodes})` : profile.name;
+				hardwareProfileSelect.add(option);
+			}
+			hardwareProfileSelect.value = HARDWARE_PROFILE;
+		})
+		.catch((error) => console.error("Error fetching hardware profiles:", error));
+	hardwareProfileSelect.addEventListener("change", (event) => {
+		const params = new URLSearchParams(window.location.search);
+		params.set("hardware_profile", event.target.value);
+		window.location.search = params.toString();
+	});
+
 	// Fetch configurations and populate dropdowns
-	fetch("/api/configurations")
-		.then((response) => response.json())
+	fetchJSON("/api/configurations")
 		.then((configurationData) => {
 			// Use names as values in the dropdowns
 			const clientConfigSelect = document.getElementById(
@@ -102,20 +168,25 @@ document.addEventListener("DOMContentLoaded", () => {
 		}
 	});
 
-	fetch("/api/commits_list")
-		.then((response) => response.json())
+	fetchJSON(`/api/commits_list?${hardwareProfileParam().slice(1)}`)
 		.then((commitsData) => {
 			const commitSelect = document.getElementById("commit-select");
+			const compareBaseSelect = document.getElementById("compare-base-select");
 			for (const commit of commitsData) {
-				const option = document.createElement("option");
-				option.value = commit.commit;
 				const formattedDate = formatDateTime(commit.commit_datetime);
-				option.text = `${commit.commit.slice(0, 7)} - ${formattedDate}`;
-				commitSelect.add(option);
+				for (const select of [commitSelect, compareBaseSelect]) {
+					const option = document.createElement("option");
+					option.value = commit.commit;
+					option.text = `${commit.commit.slice(0, 7)} - ${formattedDate}`;
+					select.add(option);
+				}
 			}
 
-			// Load results for the first commit by default
+			// Load results for the first commit by default, compared against the one before it
 			if (commitsData.length > 0) {
+				if (commitsData.length > 1) {
+					compareBaseSelect.value = commitsData[1].commit;
+				}
 				displayCommitResults(commitsData[0].commit);
 			}
 		})
@@ -129,6 +200,14 @@ document.addEventListener("DOMContentLoaded", () => {
 			displayCommitResults(selectedCommit);
 		});
 
+	// Handle comparison base change
+	document
+		.getElementById("compare-base-select")
+		.addEventListener("change", (event) => {
+			const selectedCommit = document.getElementById("commit-select").value;
+			displayComparison(event.target.value, selectedCommit);
+		});
+
 	// Handle CSV download button click
 	document.getElementById("download-csv-btn").addEventListener("click", () => {
 		const selectedCommit = document.getElementById("commit-select").value;
@@ -136,6 +215,21 @@ document.addEventListener("DOMContentLoaded", () => {
 	});
 });
 
+// Long histories are downsampled server-side to at most this many points per plot
+const MAX_PLOT_POINTS = 200;
+
+// Plotly is loaded with an async script tag; resolves once window.Plotly is available
+function plotlyReady() {
+	if (window.Plotly) {
+		return Promise.resolve();
+	}
+	return new Promise((resolve, reject) => {
+		const script = document.getElementById("plotly-script");
+		script.addEventListener("load", () => resolve());
+		script.addEventListener("error", () => reject(new Error("Failed to load Plotly")));
+	});
+}
+
 function createLinePlotCustom(
 	plotElement,
 	clientConfigName,
@@ -145,14 +239,14 @@ function createLinePlotCustom(
 	configurationData,
 ) {
 	// Fetch benchmark results
-	fetch(
+	fetchJSON(
 		`/api/commits_data_by_names?client_config_name=${encodeURIComponent(
 			clientConfigName,
 		)}&command_name=${encodeURIComponent(
 			commandName,
-		)}&metric_name=${encodeURIComponent(metricName)}&num_commits=${numCommits}`,
+		)}&metric_name=${encodeURIComponent(metricName)}&num_commits=${numCommits}&max_points=${MAX_PLOT_POINTS}&mode=line${hardwareProfileParam()}`,
 	)
-		.then((response) => response.json())
+		.then((data) => plotlyReady().then(() => data))
 		.then((data) => {
 			if (data.error) {
 				console.error("Error fetching data:", data.error);
@@ -256,9 +350,10 @@ function createBoxPlotCustom(
 			clientConfigName,
 		)}&command_name=${encodeURIComponent(
 			commandName,
-		)}&metric_name=${encodeURIComponent(metricName)}&num_commits=${numCommits}`,
+		)}&metric_name=${encodeURIComponent(metricName)}&num_commits=${numCommits}&max_points=${MAX_PLOT_POINTS}&mode=box${hardwareProfileParam()}`,
 	)
 		.then((response) => response.json())
+		.then((data) => plotlyReady().then(() => data))
 		.then((data) => {
 			if (data.error) {
 				console.error("Error fetching data:", data.error);
@@ -273,7 +368,14 @@ function createBoxPlotCustom(
 
 			// Prepare the data for the plot
 			const traces = [];
-			const x_ticks = data.map((entry) => entry.commit.slice(0, 7)).reverse(); // Shortened commit SHA
+			// Shortened commit SHA, boxes merged by downsampling also show how many commits they span
+			const x_ticks = data
+				.map((entry) =>
+					entry.merged_commits
+						? `${entry.commit.slice(0, 7)} (+${entry.merged_commits - 1})`
+						: entry.commit.slice(0, 7),
+				)
+				.reverse();
 			const colors = ["#1f77b4", "#ff7f0e", "#d62728"];
 			const cache_types = ["cold_cache", "warm_cache", "hot_cache"];
 			const cache_labels = ["Cold Cache", "Warm Cache", "Hot Cache"];
@@ -367,7 +469,7 @@ function createBoxPlotCustom(
 function createOverviewPlots(configurationData) {
 	const overviewContainer = document.getElementById("overview-plots");
 
-	// Use names instead of IDs
+	// Use names instead of IDs; app.py prerenders the same plots (OVERVIEW_PLOTS) into the snapshot
 	const plotInfoList = [
 		{ clientConfigName: "default", commandName: "root", metricName: "system" },
 		{ clientConfigName: "default", commandName: "root", metricName: "real" },
@@ -408,8 +510,7 @@ function createOverviewPlots(configurationData) {
 // Function to display commit results
 function displayCommitResults(commit) {
 	// Fetch benchmark results for the selected commit
-	fetch(`/api/results_by_commit?commit=${encodeURIComponent(commit)}`)
-		.then((response) => response.json())
+	fetchJSON(`/api/results_by_commit?commit=${encodeURIComponent(commit)}${hardwareProfileParam()}`)
 		.then((data) => {
 			if (data.error) {
 				console.error("Error fetching commit results:", data.error);
@@ -423,12 +524,225 @@ function displayCommitResults(commit) {
                 <p><strong>Date:</strong> ${formatDateTime(data.commit_info.commit_datetime)}</p>
                 <p><strong>Build Type:</strong> ${data.commit_info.build_type}</p>
                 <p><strong>Version:</strong> ${data.commit_info.version}</p>
+                <p><strong>Quiet Run:</strong> ${formatQuietRun(data.commit_info.run_settings)}</p>
+                <p><strong>Proxy:</strong> ${formatReplayProxy(data.commit_info.run_settings)}</p>
+                <p><strong>Execution:</strong> ${formatParallelExecution(data.commit_info.run_settings)}</p>
             `;
 
 			// Populate the results table
 			populateResultsTable(data.results);
 		})
 		.catch((error) => console.error("Error displaying commit results:", error));
+
+	displayCommitTelemetry(commit);
+	displayComparison(document.getElementById("compare-base-select").value, commit);
+}
+
+// Function to display what changed between a base commit and the selected commit
+function displayComparison(base, head) {
+	const table = document.getElementById("compare-table");
+	table.innerHTML = "";
+	if (!base || !head) {
+		return;
+	}
+	if (base === head) {
+		table.innerHTML = "<tr><td>Select a different base commit to compare against.</td></tr>";
+		return;
+	}
+
+	fetchJSON(
+		`/api/compare?base=${encodeURIComponent(base)}&head=${encodeURIComponent(head)}${hardwareProfileParam()}`,
+	)
+		.then((data) => {
+			if (data.error) {
+				console.error("Error comparing commits:", data.error);
+				table.innerHTML = `<tr><td>${escapeHTML(data.error)}</td></tr>`;
+				return;
+			}
+
+			if (data.results.length === 0) {
+				table.innerHTML = "<tr><td>The commits have no benchmarked combination in common.</td></tr>";
+				return;
+			}
+
+			const cacheTypes = [
+				["cold_cache", "Cold"],
+				["warm_cache", "Warm"],
+				["hot_cache", "Hot"],
+			];
+			const headers = [
+				{ text: "Command", type: "string" },
+				{ text: "Client Config", type: "string" },
+				{ text: "Metric", type: "string" },
+				{ text: "Effect Size", type: "number" },
+			];
+			for (const [, label] of cacheTypes) {
+				headers.push({ text: `${label} Ratio`, type: "number" });
+				headers.push({ text: `${label} Delta`, type: "number" });
+			}
+
+			const thead = document.createElement("thead");
+			const headerRow = document.createElement("tr");
+			const sortDirections = {};
+			headers.forEach((header, index) => {
+				const th = document.createElement("th");
+				th.textContent = header.text;
+				sortDirections[index] = true;
+				th.addEventListener("click", () => {
+					sortTableByColumn(table, index, header.type, sortDirections);
+					sortDirections[index] = !sortDirections[index];
+				});
+				headerRow.appendChild(th);
+			});
+			thead.appendChild(headerRow);
+			table.appendChild(thead);
+
+			const formatNumber = (value, digits) =>
+				value === null ? "" : value.toFixed(digits);
+
+			// Results arrive sorted by effect size, largest change first
+			const tbody = document.createElement("tbody");
+			for (const result of data.results) {
+				const row = document.createElement("tr");
+				let cells = `
+					<td>${escapeHTML(result.command_name)}</td>
+					<td>${escapeHTML(result.client_config_name)}</td>
+					<td>${escapeHTML(result.metric_name)}</td>
+					<td>${formatNumber(result.effect_size, 3)}</td>
+				`;
+				for (const [cacheType] of cacheTypes) {
+					const delta = result[`${cacheType}_delta`];
+					let cssClass = "";
+					if (result[`${cacheType}_significant`]) {
+						cssClass = delta > 0 ? "slower" : "faster";
+					}
+					cells += `
+						<td class="${cssClass}">${formatNumber(result[`${cacheType}_ratio`], 3)}</td>
+						<td class="${cssClass}">${formatNumber(delta, 3)}</td>
+					`;
+				}
+				row.innerHTML = cells;
+				tbody.appendChild(row);
+			}
+			table.appendChild(tbody);
+		})
+		.catch((error) => console.error("Error displaying comparison:", error));
+}
+
+// Function to describe the quiet run settings a commit was benchmarked with
+function formatQuietRun(runSettings) {
+	const quietRun = runSettings?.quiet_run;
+	if (!quietRun || !quietRun.enabled) {
+		return "off";
+	}
+
+	const details = [
+		quietRun.pinned_cpus ? `CPUs ${quietRun.pinned_cpus.join(",")}` : "no pinning",
+		quietRun.cpu_governor ? `governor ${quietRun.cpu_governor}` : "default governor",
+		quietRun.dropped_caches ? "caches dropped" : "caches kept",
+		quietRun.host_idle ? "host idle" : `host busy (load ${quietRun.load_avg_before})`,
+	];
+	return escapeHTML(`on - ${details.join(", ")}`);
+}
+
+// Function to describe the HTTP proxy a commit was benchmarked with
+function formatReplayProxy(runSettings) {
+	const replayProxy = runSettings?.replay_proxy;
+	if (!replayProxy || !replayProxy.enabled) {
+		return "network";
+	}
+
+	const details = [
+		replayProxy.mode,
+		replayProxy.latency_ms ? `${replayProxy.latency_ms} ms latency` : "no added latency",
+		replayProxy.bandwidth_kbps ? `${replayProxy.bandwidth_kbps} kbit/s` : "unlimited bandwidth",
+	];
+	if (replayProxy.stats) {
+		details.push(`${replayProxy.stats.hits} hits, ${replayProxy.stats.misses} misses`);
+	}
+	return escapeHTML(`local - ${details.join(", ")}`);
+}
+
+// Function to describe whether the units of a commit ran in parallel
+function formatParallelExecution(runSettings) {
+	const execution = runSettings?.parallel_execution;
+	if (!execution || !execution.enabled) {
+		return "serial";
+	}
+	const deviation = execution.calibration?.deviation;
+	const calibration =
+		deviation === null || deviation === undefined
+			? "not calibrated"
+			: `calibration deviation ${(deviation * 100).toFixed(1)}%`;
+	if (execution.mode === "parallel") {
+		return escapeHTML(`parallel - ${execution.cpu_sets.length} CPU sets, ${calibration}`);
+	}
+	return escapeHTML(`serial fallback - ${execution.reason}`);
+}
+
+// Function to display pipeline stage telemetry for a commit
+function displayCommitTelemetry(commit) {
+	fetchJSON(`/api/telemetry_by_commit?commit=${encodeURIComponent(commit)}`)
+		.then((data) => {
+			const table = document.getElementById("telemetry-table");
+			table.innerHTML = "";
+
+			if (data.error) {
+				console.error("Error fetching commit telemetry:", data.error);
+				return;
+			}
+
+			if (data.length === 0) {
+				table.innerHTML = "<tr><td>No telemetry recorded for this commit.</td></tr>";
+				return;
+			}
+
+			const headers = [
+				"Stage",
+				"Wall Time (s)",
+				"User CPU (s)",
+				"System CPU (s)",
+				"Peak RSS (MB)",
+				"Read (MB)",
+				"Written (MB)",
+				"Load Avg (start / end)",
+				"Other Processes CPU (s)",
+				"Exit Code",
+			];
+
+			const thead = document.createElement("thead");
+			const headerRow = document.createElement("tr");
+			for (const header of headers) {
+				const th = document.createElement("th");
+				th.textContent = header;
+				headerRow.appendChild(th);
+			}
+			thead.appendChild(headerRow);
+			table.appendChild(thead);
+
+			const toMB = (bytes) =>
+				bytes === null ? "" : (bytes / (1024 * 1024)).toFixed(1);
+
+			const tbody = document.createElement("tbody");
+			for (const stage of data) {
+				const row = document.createElement("tr");
+				row.innerHTML = `
+					<td>${escapeHTML(stage.stage)}</td>
+					<td>${stage.wall_time}</td>
+					<td>${stage.user_time}</td>
+					<td>${stage.system_time}</td>
+					<td>${toMB(stage.max_rss_kb * 1024)}</td>
+					<td>${toMB(stage.read_bytes)}</td>
+					<td>${toMB(stage.write_bytes)}</td>
+					<td>${stage.load_avg_start} / ${stage.load_avg_end}</td>
+					<td>${stage.other_cpu_time ?? ""}</td>
+					<td>${stage.exit_code}</td>
+				`;
+				tbody.appendChild(row);
+			}
+			table.appendChild(tbody);
+		})
+		.catch((error) => console.error("Error displaying commit telemetry:", error));
 }
 
 // Function to populate the results table
@@ -446,6 +760,7 @@ function populateResultsTable(results) {
         { text: "Command", type: "string" },
         { text: "Client Config", type: "string" },
         { text: "Metric", type: "string" },
+        { text: "Run", type: "string" },
         { text: "Cold Cache Min", type: "number" },
         { text: "Cold Cache Q1", type: "number" },
         { text: "Cold Cache Median", type: "number" },
@@ -498,6 +813,7 @@ function populateResultsTable(results) {
             <td>${escapeHTML(result.command_name)}</td>
             <td>${escapeHTML(result.client_config_name)}</td>
             <td>${escapeHTML(result.metric_name)}</td>
+            <td>${escapeHTML(result.execution_mode ?? "serial")}</td>
             <td>${result.cold_cache_min_val}</td>
             <td>${result.cold_cache_first_quartile}</td>
             <td>${result.cold_cache_median}</td>
@@ -567,7 +883,7 @@ function sortTableByColumn(table, columnIndex, type, sortDirections) {
 
 // Function to download the results as a CSV file
 function downloadCSV(commit) {
-	fetch(`/api/results_by_commit_csv?commit=${encodeURIComponent(commit)}`)
+	fetch(`/api/results_by_commit_csv?commit=${encodeURIComponent(commit)}${hardwareProfileParam()}`)
 		.then((response) => response.text())
 		.then((csvContent) => {
 			const blob = new Blob([csvContent], { type: "text/csv;charset=utf-8;" });
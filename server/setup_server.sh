@@ -22,9 +22,10 @@ fi
 
 # install python virtual enviroment dependencies
 ./benchmark_venv/bin/python3 -m pip install --upgrade pip
-./benchmark_venv/bin/python3 -m pip install pandas flask gunicorn python-dotenv
+./benchmark_venv/bin/python3 -m pip install pandas flask gunicorn python-dotenv brotli
 
 cp "$SERVICE_FILE" "$SYSTEMD_SERVICE_FILE"
+cp ./benchmark_retention.service ./benchmark_retention.timer /etc/systemd/system/
 
 # Set SELinux to Permissive Mode
 sudo setenforce 0
@@ -41,5 +42,6 @@ systemctl daemon-reload
 # Enable and start the service
 systemctl enable benchmark_server
 systemctl start benchmark_server
+systemctl enable --now benchmark_retention.timer
 
 echo "Flask application is running and accessible on port $PORT."